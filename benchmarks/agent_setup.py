@@ -0,0 +1,76 @@
+"""Benchmark: per-turn agent setup overhead, rebuilding agents per prompt vs reusing them from a
+SessionResourceCache.
+
+Builds the agents of chat_pandas_df (on frames of increasing size) and search_and_chat,
+including their OpenAI clients. Building them makes no requests, so no API key or network
+is needed.
+
+    python -m benchmarks.agent_setup
+"""
+
+from __future__ import annotations
+
+import statistics
+import time
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from langchain.agents import AgentExecutor, AgentType, ConversationalChatAgent
+from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_experimental.agents import create_pandas_dataframe_agent
+from langchain_openai import ChatOpenAI
+
+from streamlit_agent.agents.session_cache import SessionResourceCache
+from streamlit_agent.memory.token_budget_memory import TokenBudgetMemory
+
+FRAME_SHAPES = [(1_000, 10), (100_000, 50), (1_000_000, 50)]
+TURNS = 20
+
+
+def make_frame(rows: int, columns: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    data = {f"c{i}": rng.random(rows) for i in range(columns - 1)}
+    data["label"] = rng.choice(["a", "b", "c"], rows)
+    return pd.DataFrame(data)
+
+
+def per_turn_ms(setup: Callable[[], object]) -> float:
+    latencies = []
+    for _ in range(TURNS):
+        start = time.perf_counter()
+        setup()
+        latencies.append(time.perf_counter() - start)
+    return statistics.median(latencies) * 1000
+
+
+def main() -> None:
+    print(f"{'agent':<28} {'rebuilt ms':>10} {'cached ms':>10}")
+    for rows, columns in FRAME_SHAPES:
+        df = make_frame(rows, columns)
+        create = lambda: create_pandas_dataframe_agent(
+            ChatOpenAI(openai_api_key="sk-unused", streaming=True),
+            df,
+            agent_type=AgentType.OPENAI_FUNCTIONS,
+            handle_parsing_errors=True,
+        )
+        cache = SessionResourceCache()
+        cached = lambda: cache.get_or_create("pandas_df_agent", ("key", "model", "data"), create)
+        name = f"pandas ({rows:,}x{columns})"
+        print(f"{name:<28} {per_turn_ms(create):>10.2f} {per_turn_ms(cached):>10.3f}")
+
+    memory = TokenBudgetMemory(return_messages=True, memory_key="chat_history")
+
+    def create_executor() -> AgentExecutor:
+        llm = ChatOpenAI(openai_api_key="sk-unused", streaming=True)
+        tools = [DuckDuckGoSearchRun(name="Search")]
+        agent = ConversationalChatAgent.from_llm_and_tools(llm=llm, tools=tools)
+        return AgentExecutor.from_agent_and_tools(agent=agent, tools=tools, memory=memory)
+
+    cache = SessionResourceCache()
+    cached = lambda: cache.get_or_create("search_executor", ("key", "model"), create_executor)
+    print(f"{'search':<28} {per_turn_ms(create_executor):>10.2f} {per_turn_ms(cached):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""Benchmark: end-to-end turn latency, render calls and peak memory of the apps, run
+headlessly with streamlit.testing against the fake backends in streamlit_agent.fakes.
+
+Each scenario opens several sessions of an app and sends their questions turn by turn,
+interleaving the sessions, so that the state of all of them is kept in memory. LLMs stream
+scripted responses at a fixed token rate and tools take a fixed time, so latencies measure
+the app's own overhead on top of a constant backend time, which is reported alongside.
+Render calls are the deltas an app sends to the browser per turn. Each scenario runs in a
+fresh subprocess, with its own home directory for the apps' caches, so that peak RSS is its
+own. streamlit.testing runs one script at a time, so sessions take turns rather than
+running concurrently.
+
+    python -m benchmarks.apps [scenario ...]
+
+simple_feedback.py is not covered, as it sends traces to LangSmith.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from langchain_core.messages import AIMessage
+from streamlit.runtime.forward_msg_queue import ForwardMsgQueue
+from streamlit.runtime.scriptrunner import ScriptRunner
+from streamlit.testing.v1 import AppTest
+
+from streamlit_agent.fakes.backends import fake_backends
+from streamlit_agent.fakes.models import FakeScript
+
+APPS_DIR = Path(__file__).parent.parent / "streamlit_agent"
+RUNS_DIR = APPS_DIR / "runs"
+SESSIONS = 4
+TURNS = 3
+TIMEOUT = 120
+OPENAI_API_KEY = "sk-fake"
+# Timing of the fake backends
+TOKENS_PER_SECOND = 100.0
+FIRST_TOKEN_LATENCY = 0.2
+TOOL_LATENCY = 0.3
+
+ANSWER = (
+    "Streamlit reruns the script from top to bottom on every interaction, so the chat "
+    "history is kept in session state and redrawn on each turn, while the new answer is "
+    "streamed into a placeholder token by token as the model produces it."
+)
+SEARCH_RESULT = (
+    "Angelique Kerber won the 2018 Wimbledon singles title, and Naomi Osaka won the 2018 "
+    "Women's U.S. Open, defeating Serena Williams in the final."
+)
+
+
+def _widget(widgets: Sequence[Any], label: str) -> Any:
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def enter_api_key(at: AppTest) -> None:
+    _widget(at.text_input, "OpenAI API Key").input(OPENAI_API_KEY)
+    at.run()
+
+
+def send_chat_message(at: AppTest, question: str) -> Any:
+    return at.chat_input[0].set_value(question)
+
+
+def _refresh_form(at: AppTest) -> None:
+    # mrkl_demo reruns itself on a second submission, after which streamlit.testing shows
+    # the elements of both runs; running it again shows the form as a browser would
+    if not at.selectbox:
+        at.run()
+
+
+def ask_mrkl(at: AppTest, question: str) -> Any:
+    _refresh_form(at)
+    _widget(at.text_input, "Or, ask your own question").input(question)
+    return _widget(at.button, "Submit Question").click()
+
+
+def replay_mrkl(at: AppTest, question: str) -> Any:
+    _refresh_form(at)
+    _widget(at.select_slider, "Playback speed").set_value("Instant")
+    _widget(at.selectbox, "Sample questions").select(question)
+    return _widget(at.button, "Submit Question").click()
+
+
+def generate_csv() -> bytes:
+    rng = np.random.default_rng(0)
+    n = 50_000
+    df = pd.DataFrame(
+        {
+            "country": rng.choice(["US", "DE", "FR", "JP", "BR"], n),
+            "quantity": rng.integers(1, 10, n),
+            "price": rng.random(n).round(2) * 100,
+        }
+    )
+    return df.to_csv(index=False).encode()
+
+
+def generate_pdf(pages: List[str]) -> bytes:
+    """Return a PDF with one line of text on each page."""
+    n = len(pages)
+    # Objects: catalog, page tree, font, then a page and its content stream for each page
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(n)), n),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = b"BT /F1 10 Tf 20 750 Td (%s) Tj ET" % text.encode("latin-1")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    output = io.BytesIO()
+    output.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = output.tell()
+    output.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    output.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    output.write(b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1))
+    output.write(b"startxref\n%d\n%%%%EOF\n" % xref)
+    return output.getvalue()
+
+
+def generate_pdfs() -> List[Tuple[str, bytes, str]]:
+    pages = [
+        f"Part PN-{i:04d} of the manual: error E{i % 50:02d} means the pump {i} needs service."
+        for i in range(40)
+    ]
+    return [
+        (f"manual_{n}.pdf", generate_pdf(pages[n * 20 : (n + 1) * 20]), "application/pdf")
+        for n in range(2)
+    ]
+
+
+def _script(**kwargs: Any) -> FakeScript:
+    return FakeScript(
+        tokens_per_second=TOKENS_PER_SECOND,
+        first_token_latency=FIRST_TOKEN_LATENCY,
+        tool_latency=TOOL_LATENCY,
+        **kwargs,
+    )
+
+
+def _json_action(action: str, action_input: str) -> str:
+    return f'```json\n{json.dumps({"action": action, "action_input": action_input})}\n```'
+
+
+class Scenario(NamedTuple):
+    app: str
+    script: Callable[[], FakeScript]
+    setup: Callable[[AppTest], None]
+    # Enters a question, returning the widget whose run sends it
+    ask: Callable[[AppTest, str], Any]
+    questions: List[str]
+    uploads: Callable[[], List[Tuple[str, bytes, str]]] = list
+    secrets: Optional[Dict[str, str]] = None
+
+
+CHAT_QUESTIONS = [
+    "How does Streamlit render a chat app?",
+    "Why is the history kept in session state?",
+    "How are answers streamed?",
+]
+
+SCENARIOS: Dict[str, Scenario] = {
+    "basic_streaming": Scenario(
+        "basic_streaming.py",
+        lambda: _script(llm_responses=[ANSWER]),
+        enter_api_key,
+        send_chat_message,
+        CHAT_QUESTIONS,
+    ),
+    "basic_memory": Scenario(
+        "basic_memory.py",
+        lambda: _script(llm_responses=[ANSWER]),
+        lambda at: None,
+        send_chat_message,
+        CHAT_QUESTIONS,
+        secrets={"openai_api_key": OPENAI_API_KEY},
+    ),
+    "minimal_agent": Scenario(
+        "minimal_agent.py",
+        lambda: _script(
+            prompt_responses={
+                "Answer the following questions": [
+                    "I should search for the winner.\n"
+                    "Action: duckduckgo_search\nAction Input: 2018 Women's U.S. Open winner",
+                    "I now know the final answer.\nFinal Answer: Naomi Osaka won it.",
+                ]
+            },
+            tool_outputs={"duckduckgo_search": [SEARCH_RESULT]},
+        ),
+        lambda at: None,
+        send_chat_message,
+        ["Who won the Women's U.S. Open in 2018?", "Who won Wimbledon in 2018?"],
+    ),
+    "search_and_chat": Scenario(
+        "search_and_chat.py",
+        lambda: _script(
+            prompt_responses={
+                "Assistant is a large language model": [
+                    _json_action("Search", "2018 Women's U.S. Open winner"),
+                    _json_action("Final Answer", "Naomi Osaka won the 2018 Women's U.S. Open."),
+                ]
+            },
+            tool_outputs={"Search": [SEARCH_RESULT]},
+            # Summaries of the chat history
+            llm_responses=["The human asked about tennis winners in 2018."],
+        ),
+        enter_api_key,
+        send_chat_message,
+        ["Who won the Women's U.S. Open in 2018?", "Who won Wimbledon in 2018?"],
+    ),
+    "mrkl_demo_replay": Scenario(
+        "mrkl_demo.py",
+        _script,
+        lambda at: None,
+        replay_mrkl,
+        [
+            "Who is Leo DiCaprio's girlfriend? What is her current age raised to the 0.43 power?",
+        ],
+    ),
+    "mrkl_demo": Scenario(
+        "mrkl_demo.py",
+        lambda: FakeScript.from_run(
+            str(RUNS_DIR / "leo.pickle"),
+            tokens_per_second=TOKENS_PER_SECOND,
+            first_token_latency=FIRST_TOKEN_LATENCY,
+            tool_latency=TOOL_LATENCY,
+        ),
+        enter_api_key,
+        ask_mrkl,
+        [
+            "Who is Leo DiCaprio's girlfriend? How old is she, raised to the 0.43 power?",
+        ],
+    ),
+    "chat_with_sql_db": Scenario(
+        "chat_with_sql_db.py",
+        lambda: _script(
+            prompt_responses={
+                "You are an agent designed to interact with a SQL database": [
+                    "I should look at the tables relevant to the question.\n"
+                    "Action: sql_db_list_tables\nAction Input: ",
+                    "The Employee table lists the employees.\n"
+                    "Action: sql_db_query\nAction Input: SELECT COUNT(*) FROM Employee",
+                    "I now know the final answer.\nFinal Answer: There are 8 employees.",
+                ]
+            }
+        ),
+        enter_api_key,
+        send_chat_message,
+        ["How many employees are there?", "How many employees does the company have?"],
+    ),
+    "chat_pandas_df": Scenario(
+        "chat_pandas_df.py",
+        lambda: _script(
+            prompt_responses={
+                "You are working with a pandas dataframe": [
+                    AIMessage(
+                        content="",
+                        additional_kwargs={
+                            "function_call": {
+                                "name": "python_repl_ast",
+                                "arguments": json.dumps(
+                                    {"query": "df.groupby('country')['price'].sum()"}
+                                ),
+                            }
+                        },
+                    ),
+                    "Sales are highest in the US, followed by Germany.",
+                ]
+            }
+        ),
+        enter_api_key,
+        send_chat_message,
+        ["Which country has the highest sales?", "Where do we sell the most?"],
+        lambda: [("sales.csv", generate_csv(), "text/csv")],
+    ),
+    "chat_with_documents": Scenario(
+        "chat_with_documents.py",
+        lambda: _script(
+            prompt_responses={
+                "Use the following pieces of context": [
+                    "Error E07 means that the pump needs service; see the service manual."
+                ],
+                "Given the following conversation": ["What does error E07 mean?"],
+            },
+            llm_responses=["The human asked about error codes in the manual."],
+        ),
+        enter_api_key,
+        send_chat_message,
+        ["What does error E07 mean?", "Which part is PN-0012?", "And PN-0031?"],
+        generate_pdfs,
+    ),
+}
+
+
+def measure(name: str, sessions: int, turns: int) -> None:
+    """Run a scenario, printing turn latencies, render calls and peak RSS as JSON."""
+    scenario = SCENARIOS[name]
+    script = scenario.script()
+    renders = 0
+    session_id = ""
+    enqueue = ForwardMsgQueue.enqueue
+    script_runner_init = ScriptRunner.__init__
+
+    def count_enqueue(self: ForwardMsgQueue, msg: Any) -> None:
+        nonlocal renders
+        if msg.WhichOneof("type") == "delta":
+            renders += 1
+        enqueue(self, msg)
+
+    def init_with_session_id(self: ScriptRunner, **kwargs: Any) -> None:
+        # streamlit.testing gives every session the same ID, which the apps key caches by
+        script_runner_init(self, **{**kwargs, "session_id": session_id})
+
+    latencies: List[float] = []
+    render_counts: List[int] = []
+    errors: List[str] = []
+    with fake_backends(script, scenario.uploads()), mock.patch.object(
+        ForwardMsgQueue, "enqueue", count_enqueue
+    ), mock.patch.object(ScriptRunner, "__init__", init_with_session_id):
+        apps = []
+        for i in range(sessions):
+            session_id = f"session {i}"
+            at = AppTest.from_file(str(APPS_DIR / scenario.app), default_timeout=TIMEOUT)
+            at.secrets.update(scenario.secrets or {})
+            at.run()
+            scenario.setup(at)
+            if at.exception:
+                raise RuntimeError(f"{scenario.app} failed: {at.exception[0].message}")
+            apps.append(at)
+        for turn in range(turns):
+            for i, at in enumerate(apps):
+                session_id = f"session {i}"
+                script.reset()
+                widget = scenario.ask(at, scenario.questions[turn % len(scenario.questions)])
+                renders = 0
+                start = time.perf_counter()
+                widget.run()
+                latencies.append(time.perf_counter() - start)
+                render_counts.append(renders)
+                errors.extend(str(exception.message) for exception in at.exception)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(
+        json.dumps(
+            {
+                "p50_ms": float(np.percentile(latencies, 50)) * 1000,
+                "p99_ms": float(np.percentile(latencies, 99)) * 1000,
+                "renders": float(np.mean(render_counts)),
+                "peak_mb": peak_kb / 1024,
+                "errors": errors,
+            }
+        )
+    )
+
+
+def main(names: List[str]) -> None:
+    print(
+        f"{SESSIONS} sessions x {TURNS} turns; fake LLMs stream {TOKENS_PER_SECOND:.0f} tokens/s "
+        f"after {FIRST_TOKEN_LATENCY * 1000:.0f} ms, tools take {TOOL_LATENCY * 1000:.0f} ms"
+    )
+    print(f"{'scenario':<20} {'p50 ms':>8} {'p99 ms':>8} {'renders':>8} {'peak MB':>8}")
+    for name in names or SCENARIOS:
+        with tempfile.TemporaryDirectory() as home:
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.apps",
+                    "measure",
+                    name,
+                    str(SESSIONS),
+                    str(TURNS),
+                ],
+                capture_output=True,
+                text=True,
+                env={**os.environ, "HOME": home},
+            )
+        if process.returncode != 0:
+            error = process.stderr.strip().splitlines()[-1:] or ["no output"]
+            print(f"{name:<20} failed: {error[0]}")
+            continue
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        print(
+            f"{name:<20} {result['p50_ms']:>8.0f} {result['p99_ms']:>8.0f} "
+            f"{result['renders']:>8.1f} {result['peak_mb']:>8.0f}"
+        )
+        for error in sorted(set(result["errors"])):
+            print(f"{'':<20} error: {error.splitlines()[0][:100]}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["measure"]:
+        measure(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+    else:
+        main(sys.argv[1:])
@@ -0,0 +1,56 @@
+"""Benchmark: embedding throughput by batch size, torch thread count and length sorting.
+
+Embeds synthetic chunks of widely varying length with the chat_with_documents embedding
+model, to pick `EMBEDDING_BATCH_SIZE` and `EMBEDDING_THREADS` for a host. Needs the
+sentence-transformers model, which is downloaded on first use.
+
+    python -m benchmarks.embedding
+"""
+
+from __future__ import annotations
+
+import os
+import random
+
+from langchain_community.embeddings import HuggingFaceEmbeddings
+
+from streamlit_agent.documents.batched_embeddings import BatchedEmbeddings
+
+MODEL = "all-MiniLM-L6-v2"
+N_CHUNKS = 512
+BATCH_SIZES = [8, 16, 32, 64, 128]
+WORDS = "the agent retrieves relevant context from uploaded documents before answering".split()
+
+
+def generate_chunks() -> list[str]:
+    rng = random.Random(0)
+    # Mostly full chunks, with the short tails of pages and sections mixed in
+    return [" ".join(rng.choices(WORDS, k=rng.choice([10, 40, 120, 250]))) for _ in range(N_CHUNKS)]
+
+
+def main() -> None:
+    chunks = generate_chunks()
+    thread_counts = sorted({1, os.cpu_count() or 1})
+    model = HuggingFaceEmbeddings(model_name=MODEL)
+    model.embed_documents(chunks[:8])  # Warm up
+    print(f"{N_CHUNKS} chunks, {os.cpu_count()} CPUs")
+    print(f"{'threads':>7} {'batch':>5} {'sorted':>6} {'chunks/s':>9}")
+    for num_threads in thread_counts:
+        for batch_size in BATCH_SIZES:
+            model.encode_kwargs["batch_size"] = batch_size
+            for sort_by_length in (False, True):
+                embeddings = BatchedEmbeddings(
+                    model,
+                    batch_size=batch_size,
+                    num_threads=num_threads,
+                    sort_by_length=sort_by_length,
+                )
+                embeddings.embed_documents(chunks)
+                print(
+                    f"{num_threads:>7} {batch_size:>5} {str(sort_by_length):>6} "
+                    f"{embeddings.chunks_per_second:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark: query latency of vector, BM25 and hybrid retrieval on a large synthetic corpus.
+
+Chunks are random text with a unique part number each, embedded with random vectors, so
+the benchmark runs without an embedding model. Also reports how often each retriever
+returns the chunk containing a part number that is searched for.
+
+    python -m benchmarks.hybrid_retrieval
+"""
+
+from __future__ import annotations
+
+import hashlib
+import random
+import statistics
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from streamlit_agent.documents.bm25_index import BM25Index
+from streamlit_agent.documents.hnsw_store import HnswVectorStore
+from streamlit_agent.documents.hybrid_retriever import HybridRetriever
+
+N_CHUNKS = 20_000
+WORDS_PER_CHUNK = 200
+VOCABULARY_SIZE = 5000
+DIM = 384
+N_QUERIES = 200
+
+
+class RandomEmbeddings(Embeddings):
+    """Deterministic random unit vectors, seeded by the text."""
+
+    def _embed(self, text: str) -> list[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(DIM)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
+
+
+def generate_chunks() -> list[str]:
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(VOCABULARY_SIZE)]
+    # Zipf-like word frequencies, as in natural text
+    weights = [1 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    return [
+        " ".join(rng.choices(vocabulary, weights, k=WORDS_PER_CHUNK)) + f" part PN-{i:06d}"
+        for i in range(N_CHUNKS)
+    ]
+
+
+def time_queries(search, queries: list[str]) -> list[float]:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    chunks = generate_chunks()
+    ids = [str(i) for i in range(N_CHUNKS)]
+    embeddings = RandomEmbeddings()
+
+    start = time.perf_counter()
+    vectorstore = HnswVectorStore(embeddings, DIM, max_elements=N_CHUNKS)
+    vectorstore.add_embeddings(chunks, embeddings.embed_documents(chunks), ids=ids)
+    print(f"HNSW build: {time.perf_counter() - start:6.2f}s ({N_CHUNKS} chunks)")
+
+    start = time.perf_counter()
+    bm25 = BM25Index()
+    bm25.add(ids, chunks)
+    print(f"BM25 build: {time.perf_counter() - start:6.2f}s")
+
+    rng = random.Random(1)
+    targets = rng.sample(range(N_CHUNKS), N_QUERIES)
+    queries = [f"which manual mentions part PN-{i:06d}?" for i in targets]
+    retrievers = {
+        "vector (MMR)": vectorstore.as_retriever(
+            search_type="mmr", search_kwargs={"k": 2, "fetch_k": 8}
+        ),
+        "bm25": None,
+        "hybrid": HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=2, fetch_k=8),
+    }
+    print(f"{'retriever':<13} {'p50 ms':>7} {'p99 ms':>7} {'part hit rate':>13}")
+    for name, retriever in retrievers.items():
+        if retriever is None:
+            search = lambda query: vectorstore.get_by_ids([id for id, _ in bm25.search(query, 2)])
+        else:
+            search = retriever.get_relevant_documents
+        latencies = time_queries(search, queries)
+        hits = sum(
+            any(doc.page_content == chunks[i] for doc in search(query))
+            for i, query in zip(targets, queries)
+        )
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+        print(f"{name:<13} {p50:>7.2f} {p99:>7.2f} {hits / N_QUERIES:>13.0%}")
+
+    # Incremental updates keep both indexes in sync
+    start = time.perf_counter()
+    removed = ids[: N_CHUNKS // 10]
+    vectorstore.delete(removed)
+    bm25.remove(removed)
+    print(f"remove 10%: {time.perf_counter() - start:6.2f}s")
+    assert len(vectorstore) == len(bm25) == N_CHUNKS - len(removed)
+    latencies = time_queries(retrievers["hybrid"].get_relevant_documents, queries)
+    print(f"hybrid after removal: p50 {statistics.median(latencies) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
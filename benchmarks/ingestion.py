@@ -0,0 +1,107 @@
+"""Benchmark: wall-clock time to split a batch of PDFs page by page, serially vs. in a
+process pool, as DocumentIndex does when files are uploaded.
+
+Generates synthetic multi-page text PDFs in a temporary directory, then runs
+`iter_page_splits` with a single worker and with one worker per CPU, reporting the time
+to the first page, which is when the index becomes searchable, and to the last page.
+
+    python -m benchmarks.ingestion
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import tempfile
+import time
+
+from langchain_core.documents import Document
+
+from streamlit_agent.documents.ingest import count_pages, iter_page_splits
+
+N_FILES = 24
+PAGES_PER_FILE = 40
+LINES_PER_PAGE = 50
+WORDS = "the agent retrieves relevant context from uploaded documents before answering".split()
+
+
+def write_pdf(path: str, pages: list[list[str]]) -> None:
+    """Write a minimal PDF with one Helvetica text line per entry on each page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b""]
+    font_id = 3
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for lines in pages:
+        text = "".join(f"({line}) Tj T* " for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 36 800 Td {text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (font_id, content_id)
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    with open(path, "wb") as file:
+        file.write(out)
+
+
+def generate_pdfs(directory: str) -> list[str]:
+    rng = random.Random(0)
+    paths = []
+    for i in range(N_FILES):
+        pages = [
+            [" ".join(rng.choices(WORDS, k=12)) for _ in range(LINES_PER_PAGE)]
+            for _ in range(PAGES_PER_FILE)
+        ]
+        path = os.path.join(directory, f"doc{i}.pdf")
+        write_pdf(path, pages)
+        paths.append(path)
+    return paths
+
+
+def split_all(
+    paths: list[str], page_counts: list[int], max_workers: int | None
+) -> tuple[list[Document], float, float]:
+    """Return the chunks of all pages, and the seconds to the first and the last page."""
+    start = time.perf_counter()
+    first_page_time = 0.0
+    chunks = []
+    for n, page_splits in enumerate(iter_page_splits(paths, page_counts, max_workers)):
+        if n == 0:
+            first_page_time = time.perf_counter() - start
+        chunks.extend(page_splits)
+    return chunks, first_page_time, time.perf_counter() - start
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        paths = generate_pdfs(directory)
+        page_counts = [count_pages(path) for path in paths]
+        print(f"{N_FILES} files x {PAGES_PER_FILE} pages, {os.cpu_count()} CPUs")
+
+        serial, serial_first, serial_time = split_all(paths, page_counts, max_workers=1)
+        print(f"serial:   first page {serial_first:6.2f}s, all {serial_time:6.2f}s")
+        parallel, parallel_first, parallel_time = split_all(paths, page_counts, None)
+        print(f"parallel: first page {parallel_first:6.2f}s, all {parallel_time:6.2f}s")
+
+        assert [doc.page_content for doc in serial] == [doc.page_content for doc in parallel]
+        print(f"speedup:  {serial_time / parallel_time:6.2f}x ({len(serial)} chunks)")
+
+
+if __name__ == "__main__":
+    main()
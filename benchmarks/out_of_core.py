@@ -0,0 +1,95 @@
+"""Benchmark: peak memory of loading a CSV file with pandas vs converting and aggregating it
+out of core with ChunkedFrame, for files of increasing size.
+
+Each measurement runs in a fresh subprocess, so that peak RSS is its own.
+
+    python -m benchmarks.out_of_core
+"""
+
+from __future__ import annotations
+
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROWS = [1_000_000, 4_000_000, 16_000_000]
+WRITE_CHUNK_ROWS = 500_000
+
+
+def generate_csv(path: Path, rows: int) -> None:
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, WRITE_CHUNK_ROWS):
+        n = min(WRITE_CHUNK_ROWS, rows - start)
+        chunk = pd.DataFrame(
+            {
+                "id": np.arange(start, start + n),
+                "country": rng.choice(["US", "DE", "FR", "JP", "BR"], n),
+                "product": rng.choice([f"product {i}" for i in range(200)], n),
+                "quantity": rng.integers(1, 10, n),
+                "price": rng.random(n).round(2) * 100,
+            }
+        )
+        chunk.to_csv(path, mode="a", header=start == 0, index=False)
+
+
+def measure(mode: str, csv_path: str, cache_dir: str) -> None:
+    """Load and aggregate the file, printing seconds and peak RSS as JSON."""
+    start = time.perf_counter()
+    if mode == "pandas":
+        df = pd.read_csv(csv_path)
+        df.groupby("country").agg(total=("price", "sum"), avg=("quantity", "mean"))
+    else:
+        from streamlit_agent.dataframes.chunked_frame import ChunkedFrame
+
+        with open(csv_path, "rb") as file:
+            data = ChunkedFrame.from_csv(file, cache_dir)
+        data.aggregate(by="country", total=("price", "sum"), avg=("quantity", "mean"))
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": time.perf_counter() - start, "peak_mb": peak_kb / 1024}))
+
+
+def main() -> None:
+    print(
+        f"{'rows':>10} {'file MB':>8} {'pandas s':>9} {'peak MB':>8} {'chunked s':>10} {'peak MB':>8}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in ROWS:
+            csv_path = Path(directory) / f"{rows}.csv"
+            generate_csv(csv_path, rows)
+            results = {}
+            for mode in ("pandas", "chunked"):
+                output = subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.out_of_core",
+                        mode,
+                        str(csv_path),
+                        directory,
+                    ],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout
+                results[mode] = json.loads(output)
+            size_mb = csv_path.stat().st_size / 2**20
+            pandas, chunked = results["pandas"], results["chunked"]
+            print(
+                f"{rows:>10,} {size_mb:>8.0f} {pandas['seconds']:>9.2f} {pandas['peak_mb']:>8.0f} "
+                f"{chunked['seconds']:>10.2f} {chunked['peak_mb']:>8.0f}"
+            )
+            csv_path.unlink()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        measure(*sys.argv[1:])
+    else:
+        main()
@@ -0,0 +1,93 @@
+"""Benchmark: end-to-end latency of agent steps with several independent tool calls, run
+sequentially by AgentExecutor vs concurrently by ParallelAgentExecutor.
+
+The agent is a stub that requests N lookups at once and then finishes, and each tool
+sleeps for a fixed delay, so only the executor's scheduling is measured. Also checks that
+both executors report tool callbacks and observations in the same order.
+
+    python -m benchmarks.parallel_tools
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, List, Tuple, Union
+
+from langchain.agents import AgentExecutor, BaseMultiActionAgent, Tool
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+
+from streamlit_agent.agents.parallel_executor import ParallelAgentExecutor
+
+TOOL_DELAYS = {"Search": 0.3, "Calculator": 0.1, "FooBar DB": 0.2}
+ACTION_COUNTS = (1, 2, 4, 8)
+
+
+class StubAgent(BaseMultiActionAgent):
+    """Requests `n_actions` tool calls, cycling through the tools, then returns the
+    observations.
+    """
+
+    n_actions: int
+
+    @property
+    def input_keys(self) -> List[str]:
+        return ["input"]
+
+    def plan(
+        self, intermediate_steps: List[Tuple[AgentAction, str]], **kwargs: Any
+    ) -> Union[List[AgentAction], AgentFinish]:
+        if intermediate_steps:
+            output = "; ".join(observation for _, observation in intermediate_steps)
+            return AgentFinish({"output": output}, log="")
+        tools = list(TOOL_DELAYS)
+        return [
+            AgentAction(tools[i % len(tools)], f"query {i}", log=f"lookup {i}\n")
+            for i in range(self.n_actions)
+        ]
+
+    async def aplan(self, *args: Any, **kwargs: Any) -> Union[List[AgentAction], AgentFinish]:
+        raise NotImplementedError
+
+
+class RecordingHandler(BaseCallbackHandler):
+    def __init__(self) -> None:
+        self.events: list[tuple[str, str]] = []
+
+    def on_tool_start(self, serialized: dict, input_str: str, **kwargs: Any) -> None:
+        self.events.append(("start", input_str))
+
+    def on_tool_end(self, output: str, **kwargs: Any) -> None:
+        self.events.append(("end", output))
+
+
+def make_tool(name: str, delay: float) -> Tool:
+    def run(query: str) -> str:
+        time.sleep(delay)
+        return f"{name} result for {query}"
+
+    return Tool(name=name, func=run, description=f"Stub {name} tool")
+
+
+def main() -> None:
+    tools = [make_tool(name, delay) for name, delay in TOOL_DELAYS.items()]
+    print(f"{'tool calls':>10} {'sequential s':>13} {'parallel s':>11} {'speedup':>8}")
+    for n_actions in ACTION_COUNTS:
+        timings, outputs, events = [], [], []
+        for executor_class in (AgentExecutor, ParallelAgentExecutor):
+            executor = executor_class(agent=StubAgent(n_actions=n_actions), tools=tools)
+            handler = RecordingHandler()
+            start = time.perf_counter()
+            outputs.append(executor.invoke({"input": "question"}, {"callbacks": [handler]}))
+            timings.append(time.perf_counter() - start)
+            events.append(handler.events)
+        assert outputs[0] == outputs[1], "Observations differ"
+        assert events[0] == events[1], "Callbacks differ"
+        sequential, parallel = timings
+        print(
+            f"{n_actions:>10} {sequential:>13.2f} {parallel:>11.2f} {sequential / parallel:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
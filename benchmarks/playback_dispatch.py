@@ -0,0 +1,91 @@
+"""Micro-benchmark: playback_callbacks dispatch throughput on the bundled saved sessions.
+
+Compares the previous per-handler if/elif ladder with the precomputed dispatch table,
+replaying each session with no pauses to a varying number of no-op handlers.
+
+    python -m benchmarks.playback_dispatch
+"""
+
+from __future__ import annotations
+
+import time
+from pathlib import Path
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+from streamlit_agent.callbacks.capturing_callback_handler import (
+    CallbackRecord,
+    CallbackType,
+    load_records_from_file,
+    playback_callbacks,
+)
+
+RUNS_DIR = Path(__file__).parent.parent / "streamlit_agent" / "runs"
+HANDLER_COUNTS = (1, 4, 16)
+REPEATS = 200
+
+
+def ladder_playback(handlers: list[BaseCallbackHandler], records: list[CallbackRecord]) -> None:
+    """playback_callbacks' loop before the dispatch table, with max_pause_time=0."""
+    for record in records:
+        pause_time = min(record["time_delta"], 0)
+        if pause_time > 0:
+            time.sleep(pause_time)
+
+        for handler in handlers:
+            if record["callback_type"] == CallbackType.ON_LLM_START:
+                handler.on_llm_start(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_LLM_NEW_TOKEN:
+                handler.on_llm_new_token(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_LLM_END:
+                handler.on_llm_end(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_LLM_ERROR:
+                handler.on_llm_error(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_TOOL_START:
+                handler.on_tool_start(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_TOOL_END:
+                handler.on_tool_end(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_TOOL_ERROR:
+                handler.on_tool_error(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_TEXT:
+                handler.on_text(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_CHAIN_START:
+                handler.on_chain_start(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_CHAIN_END:
+                handler.on_chain_end(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_CHAIN_ERROR:
+                handler.on_chain_error(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_AGENT_ACTION:
+                handler.on_agent_action(*record["args"], **record["kwargs"])
+            elif record["callback_type"] == CallbackType.ON_AGENT_FINISH:
+                handler.on_agent_finish(*record["args"], **record["kwargs"])
+
+
+def table_playback(handlers: list[BaseCallbackHandler], records: list[CallbackRecord]) -> None:
+    playback_callbacks(handlers, records, max_pause_time=0)
+
+
+def events_per_sec(playback, n_handlers: int, records: list[CallbackRecord]) -> float:
+    handlers = [BaseCallbackHandler() for _ in range(n_handlers)]
+    playback(handlers, records)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        playback(handlers, records)
+    return len(records) * REPEATS / (time.perf_counter() - start)
+
+
+def main() -> None:
+    print(f"{'session':<16}{'handlers':>9}{'ladder ev/s':>14}{'table ev/s':>14}{'speedup':>9}")
+    for path in sorted(RUNS_DIR.glob("*.pickle")):
+        records = load_records_from_file(str(path))
+        for n_handlers in HANDLER_COUNTS:
+            before = events_per_sec(ladder_playback, n_handlers, records)
+            after = events_per_sec(table_playback, n_handlers, records)
+            print(
+                f"{path.name:<16}{n_handlers:>9}{before:>14,.0f}{after:>14,.0f}"
+                f"{after / before:>8.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
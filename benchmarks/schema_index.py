@@ -0,0 +1,129 @@
+"""Benchmark: prompt size and lookup latency of schema index search on a many-table database.
+
+Generates a SQLite database with hundreds of tables linked by foreign keys, then compares
+the full table info that SQLDatabaseToolkit shows the agent with the output of the
+relevant-tables tool. Also reports how often the table a question is about is among the
+tables returned.
+
+    python -m benchmarks.schema_index
+"""
+
+from __future__ import annotations
+
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from streamlit_agent.sql.cached_database import CachedSQLDatabase
+from streamlit_agent.sql.engine import create_sqlite_read_only_engine
+from streamlit_agent.sql.schema_index import SchemaIndex
+from streamlit_agent.sql.toolkit import RelevantTablesTool
+
+MODULES = ["sales", "billing", "inventory", "shipping", "support", "hr"]
+ENTITIES = [
+    "customer", "order", "invoice", "payment", "product", "supplier", "warehouse", "shipment",
+    "carrier", "ticket", "agent", "employee", "department", "contract", "refund", "discount",
+    "region", "store", "campaign", "lead", "account", "budget", "asset", "vendor", "review",
+    "return", "subscription", "plan", "coupon", "route", "vehicle", "driver", "schedule",
+    "shift", "skill", "training", "survey", "complaint", "category", "brand", "batch",
+    "location", "currency", "tax", "receipt", "quote", "project", "task", "timesheet", "leave",
+]  # fmt: skip
+ATTRIBUTES = [
+    "name", "status", "amount", "created_at", "updated_at", "description", "priority", "code",
+    "email", "phone", "address", "city", "country", "quantity", "price", "weight", "rating",
+    "notes", "start_date", "end_date", "score", "level", "balance", "currency_code", "owner",
+]  # fmt: skip
+ROWS_PER_TABLE = 20
+N_QUERIES = 200
+
+
+def generate_database(path: Path) -> list[tuple[str, str]]:
+    """Create the database, and return (table, attribute) pairs to ask questions about."""
+    rng = random.Random(0)
+    tables = [f"{module}_{entity}" for module in MODULES for entity in ENTITIES]
+    connection = sqlite3.connect(path)
+    columns_by_table = {}
+    for i, table in enumerate(tables):
+        attributes = rng.sample(ATTRIBUTES, 6)
+        columns = [f"{table}_id INTEGER PRIMARY KEY", *(f"{a} TEXT" for a in attributes)]
+        # Reference a couple of earlier tables of the same module
+        module = table.split("_")[0]
+        candidates = [t for t in tables[:i] if t.startswith(module + "_")]
+        for referenced in rng.sample(candidates, min(2, len(candidates))):
+            columns.append(f"{referenced}_id INTEGER REFERENCES {referenced}({referenced}_id)")
+        connection.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+        columns_by_table[table] = attributes
+        rows = [(n, *(f"{a} {n}" for a in attributes)) for n in range(1, ROWS_PER_TABLE + 1)]
+        connection.executemany(
+            f"INSERT INTO {table} ({table}_id, {', '.join(attributes)}) VALUES "
+            f"({', '.join('?' * (len(attributes) + 1))})",
+            rows,
+        )
+    connection.commit()
+    connection.close()
+    return [
+        (table, attribute)
+        for table, attributes in columns_by_table.items()
+        for attribute in attributes
+    ]
+
+
+def approximate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "many_tables.db"
+        targets = generate_database(path)
+        db = CachedSQLDatabase(create_sqlite_read_only_engine(str(path)))
+        n_tables = len(db.get_usable_table_names())
+
+        start = time.perf_counter()
+        full_table_info = db.get_table_info()
+        print(f"full table info:    {time.perf_counter() - start:5.2f}s ({n_tables} tables)")
+
+        start = time.perf_counter()
+        schema_index = SchemaIndex.build(db.engine)
+        print(f"schema index build: {time.perf_counter() - start:5.2f}s")
+        index_path = Path(directory) / "schema_index.pickle"
+        schema_index.save(index_path)
+        start = time.perf_counter()
+        schema_index = SchemaIndex.load(index_path)
+        print(f"schema index load:  {time.perf_counter() - start:5.3f}s")
+
+        rng = random.Random(1)
+        questions = []
+        for table, attribute in rng.sample(targets, N_QUERIES):
+            module, entity = table.split("_", 1)
+            questions.append(
+                (table, f"What is the {attribute.replace('_', ' ')} of each {module} {entity}?")
+            )
+
+        latencies, hits, prompt_tokens = [], 0, []
+        for table, question in questions:
+            start = time.perf_counter()
+            tables = schema_index.search(question)
+            latencies.append(time.perf_counter() - start)
+            hits += table in tables
+            tool = RelevantTablesTool(db=db, schema_index=schema_index, question=question)
+            prompt_tokens.append(approximate_tokens(tool.run("")))
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f"search latency:     p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+    print(f"target in top 5:    {hits / N_QUERIES:.0%}")
+    # Without the index, the agent lists all tables, then fetches the schema of those it picks
+    table_list_tokens = approximate_tokens(", ".join(db.get_usable_table_names()))
+    full_tokens = table_list_tokens + approximate_tokens(full_table_info)
+    print(f"~tokens, table list + full schema: {full_tokens:>8,}")
+    print(f"~tokens, table list alone:         {table_list_tokens:>8,}")
+    print(f"~tokens, relevant tables (median): {int(np.median(prompt_tokens)):>8,}")
+    print("The relevant tables tool also saves the agent's separate schema lookup round trip.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark: render calls and bytes pushed to the frontend while streaming a long answer.
+
+Streams a 2,000-token response into a fake Streamlit container, once with the previous
+render-per-token handler and once with the batched StreamHandler at a few settings.
+Tokens arrive on a simulated clock at a typical LLM rate, so the benchmark runs instantly.
+
+    python -m benchmarks.stream_rendering
+"""
+
+from __future__ import annotations
+
+from unittest import mock
+from uuid import uuid4
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+from streamlit_agent.callbacks import stream_handler
+from streamlit_agent.callbacks.stream_handler import StreamHandler
+
+N_TOKENS = 2000
+TOKENS_PER_SEC = 50
+TOKENS = [f" token{i}" for i in range(N_TOKENS)]
+
+
+class CountingContainer:
+    def __init__(self) -> None:
+        self.render_calls = 0
+        self.bytes_pushed = 0
+
+    def markdown(self, body: str) -> None:
+        self.render_calls += 1
+        self.bytes_pushed += len(body.encode("utf-8"))
+
+
+class PerTokenStreamHandler(BaseCallbackHandler):
+    """The StreamHandler the apps used before token batching."""
+
+    def __init__(self, container, initial_text=""):
+        self.container = container
+        self.text = initial_text
+
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        self.text += token
+        self.container.markdown(self.text)
+
+
+def stream(handler_factory) -> CountingContainer:
+    container = CountingContainer()
+    clock = [0.0]
+    with mock.patch.object(stream_handler.time, "monotonic", lambda: clock[0]):
+        handler = handler_factory(container)
+        for token in TOKENS:
+            clock[0] += 1 / TOKENS_PER_SEC
+            handler.on_llm_new_token(token)
+        handler.on_llm_end(None, run_id=uuid4())
+    return container
+
+
+def main() -> None:
+    cases = {
+        "per-token (before)": PerTokenStreamHandler,
+        "batched, 30 fps": lambda container: StreamHandler(container, max_fps=30),
+        "batched, 15 fps": lambda container: StreamHandler(container, max_fps=15),
+        "batched, 5 fps": lambda container: StreamHandler(container, max_fps=5),
+    }
+    print(f"{N_TOKENS} tokens at {TOKENS_PER_SEC} tokens/sec")
+    print(f"{'handler':<22}{'render calls':>14}{'bytes pushed':>16}")
+    for name, factory in cases.items():
+        container = stream(factory)
+        print(f"{name:<22}{container.render_calls:>14,}{container.bytes_pushed:>16,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""AgentExecutor that runs the tool calls of a step concurrently."""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentFinish, AgentStep
+from langchain_core.callbacks import CallbackManagerForChainRun, CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+
+
+class _StepResults:
+    """Observations of the tool calls of one agent step, computed on a thread pool.
+
+    The pool is only started when the first tool result is needed, as by then the agent
+    has yielded all actions of the step.
+    """
+
+    def __init__(self, tools: Dict[str, BaseTool], max_workers: int) -> None:
+        self.tools = tools
+        self.max_workers = max_workers
+        self.actions: List[AgentAction] = []
+        self._futures: List[Future[Any]] | None = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def _run(self, action: AgentAction) -> Any:
+        # Tool callbacks are reported on the calling thread, by _ConcurrentTool, so that
+        # Streamlit output stays in order
+        return self.tools[action.tool].run(action.tool_input, verbose=False, callbacks=None)
+
+    def next_result(self) -> Any:
+        """Wait for the observation of the next tool call, in the order of the actions."""
+        with self._lock:
+            if self._futures is None:
+                # Unknown tools are run by AgentExecutor as InvalidTool, without results here
+                actions = [action for action in self.actions if action.tool in self.tools]
+                pool = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(actions))))
+                self._futures = [pool.submit(self._run, action) for action in actions]
+                pool.shutdown(wait=False)
+            future = self._futures[self._next]
+            self._next += 1
+        return future.result()
+
+
+class _ConcurrentTool(BaseTool):
+    """Stands in for a tool in AgentExecutor's step, returning its observation from the step
+    results and reporting the tool's callbacks in order.
+    """
+
+    results: _StepResults
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _to_args_and_kwargs(self, tool_input: Union[str, Dict]) -> Tuple[Tuple, Dict]:
+        # The wrapped tool parses its input
+        return (), {}
+
+    def _run(self, run_manager: Optional[CallbackManagerForToolRun] = None) -> Any:
+        return self.results.next_result()
+
+
+class ParallelAgentExecutor(AgentExecutor):
+    """AgentExecutor that runs the tool calls of each agent step concurrently, on up to
+    `max_workers` threads, for agents that can request several tool calls at once (such as
+    OpenAI tools agents).
+
+    Observations are returned in the order of the actions, and tool start and end callbacks
+    are reported in that order from the agent's thread, so handlers like
+    StreamlitCallbackHandler render the same as with AgentExecutor. Callbacks from within
+    tools, such as those of a chain run by a tool, are not reported.
+    """
+
+    max_workers: int = 8
+
+    def _iter_next_step(
+        self,
+        name_to_tool_map: Dict[str, BaseTool],
+        color_mapping: Dict[str, str],
+        inputs: Dict[str, str],
+        intermediate_steps: List[Tuple[AgentAction, str]],
+        run_manager: Optional[CallbackManagerForChainRun] = None,
+    ) -> Iterator[Union[AgentFinish, AgentAction, AgentStep]]:
+        results = _StepResults(name_to_tool_map, self.max_workers)
+        concurrent_tools: Dict[str, BaseTool] = {
+            name: _ConcurrentTool(
+                name=tool.name,
+                description=tool.description,
+                return_direct=tool.return_direct,
+                results=results,
+            )
+            for name, tool in name_to_tool_map.items()
+        }
+        # AgentExecutor yields every action of the step before running any tool
+        for output in super()._iter_next_step(
+            concurrent_tools, color_mapping, inputs, intermediate_steps, run_manager
+        ):
+            if isinstance(output, AgentAction):
+                results.actions.append(output)
+            yield output
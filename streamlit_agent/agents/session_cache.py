@@ -0,0 +1,93 @@
+"""Per-session cache of agents and other resources that are expensive to set up."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, TypeVar
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+T = TypeVar("T")
+
+
+def current_session_id() -> str:
+    """Return the id of the Streamlit session running the script, or "" outside of one."""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else ""
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash secrets, such as API keys, and data identifiers into a cache key part."""
+    return hashlib.sha256("\0".join(map(str, parts)).encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    __slots__ = ("key", "value", "last_used")
+
+    def __init__(self, key: Hashable, value: Any, last_used: float) -> None:
+        self.key = key
+        self.value = value
+        self.last_used = last_used
+
+
+class SessionResourceCache:
+    """Keeps one resource per session and name, such as a session's agent, so it is
+    reused across reruns until its key changes.
+
+    The key holds whatever the resource was built from (e.g. the API key fingerprint,
+    model and data fingerprint); a different key rebuilds and replaces the resource.
+    Resources unused for `idle_ttl` seconds are evicted, as are the least recently used
+    beyond `max_entries`. Share one instance between sessions, e.g. with
+    `st.cache_resource`; it is thread-safe.
+    """
+
+    def __init__(self, idle_ttl: float = 30 * 60, max_entries: int = 100) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (session id, name) -> entry, in least- to most-recently-used order
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self, now: float) -> None:
+        cutoff = now - self.idle_ttl
+        while self._entries:
+            slot, entry = next(iter(self._entries.items()))
+            if entry.last_used >= cutoff and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[slot]
+
+    def get_or_create(self, name: str, key: Hashable, factory: Callable[[], T]) -> T:
+        """Return the current session's `name` resource built for `key`, or build it with
+        `factory`.
+        """
+        slot = (current_session_id(), name)
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                entry.last_used = time.monotonic()
+                self._entries.move_to_end(slot)
+                self._evict(entry.last_used)
+                return entry.value
+        # Built outside the lock, so that other sessions aren't blocked by slow setups
+        value = factory()
+        with self._lock:
+            self.misses += 1
+            now = time.monotonic()
+            self._entries[slot] = _Entry(key, value, now)
+            self._entries.move_to_end(slot)
+            self._evict(now)
+        return value
+
+    def discard(self, name: str) -> None:
+        """Forget the current session's `name` resource."""
+        with self._lock:
+            self._entries.pop((current_session_id(), name), None)
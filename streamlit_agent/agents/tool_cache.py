@@ -0,0 +1,209 @@
+"""Cache of tool results, shared by all sessions and optionally by processes."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from inspect import signature
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Type, Union
+
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.pydantic_v1 import BaseModel
+from langchain_core.tools import BaseTool
+
+
+def normalize_tool_input(tool_input: Union[str, Dict[str, Any]]) -> str:
+    """Collapse whitespace and case in string inputs, and in the string values of
+    structured inputs, so that trivially different inputs share a cache entry.
+    """
+    if isinstance(tool_input, str):
+        return " ".join(tool_input.split()).casefold()
+    normalized = {
+        key: normalize_tool_input(value) if isinstance(value, str) else value
+        for key, value in tool_input.items()
+    }
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+class ToolCacheStats(NamedTuple):
+    hits: int
+    disk_hits: int
+    misses: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / total if total else 0.0
+
+
+class ToolResultCache:
+    """LRU cache of tool results, keyed by tool name and normalized input, in memory and
+    optionally in a SQLite file.
+
+    Up to `max_entries` results are kept in memory. With `disk_path`, results are also
+    stored on disk, where they are shared with other processes using the same file, up
+    to `max_disk_entries`. Once there are more, expired and least recently used results
+    are evicted down to 90% of `max_disk_entries` in one go. Each result expires after the
+    TTL of its tool. Wrap tools with `wrap`. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        disk_path: str | os.PathLike[str] | None = None,
+        max_disk_entries: int = 100_000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._lock = threading.Lock()
+        # (tool, normalized input) -> (result, expiry time), least recently used first
+        self._entries: OrderedDict[Tuple[str, str], Tuple[Any, float]] = OrderedDict()
+        self._stats: Dict[str, list[int]] = {}
+        self._db: sqlite3.Connection | None = None
+        # Rows on disk, counting replaced rows and rows added by other processes only once
+        # the table is counted again, on eviction
+        self._disk_entries = 0
+        if disk_path is not None:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, result BLOB, expires_at REAL, used_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_used_at ON results (used_at)")
+            self._db.commit()
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def _count(self, tool: str, kind: int) -> None:
+        self._stats.setdefault(tool, [0, 0, 0])[kind] += 1
+
+    def stats(self) -> Dict[str, ToolCacheStats]:
+        """Return the hits, disk hits and misses of each tool."""
+        with self._lock:
+            return {tool: ToolCacheStats(*counts) for tool, counts in self._stats.items()}
+
+    @staticmethod
+    def _disk_key(tool: str, normalized: str) -> str:
+        return hashlib.sha256(f"{tool}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def get(self, tool: str, tool_input: Union[str, Dict[str, Any]]) -> Tuple[bool, Any]:
+        """Return whether a result is cached, and the result."""
+        normalized = normalize_tool_input(tool_input)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get((tool, normalized))
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end((tool, normalized))
+                self._count(tool, 0)
+                return True, entry[0]
+            if self._db is not None:
+                key = self._disk_key(tool, normalized)
+                row = self._db.execute(
+                    "SELECT result, expires_at FROM results WHERE key = ? AND expires_at > ?",
+                    (key, now),
+                ).fetchone()
+                if row is not None:
+                    # Disk entries are evicted least recently used first
+                    self._db.execute("UPDATE results SET used_at = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    result = pickle.loads(row[0])
+                    self._put_memory(tool, normalized, result, row[1])
+                    self._count(tool, 1)
+                    return True, result
+            self._count(tool, 2)
+            return False, None
+
+    def _put_memory(self, tool: str, normalized: str, result: Any, expires_at: float) -> None:
+        self._entries[(tool, normalized)] = (result, expires_at)
+        self._entries.move_to_end((tool, normalized))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(
+        self, tool: str, tool_input: Union[str, Dict[str, Any]], result: Any, ttl: float
+    ) -> None:
+        normalized = normalize_tool_input(tool_input)
+        now = time.time()
+        with self._lock:
+            self._put_memory(tool, normalized, result, now + ttl)
+            if self._db is None:
+                return
+            try:
+                data = pickle.dumps(result)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                return
+            self._db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (self._disk_key(tool, normalized), data, now + ttl, now),
+            )
+            self._disk_entries += 1
+            if self._disk_entries > self.max_disk_entries:
+                self._evict_disk(self._db, now)
+            self._db.commit()
+
+    def _evict_disk(self, db: sqlite3.Connection, now: float) -> None:
+        """Delete expired results, and the least recently used results beyond 90% of
+        `max_disk_entries`, so that the table is sorted once per batch of writes rather
+        than on every write. Call with `_lock` held.
+        """
+        db.execute(
+            "DELETE FROM results WHERE expires_at <= ? OR key IN (SELECT key FROM results "
+            "ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (now, self.max_disk_entries - self.max_disk_entries // 10),
+        )
+        self._disk_entries = db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+                self._disk_entries = 0
+
+    def wrap(self, tool: BaseTool, ttl: float = 60 * 60) -> CachedTool:
+        """Return a tool that returns cached results of `tool` for up to `ttl` seconds."""
+        return CachedTool(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            handle_tool_error=tool.handle_tool_error,
+            tool=tool,
+            cache=self,
+            ttl=ttl,
+        )
+
+
+class CachedTool(BaseTool):
+    """Runs a tool, or returns its cached result for the same normalized input."""
+
+    tool: BaseTool
+    cache: ToolResultCache
+    ttl: float
+    args_schema: Optional[Type[BaseModel]] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _run(
+        self, *args: Any, run_manager: Optional[CallbackManagerForToolRun] = None, **kwargs: Any
+    ) -> Any:
+        tool_input = args[0] if len(args) == 1 and not kwargs else {"args": args, **kwargs}
+        hit, result = self.cache.get(self.name, tool_input)
+        if hit:
+            return result
+        # Run the wrapped tool within this tool's run, so callbacks are reported once
+        if signature(self.tool._run).parameters.get("run_manager"):
+            kwargs["run_manager"] = run_manager
+        result = self.tool._run(*args, **kwargs)
+        self.cache.put(self.name, tool_input, result, self.ttl)
+        return result
@@ -1,24 +1,20 @@
-from langchain.callbacks.base import BaseCallbackHandler
 from langchain.schema import ChatMessage
 from langchain_openai import ChatOpenAI
 import streamlit as st
 
+from streamlit_agent.callbacks.stream_handler import StreamHandler
+from streamlit_agent.memory.token_budget_memory import TokenBudgetMemory
 
-class StreamHandler(BaseCallbackHandler):
-    def __init__(self, container, initial_text=""):
-        self.container = container
-        self.text = initial_text
-
-    def on_llm_new_token(self, token: str, **kwargs) -> None:
-        self.text += token
-        self.container.markdown(self.text)
-
+# Most tokens of earlier messages sent with each prompt
+HISTORY_TOKEN_BUDGET = 1000
 
 with st.sidebar:
     openai_api_key = st.text_input("OpenAI API Key", type="password")
 
 if "messages" not in st.session_state:
     st.session_state["messages"] = [ChatMessage(role="assistant", content="How can I help you?")]
+if "memory" not in st.session_state:
+    st.session_state["memory"] = TokenBudgetMemory(max_tokens=HISTORY_TOKEN_BUDGET)
 
 for msg in st.session_state.messages:
     st.chat_message(msg.role).write(msg.content)
@@ -31,8 +27,18 @@ if prompt := st.chat_input():
         st.info("Please add your OpenAI API key to continue.")
         st.stop()
 
+    # Send the earlier messages within the token budget, and the new prompt in full
+    memory = st.session_state.memory
+    memory.llm = ChatOpenAI(openai_api_key=openai_api_key)
+    messages = memory.budget_messages(st.session_state.messages[:-1])
+    messages.append(st.session_state.messages[-1])
+
     with st.chat_message("assistant"):
         stream_handler = StreamHandler(st.empty())
         llm = ChatOpenAI(openai_api_key=openai_api_key, streaming=True, callbacks=[stream_handler])
-        response = llm.invoke(st.session_state.messages)
+        response = llm.invoke(messages)
         st.session_state.messages.append(ChatMessage(role="assistant", content=response.content))
+    st.sidebar.caption(
+        f"Chat history: {memory.last_prompt_tokens} tokens sent, "
+        f"{memory.last_saved_tokens} saved by the token budget"
+    )
@@ -2,42 +2,59 @@
 
 from __future__ import annotations
 
+import asyncio
+import functools
+import inspect
+import itertools
+import math
+import operator
+import os
 import pickle
+import queue
+import shutil
+import threading
 import time
-from typing import Any, TypedDict
+from typing import IO, Any, Callable, Iterable, Iterator
 
 from langchain.callbacks.base import BaseCallbackHandler
 
+from streamlit_agent.callbacks.record_file import (
+    CallbackRecord,
+    CallbackType,
+    RecordFile,
+    append_segment,
+    create_record_file,
+    is_record_file,
+    write_records,
+)
 
-# This is intentionally not an enum so that we avoid serializing a
-# custom class with pickle.
-class CallbackType:
-    ON_LLM_START = "on_llm_start"
-    ON_LLM_NEW_TOKEN = "on_llm_new_token"
-    ON_LLM_END = "on_llm_end"
-    ON_LLM_ERROR = "on_llm_error"
-    ON_TOOL_START = "on_tool_start"
-    ON_TOOL_END = "on_tool_end"
-    ON_TOOL_ERROR = "on_tool_error"
-    ON_TEXT = "on_text"
-    ON_CHAIN_START = "on_chain_start"
-    ON_CHAIN_END = "on_chain_end"
-    ON_CHAIN_ERROR = "on_chain_error"
-    ON_AGENT_ACTION = "on_agent_action"
-    ON_AGENT_FINISH = "on_agent_finish"
-
-
-# We use TypedDict, rather than NamedTuple, so that we avoid serializing a
-# custom class with pickle. All of this class's members should be basic Python types.
-class CallbackRecord(TypedDict):
-    callback_type: str
-    args: tuple[Any, ...]
-    kwargs: dict[str, Any]
-    time_delta: float  # Number of seconds between this record and the previous one
+
+# Pass as `speed` to replay without any pauses.
+INSTANT = math.inf
+
+# Every callback type. Each is also the name of the BaseCallbackHandler method it maps to.
+_CALLBACK_TYPES = tuple(
+    value for name, value in vars(CallbackType).items() if not name.startswith("_")
+)
+
+
+def build_dispatch_table(
+    handlers: list[BaseCallbackHandler],
+) -> dict[str, tuple[Callable[..., Any], ...]]:
+    """Map each callback type to the handlers' bound methods for it, in handler order."""
+    return {
+        callback_type: tuple(getattr(handler, callback_type) for handler in handlers)
+        for callback_type in _CALLBACK_TYPES
+    }
 
 
 def load_records_from_file(path: str) -> list[CallbackRecord]:
-    """Load the list of CallbackRecords from a pickle file at the given path."""
+    """Load the list of CallbackRecords from a record file, or a legacy pickle file,
+    at the given path."""
+    if is_record_file(path):
+        with RecordFile(path) as record_file:
+            return list(record_file)
+
     with open(path, "rb") as file:
         records = pickle.load(file)
 
@@ -46,55 +63,221 @@ def load_records_from_file(path: str) -> list[CallbackRecord]:
     return records
 
 
+def _seek_index(time_deltas: Iterable[float], start_time: float) -> int:
+    """Return the index of the first record at or after `start_time` seconds into a session."""
+    elapsed = 0.0
+    index = 0
+    for index, time_delta in enumerate(time_deltas):
+        elapsed += time_delta
+        if elapsed >= start_time:
+            return index
+    return index + 1
+
+
+def _seek_records(
+    records: list[CallbackRecord], start_index: int = 0, start_time: float = 0.0
+) -> Iterator[CallbackRecord]:
+    if start_time > 0:
+        time_deltas = (record["time_delta"] for record in records)
+        start_index = max(start_index, _seek_index(time_deltas, start_time))
+    return itertools.islice(records, start_index, None)
+
+
+def iter_records_from_file(
+    path: str, start_index: int = 0, start_time: float = 0.0
+) -> Iterator[CallbackRecord]:
+    """Lazily iterate the CallbackRecords in the file at the given path.
+
+    Record files are memory-mapped and decoded one record at a time. Legacy pickle files
+    can't be read incrementally, so they are loaded in full before the first record is
+    yielded; convert them with `record_file.convert_pickle_file` to avoid that.
+
+    Iteration begins at the later of record `start_index` and the first record at or after
+    `start_time` seconds into the session. Skipped records are not decoded.
+    """
+    if not is_record_file(path):
+        yield from _seek_records(load_records_from_file(path), start_index, start_time)
+        return
+
+    with RecordFile(path) as record_file:
+        if start_time > 0:
+            start_index = max(start_index, _seek_index(record_file.iter_time_deltas(), start_time))
+        yield from record_file.iter_records(start_index)
+
+
+def _token_text(record: CallbackRecord) -> str:
+    return record["args"][0] if record["args"] else record["kwargs"]["token"]
+
+
+def _can_coalesce(first: CallbackRecord, record: CallbackRecord) -> bool:
+    return (
+        record["callback_type"] == CallbackType.ON_LLM_NEW_TOKEN
+        and len(record["args"]) == len(first["args"])
+        and record["kwargs"].get("run_id") == first["kwargs"].get("run_id")
+    )
+
+
+def _coalesce_tokens(records: list[CallbackRecord]) -> CallbackRecord:
+    """Merge consecutive token records of one LLM run into a single token record."""
+    first = records[0]
+    if len(records) == 1:
+        return first
+
+    text = "".join(_token_text(record) for record in records)
+    kwargs = dict(first["kwargs"])
+    if all("chunk" in record["kwargs"] for record in records):
+        # Generation chunks support concatenation with `+`.
+        kwargs["chunk"] = functools.reduce(
+            operator.add, (record["kwargs"]["chunk"] for record in records)
+        )
+    else:
+        kwargs.pop("chunk", None)
+    if first["args"]:
+        args: tuple[Any, ...] = (text, *first["args"][1:])
+    else:
+        args = first["args"]
+        kwargs["token"] = text
+    return CallbackRecord(
+        callback_type=CallbackType.ON_LLM_NEW_TOKEN,
+        args=args,
+        kwargs=kwargs,
+        time_delta=sum(record["time_delta"] for record in records),
+    )
+
+
+def schedule_records(
+    records: Iterable[CallbackRecord],
+    max_pause_time: float,
+    speed: float = 1.0,
+    frame_interval: float = 0.0,
+) -> Iterator[tuple[float, CallbackRecord]]:
+    """Pace CallbackRecords for playback, yielding (pause_time, record) pairs.
+
+    Each record's `time_delta` is capped at `max_pause_time` and then divided by `speed`;
+    pass `speed=INSTANT` to skip pauses entirely. Consecutive tokens of the same LLM run
+    that would play within `frame_interval` seconds of the first are coalesced into one
+    token record, paused for their combined time, so handlers render once per frame.
+    """
+    if speed <= 0:
+        raise ValueError(f"speed must be positive, got {speed}")
+
+    pending: list[CallbackRecord] = []
+    pending_pause = 0.0  # Pause before the first pending token
+    frame_time = 0.0  # Playback time from the first pending token to the last
+    for record in records:
+        pause_time = min(record["time_delta"], max_pause_time) / speed
+        if (
+            pending
+            and _can_coalesce(pending[0], record)
+            and frame_time + pause_time <= frame_interval
+        ):
+            pending.append(record)
+            frame_time += pause_time
+            continue
+
+        if pending:
+            yield pending_pause + frame_time, _coalesce_tokens(pending)
+            pending = []
+
+        if frame_interval > 0 and record["callback_type"] == CallbackType.ON_LLM_NEW_TOKEN:
+            pending = [record]
+            pending_pause = pause_time
+            frame_time = 0.0
+        else:
+            yield pause_time, record
+
+    if pending:
+        yield pending_pause + frame_time, _coalesce_tokens(pending)
+
+
 def playback_callbacks(
     handlers: list[BaseCallbackHandler],
     records_or_filename: list[CallbackRecord] | str,
     max_pause_time: float,
+    *,
+    speed: float = 1.0,
+    frame_interval: float = 0.0,
+    start_index: int = 0,
+    start_time: float = 0.0,
 ) -> str:
+    """Replay CallbackRecords to the given handlers and return the agent's result.
+
+    Records are dispatched as they are read, so playback of a record file starts
+    immediately and memory use doesn't grow with the length of the session.
+
+    Pacing is controlled by `max_pause_time`, `speed` and `frame_interval`, as described
+    in `schedule_records`. `start_index` and `start_time` seek into the session: records
+    before the seek point are skipped without being dispatched, so the returned result
+    only reflects the records that were replayed.
+    """
     if isinstance(records_or_filename, list):
-        records = records_or_filename
+        records = _seek_records(records_or_filename, start_index, start_time)
     else:
-        records = load_records_from_file(records_or_filename)
+        records = iter_records_from_file(records_or_filename, start_index, start_time)
 
-    for record in records:
-        pause_time = min(record["time_delta"], max_pause_time)
+    dispatch = build_dispatch_table(handlers)
+    result = None
+    for pause_time, record in schedule_records(records, max_pause_time, speed, frame_interval):
         if pause_time > 0:
             time.sleep(pause_time)
 
-        for handler in handlers:
-            if record["callback_type"] == CallbackType.ON_LLM_START:
-                handler.on_llm_start(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_LLM_NEW_TOKEN:
-                handler.on_llm_new_token(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_LLM_END:
-                handler.on_llm_end(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_LLM_ERROR:
-                handler.on_llm_error(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_TOOL_START:
-                handler.on_tool_start(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_TOOL_END:
-                handler.on_tool_end(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_TOOL_ERROR:
-                handler.on_tool_error(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_TEXT:
-                handler.on_text(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_CHAIN_START:
-                handler.on_chain_start(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_CHAIN_END:
-                handler.on_chain_end(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_CHAIN_ERROR:
-                handler.on_chain_error(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_AGENT_ACTION:
-                handler.on_agent_action(*record["args"], **record["kwargs"])
-            elif record["callback_type"] == CallbackType.ON_AGENT_FINISH:
-                handler.on_agent_finish(*record["args"], **record["kwargs"])
-
-    # Return the agent's result
-    for record in records:
-        if record["callback_type"] == CallbackType.ON_AGENT_FINISH:
-            return record["args"][0].return_values
+        callback_type, args, kwargs = record["callback_type"], record["args"], record["kwargs"]
+        for method in dispatch.get(callback_type, ()):
+            method(*args, **kwargs)
+
+        # Remember the agent's result
+        if result is None and callback_type == CallbackType.ON_AGENT_FINISH:
+            result = args[0].return_values
+
+    if result is None:
+        return "[Missing Agent Result]"
+    return result
+
+
+async def aplayback_callbacks(
+    handlers: list[BaseCallbackHandler],
+    records_or_filename: list[CallbackRecord] | str,
+    max_pause_time: float,
+    *,
+    speed: float = 1.0,
+    frame_interval: float = 0.0,
+    start_index: int = 0,
+    start_time: float = 0.0,
+) -> str:
+    """Async version of `playback_callbacks`.
+
+    Pauses are awaited rather than slept, and handler methods that return awaitables
+    (e.g. those of an `AsyncCallbackHandler`) are awaited in handler order. Many
+    replays can run concurrently on one event loop, e.g. with `asyncio.gather`.
+    """
+    if isinstance(records_or_filename, list):
+        records = _seek_records(records_or_filename, start_index, start_time)
+    elif is_record_file(records_or_filename):
+        records = iter_records_from_file(records_or_filename, start_index, start_time)
+    else:
+        # Legacy pickles are loaded in full, so keep that off the event loop.
+        all_records = await asyncio.to_thread(load_records_from_file, records_or_filename)
+        records = _seek_records(all_records, start_index, start_time)
+
+    dispatch = build_dispatch_table(handlers)
+    result = None
+    for pause_time, record in schedule_records(records, max_pause_time, speed, frame_interval):
+        if pause_time > 0:
+            await asyncio.sleep(pause_time)
+
+        callback_type, args, kwargs = record["callback_type"], record["args"], record["kwargs"]
+        for method in dispatch.get(callback_type, ()):
+            handler_result = method(*args, **kwargs)
+            if inspect.isawaitable(handler_result):
+                await handler_result
+
+        # Remember the agent's result
+        if result is None and callback_type == CallbackType.ON_AGENT_FINISH:
+            result = args[0].return_values
 
-    return "[Missing Agent Result]"
+    if result is None:
+        return "[Missing Agent Result]"
+    return result
 
 
 class CapturingCallbackHandler(BaseCallbackHandler):
@@ -103,9 +286,8 @@ class CapturingCallbackHandler(BaseCallbackHandler):
         self._last_time: float | None = None
 
     def dump_records_to_file(self, path: str) -> None:
-        """Write the list of CallbackRecords to a pickle file at the given path."""
-        with open(path, "wb") as file:
-            pickle.dump(self._records, file)
+        """Write the list of CallbackRecords to a record file at the given path."""
+        write_records(path, self._records)
 
     def _append_record(self, type: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> None:
         time_now = time.time()
@@ -153,3 +335,178 @@ class CapturingCallbackHandler(BaseCallbackHandler):
 
     def on_agent_finish(self, *args: Any, **kwargs: Any) -> None:
         self._append_record(CallbackType.ON_AGENT_FINISH, args, kwargs)
+
+
+class _CapturedEvent:
+    """A callback captured by BufferedCapturingCallbackHandler, awaiting its flush."""
+
+    __slots__ = ("callback_type", "args", "kwargs", "time_ns")
+
+    def __init__(
+        self, callback_type: str, args: tuple[Any, ...], kwargs: dict[str, Any], time_ns: int
+    ) -> None:
+        self.callback_type = callback_type
+        self.args = args
+        self.kwargs = kwargs
+        self.time_ns = time_ns
+
+
+class BufferedCapturingCallbackHandler(CapturingCallbackHandler):
+    """Captures callbacks straight to an append-only record file, for long-running agents.
+
+    Callbacks are buffered in memory until `max_buffered_records` have accumulated or
+    `flush_interval` seconds have passed, and are then appended to the file as a new
+    segment by a background thread. At most `max_pending_batches` full buffers wait for
+    the writer; beyond that, capturing blocks until the writer catches up, so memory
+    stays bounded. Everything flushed before a crash can still be played back.
+
+    Call `close()` (or use the handler as a context manager) to flush the remaining
+    records and stop the writer thread.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_buffered_records: int = 1000,
+        flush_interval: float = 1.0,
+        max_pending_batches: int = 4,
+    ) -> None:
+        self.path = path
+        create_record_file(path)
+        self._max_buffered_records = max_buffered_records
+        self._flush_interval = flush_interval
+        self._buffer: list[_CapturedEvent] = []
+        self._lock = threading.Lock()
+        self._last_time_ns: int | None = None
+        # Batches are numbered when they are taken from the buffer, and queued outside the
+        # lock, so they can reach the writer out of order; it writes them in order.
+        self._next_sequence = 0
+        self._batches: queue.Queue[tuple[int, list[_CapturedEvent] | None]] = queue.Queue(
+            maxsize=max_pending_batches
+        )
+        self._written = threading.Condition()
+        self._written_count = 0
+        self._error: BaseException | None = None
+        self._closed = False
+        self._writer = threading.Thread(
+            target=self._write_batches, name="BufferedCapturingCallbackHandler", daemon=True
+        )
+        self._writer.start()
+
+    def __enter__(self) -> BufferedCapturingCallbackHandler:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _append_record(self, type: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> None:
+        event = _CapturedEvent(type, args, kwargs, time.perf_counter_ns())
+        batch = None
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.__class__.__name__} is closed")
+            self._buffer.append(event)
+            if len(self._buffer) >= self._max_buffered_records:
+                batch = self._take_buffer()
+        # Never block on a full queue while holding the lock, which the writer takes too
+        if batch is not None:
+            self._batches.put(batch)
+
+    def _take_buffer(self) -> tuple[int, list[_CapturedEvent]]:
+        """Number the buffered records as the next batch, and start a new buffer. Call with
+        `_lock` held."""
+        batch = (self._next_sequence, self._buffer)
+        self._next_sequence += 1
+        self._buffer = []
+        return batch
+
+    def _write_batches(self) -> None:
+        pending: dict[int, list[_CapturedEvent] | None] = {}
+        with open(self.path, "ab") as file:
+            while True:
+                try:
+                    sequence, batch = self._batches.get(timeout=self._flush_interval)
+                except queue.Empty:
+                    # Nothing filled up in a while; write whatever has been captured so far.
+                    # This thread is the only consumer, so it keeps the batch itself rather
+                    # than queueing it.
+                    with self._lock:
+                        if not self._buffer:
+                            continue
+                        sequence, batch = self._take_buffer()
+                pending[sequence] = batch
+
+                while self._written_count in pending:
+                    batch = pending.pop(self._written_count)
+                    if batch is not None:
+                        self._write_batch(file, batch)
+                    with self._written:
+                        self._written_count += 1
+                        self._written.notify_all()
+                    if batch is None:
+                        return
+
+    def _write_batch(self, file: IO[bytes], batch: list[_CapturedEvent]) -> None:
+        records = []
+        for event in batch:
+            time_delta = (
+                (event.time_ns - self._last_time_ns) / 1e9 if self._last_time_ns is not None else 0
+            )
+            self._last_time_ns = event.time_ns
+            records.append(
+                CallbackRecord(
+                    callback_type=event.callback_type,
+                    args=event.args,
+                    kwargs=event.kwargs,
+                    time_delta=time_delta,
+                )
+            )
+        try:
+            append_segment(file, records)
+            file.flush()
+            os.fsync(file.fileno())
+        except Exception as e:
+            # Keep draining batches, so that capturing never blocks on a failed writer.
+            self._error = self._error or e
+
+    def flush(self) -> None:
+        """Write all captured records to the file, and wait for them to be written."""
+        batch = None
+        with self._lock:
+            if self._buffer:
+                batch = self._take_buffer()
+            count = self._next_sequence
+        if batch is not None:
+            self._batches.put(batch)
+        with self._written:
+            self._written.wait_for(lambda: self._written_count >= count)
+        self._raise_write_error()
+
+    def _raise_write_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Failed to write CallbackRecords to {self.path}") from self._error
+
+    def close(self) -> None:
+        """Flush the remaining records and stop the writer thread."""
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            # Stop the writer even if records couldn't be written, after any captured since
+            with self._lock:
+                self._closed = True
+                batches: list[tuple[int, list[_CapturedEvent] | None]] = []
+                if self._buffer:
+                    batches.append(self._take_buffer())
+                batches.append((self._next_sequence, None))
+                self._next_sequence += 1
+            for batch in batches:
+                self._batches.put(batch)
+            self._writer.join()
+        self._raise_write_error()
+
+    def dump_records_to_file(self, path: str) -> None:
+        """Copy all records captured so far to a record file at the given path."""
+        self.flush()
+        shutil.copyfile(self.path, path)
@@ -0,0 +1,443 @@
+"""Compact, memory-mappable on-disk format for captured callback sessions.
+
+A record file is a small file header followed by one or more self-contained segments.
+Each segment stores its events column-wise:
+
+- a type code, a `time_delta` and a payload index per event;
+- `on_llm_new_token` payloads as UTF-8 text in one contiguous buffer, addressed by an
+  offsets array, plus an index into a small table of de-duplicated kwargs "templates"
+  (`run_id`, `tags`, ...), since those are shared by every token of an LLM run;
+- every other event as an individually pickled and zlib-compressed
+  `(callback_type, args, kwargs)` blob.
+
+Readers memory-map the file and decode records lazily, one at a time. Because segments
+are independent, writers can append new segments to an existing file; a truncated
+trailing segment (e.g. from a crash mid-write) is ignored when reading.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import struct
+import sys
+import zlib
+from array import array
+from typing import IO, Any, Iterable, Iterator, TypedDict
+
+from langchain_core.outputs import GenerationChunk
+
+MAGIC = b"SACR"
+FORMAT_VERSION = 1
+
+# magic, format version, byte order (0 = little, 1 = big), padding
+_FILE_HEADER = struct.Struct("<4sHBx")
+# body size, n_events, n_tokens, n_templates, n_other, token/template/other buffer sizes
+_SEGMENT_HEADER = struct.Struct("=8Q")
+_BYTE_ORDER = 0 if sys.byteorder == "little" else 1
+_ALIGNMENT = 8
+
+
+# This is intentionally not an enum so that we avoid serializing a
+# custom class with pickle.
+class CallbackType:
+    ON_LLM_START = "on_llm_start"
+    ON_LLM_NEW_TOKEN = "on_llm_new_token"
+    ON_LLM_END = "on_llm_end"
+    ON_LLM_ERROR = "on_llm_error"
+    ON_TOOL_START = "on_tool_start"
+    ON_TOOL_END = "on_tool_end"
+    ON_TOOL_ERROR = "on_tool_error"
+    ON_TEXT = "on_text"
+    ON_CHAIN_START = "on_chain_start"
+    ON_CHAIN_END = "on_chain_end"
+    ON_CHAIN_ERROR = "on_chain_error"
+    ON_AGENT_ACTION = "on_agent_action"
+    ON_AGENT_FINISH = "on_agent_finish"
+
+
+# We use TypedDict, rather than NamedTuple, so that we avoid serializing a
+# custom class with pickle. All of this class's members should be basic Python types.
+class CallbackRecord(TypedDict):
+    callback_type: str
+    args: tuple[Any, ...]
+    kwargs: dict[str, Any]
+    time_delta: float  # Number of seconds between this record and the previous one
+
+
+# Type codes are positions in this tuple. Never reorder it: codes are stored on disk.
+_CALLBACK_TYPES = (
+    CallbackType.ON_LLM_START,
+    CallbackType.ON_LLM_NEW_TOKEN,
+    CallbackType.ON_LLM_END,
+    CallbackType.ON_LLM_ERROR,
+    CallbackType.ON_TOOL_START,
+    CallbackType.ON_TOOL_END,
+    CallbackType.ON_TOOL_ERROR,
+    CallbackType.ON_TEXT,
+    CallbackType.ON_CHAIN_START,
+    CallbackType.ON_CHAIN_END,
+    CallbackType.ON_CHAIN_ERROR,
+    CallbackType.ON_AGENT_ACTION,
+    CallbackType.ON_AGENT_FINISH,
+)
+_TYPE_CODES = {callback_type: code for code, callback_type in enumerate(_CALLBACK_TYPES)}
+_COMPACT_TOKEN = 0xFE  # An on_llm_new_token event stored in the token columns
+_UNKNOWN_TYPE = 0xFF  # Any other callback type; the type name is kept in the pickled payload
+
+
+def _padded(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _token_template(record: CallbackRecord) -> tuple[str, tuple[Any, ...]] | None:
+    """Split a token event into its text and a hashable-by-pickle template of everything else.
+
+    Returns None if the event can't be reconstructed exactly from (text, template), in which
+    case it is stored like any other event.
+    """
+    args, kwargs = record["args"], record["kwargs"]
+    if len(args) == 1 and "token" not in kwargs:
+        token, token_in_args = args[0], True
+    elif not args and "token" in kwargs:
+        token, token_in_args = kwargs["token"], False
+    else:
+        return None
+    if not isinstance(token, str):
+        return None
+
+    # Keep placeholders for the per-token values, so kwargs keep their original order.
+    rest = dict(kwargs)
+    chunk_info: tuple[Any, ...] | None = None
+    if "token" in rest:
+        rest["token"] = None
+    if "chunk" in rest:
+        chunk = rest["chunk"]
+        if type(chunk) is not GenerationChunk or chunk.text != token:
+            return None
+        chunk_info = (chunk.generation_info,)
+        rest["chunk"] = None
+    return token, (token_in_args, rest, chunk_info)
+
+
+def _record_from_template(
+    token: str, template: tuple[Any, ...], time_delta: float
+) -> CallbackRecord:
+    token_in_args, rest, chunk_info = template
+    kwargs = dict(rest)
+    if chunk_info is not None:
+        (generation_info,) = chunk_info
+        kwargs["chunk"] = GenerationChunk(
+            text=token,
+            generation_info=dict(generation_info) if generation_info is not None else None,
+        )
+    if token_in_args:
+        args: tuple[Any, ...] = (token,)
+    else:
+        args = ()
+        kwargs["token"] = token
+    return CallbackRecord(
+        callback_type=CallbackType.ON_LLM_NEW_TOKEN, args=args, kwargs=kwargs, time_delta=time_delta
+    )
+
+
+def encode_segment(records: Iterable[CallbackRecord]) -> bytes:
+    """Encode CallbackRecords as a single self-contained segment."""
+    types = array("B")
+    deltas = array("d")
+    indices = array("I")
+    token_offsets = array("Q", [0])
+    token_templates = array("I")
+    token_buf = bytearray()
+    template_ids: dict[bytes, int] = {}
+    template_offsets = array("Q", [0])
+    template_buf = bytearray()
+    other_offsets = array("Q", [0])
+    other_buf = bytearray()
+
+    for record in records:
+        deltas.append(float(record["time_delta"]))
+        split = None
+        if record["callback_type"] == CallbackType.ON_LLM_NEW_TOKEN:
+            split = _token_template(record)
+
+        if split is not None:
+            token, template = split
+            template_bytes = pickle.dumps(template, protocol=pickle.HIGHEST_PROTOCOL)
+            template_id = template_ids.get(template_bytes)
+            if template_id is None:
+                template_id = template_ids[template_bytes] = len(template_ids)
+                template_buf += template_bytes
+                template_offsets.append(len(template_buf))
+            types.append(_COMPACT_TOKEN)
+            indices.append(len(token_templates))
+            token_templates.append(template_id)
+            token_buf += token.encode("utf-8")
+            token_offsets.append(len(token_buf))
+        else:
+            types.append(_TYPE_CODES.get(record["callback_type"], _UNKNOWN_TYPE))
+            indices.append(len(other_offsets) - 1)
+            other_buf += zlib.compress(
+                pickle.dumps(
+                    (record["callback_type"], record["args"], record["kwargs"]),
+                    protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            )
+            other_offsets.append(len(other_buf))
+
+    body = bytearray()
+    for section in (
+        types.tobytes(),
+        deltas.tobytes(),
+        indices.tobytes(),
+        token_offsets.tobytes(),
+        token_templates.tobytes(),
+        token_buf,
+        template_offsets.tobytes(),
+        template_buf,
+        other_offsets.tobytes(),
+        other_buf,
+    ):
+        body += section
+        body += bytes(_padded(len(section)) - len(section))
+
+    header = _SEGMENT_HEADER.pack(
+        len(body),
+        len(types),
+        len(token_templates),
+        len(template_ids),
+        len(other_offsets) - 1,
+        len(token_buf),
+        len(template_buf),
+        len(other_buf),
+    )
+    return header + body
+
+
+def _file_header() -> bytes:
+    return _FILE_HEADER.pack(MAGIC, FORMAT_VERSION, _BYTE_ORDER)
+
+
+def write_records(path: str, records: Iterable[CallbackRecord]) -> None:
+    """Write CallbackRecords to a new record file at the given path."""
+    with open(path, "wb") as file:
+        file.write(_file_header())
+        file.write(encode_segment(records))
+
+
+def create_record_file(path: str) -> None:
+    """Create a record file without records at the given path, unless the file exists and
+    isn't empty, so that a session without any callbacks can still be played back."""
+    with open(path, "ab") as file:
+        if file.tell() == 0:
+            file.write(_file_header())
+
+
+def append_segment(file: IO[bytes], records: Iterable[CallbackRecord]) -> None:
+    """Append CallbackRecords as a new segment to a record file opened in append mode.
+
+    The file header is written first if the file is empty.
+    """
+    if file.tell() == 0:
+        file.write(_file_header())
+    file.write(encode_segment(records))
+
+
+def is_record_file(path: str) -> bool:
+    """Return True if the file at the given path starts with the record file magic."""
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+class _Segment:
+    def __init__(self, view: memoryview, counts: tuple[int, ...], start_index: int) -> None:
+        n_events, n_tokens, n_templates, n_other, token_size, template_size, other_size = counts
+        self.start_index = start_index
+        self.n_events = n_events
+        self._views: list[memoryview] = []
+        self._templates: dict[int, tuple[Any, ...]] = {}
+
+        position = 0
+
+        def take(size: int, fmt: str = "B") -> memoryview:
+            nonlocal position
+            section = view[position : position + size * struct.calcsize(fmt)]
+            position += _padded(len(section))
+            if fmt != "B":
+                section = section.cast(fmt)
+            self._views.append(section)
+            return section
+
+        self.types = take(n_events)
+        self.deltas = take(n_events, "d")
+        self.indices = take(n_events, "I")
+        self.token_offsets = take(n_tokens + 1, "Q")
+        self.token_templates = take(n_tokens, "I")
+        self.token_buf = take(token_size)
+        self.template_offsets = take(n_templates + 1, "Q")
+        self.template_buf = take(template_size)
+        self.other_offsets = take(n_other + 1, "Q")
+        self.other_buf = take(other_size)
+        # Released last, after the section views that were sliced from it.
+        self._views.append(view)
+
+    def callback_type(self, i: int) -> str:
+        code = self.types[i]
+        if code == _COMPACT_TOKEN:
+            return CallbackType.ON_LLM_NEW_TOKEN
+        if code != _UNKNOWN_TYPE:
+            return _CALLBACK_TYPES[code]
+        return self.record(i)["callback_type"]
+
+    def record(self, i: int) -> CallbackRecord:
+        index = self.indices[i]
+        if self.types[i] == _COMPACT_TOKEN:
+            token = str(
+                self.token_buf[self.token_offsets[index] : self.token_offsets[index + 1]], "utf-8"
+            )
+            return _record_from_template(
+                token, self._template(self.token_templates[index]), self.deltas[i]
+            )
+
+        callback_type, args, kwargs = pickle.loads(
+            zlib.decompress(
+                self.other_buf[self.other_offsets[index] : self.other_offsets[index + 1]]
+            )
+        )
+        return CallbackRecord(
+            callback_type=callback_type, args=args, kwargs=kwargs, time_delta=self.deltas[i]
+        )
+
+    def _template(self, template_id: int) -> tuple[Any, ...]:
+        template = self._templates.get(template_id)
+        if template is None:
+            start, end = self.template_offsets[template_id], self.template_offsets[template_id + 1]
+            template = self._templates[template_id] = pickle.loads(self.template_buf[start:end])
+        return template
+
+    def release(self) -> None:
+        for view in self._views:
+            view.release()
+        self._views.clear()
+
+
+class RecordFile:
+    """Read-only, memory-mapped view of a record file.
+
+    Records are decoded lazily as they are accessed, so opening a file and iterating the
+    first few records costs the same regardless of how long the session is.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._segments: list[_Segment] = []
+        try:
+            self._read_segments()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_segments(self) -> None:
+        if len(self._view) < _FILE_HEADER.size:
+            raise RuntimeError(f"Bad CallbackRecord data in {self.path}")
+        magic, version, byte_order = _FILE_HEADER.unpack_from(self._view)
+        if magic != MAGIC:
+            raise RuntimeError(f"Bad CallbackRecord data in {self.path}")
+        if version != FORMAT_VERSION:
+            raise RuntimeError(
+                f"Unsupported CallbackRecord format version {version} in {self.path}"
+            )
+        if byte_order != _BYTE_ORDER:
+            raise RuntimeError(f"CallbackRecord data in {self.path} has a foreign byte order")
+
+        position = _FILE_HEADER.size
+        n_records = 0
+        while position + _SEGMENT_HEADER.size <= len(self._view):
+            body_size, *counts = _SEGMENT_HEADER.unpack_from(self._view, position)
+            body_start = position + _SEGMENT_HEADER.size
+            if body_start + body_size > len(self._view):
+                # A partially written trailing segment; everything before it is intact.
+                break
+            segment = _Segment(self._view[body_start : body_start + body_size], counts, n_records)
+            self._segments.append(segment)
+            n_records += segment.n_events
+            position = body_start + body_size
+        self._len = n_records
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[CallbackRecord]:
+        return self.iter_records()
+
+    def __enter__(self) -> RecordFile:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("record index out of range")
+        for segment_number, segment in enumerate(self._segments):
+            if index < segment.start_index + segment.n_events:
+                return segment_number, index - segment.start_index
+        raise IndexError("record index out of range")
+
+    def __getitem__(self, index: int) -> CallbackRecord:
+        segment_number, i = self._locate(index)
+        return self._segments[segment_number].record(i)
+
+    def callback_type(self, index: int) -> str:
+        """Return the callback type of the record at the given index, without decoding it."""
+        segment_number, i = self._locate(index)
+        return self._segments[segment_number].callback_type(i)
+
+    def iter_records(self, start: int = 0) -> Iterator[CallbackRecord]:
+        """Lazily decode records in order, beginning at the given record index."""
+        for segment in self._segments:
+            first = max(start - segment.start_index, 0)
+            for i in range(first, segment.n_events):
+                yield segment.record(i)
+
+    def iter_time_deltas(self) -> Iterator[float]:
+        """Iterate every record's `time_delta` without decoding the records."""
+        for segment in self._segments:
+            yield from segment.deltas
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.release()
+        self._segments.clear()
+        self._view.release()
+        self._mmap.close()
+
+
+def convert_pickle_file(src_path: str, dest_path: str) -> int:
+    """Convert a legacy pickled `list[CallbackRecord]` to a record file.
+
+    Returns the number of records converted.
+    """
+    with open(src_path, "rb") as file:
+        records = pickle.load(file)
+
+    if not isinstance(records, list):
+        raise RuntimeError(f"Bad CallbackRecord data in {src_path}")
+
+    tmp_path = f"{dest_path}.tmp"
+    write_records(tmp_path, records)
+    os.replace(tmp_path, dest_path)
+    return len(records)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m streamlit_agent.callbacks.record_file SRC.pickle DEST")
+    count = convert_pickle_file(sys.argv[1], sys.argv[2])
+    print(f"Converted {count} records from {sys.argv[1]} to {sys.argv[2]}")
@@ -0,0 +1,61 @@
+"""Callback Handler that streams LLM tokens into a Streamlit container."""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from langchain.callbacks.base import BaseCallbackHandler
+
+
+class StreamHandler(BaseCallbackHandler):
+    """Renders streamed LLM tokens as markdown in a Streamlit container.
+
+    Every render re-sends the whole response so far, so rendering on every token is
+    quadratic in the length of the response. Instead, tokens are buffered and the
+    container is re-rendered at most `max_fps` times per second, or as soon as
+    `max_buffered_tokens` tokens are pending, plus a final render when the LLM finishes.
+    """
+
+    def __init__(
+        self,
+        container: Any,
+        initial_text: str = "",
+        max_fps: float = 15,
+        max_buffered_tokens: int = 100,
+    ) -> None:
+        self.container = container
+        self._text = initial_text
+        self._pending: list[str] = []
+        self._min_render_interval = 1 / max_fps
+        self._max_buffered_tokens = max_buffered_tokens
+        self._last_render_time: float | None = None
+
+    @property
+    def text(self) -> str:
+        """The full response so far, including tokens that haven't been rendered yet."""
+        return self._text + "".join(self._pending)
+
+    def flush(self) -> None:
+        """Render any pending tokens."""
+        if not self._pending:
+            return
+        self._text += "".join(self._pending)
+        self._pending.clear()
+        self.container.markdown(self._text)
+        self._last_render_time = time.monotonic()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._pending.append(token)
+        if (
+            self._last_render_time is None
+            or len(self._pending) >= self._max_buffered_tokens
+            or time.monotonic() - self._last_render_time >= self._min_render_interval
+        ):
+            self.flush()
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        self.flush()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.flush()
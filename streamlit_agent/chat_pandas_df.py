@@ -5,6 +5,12 @@ from langchain.chat_models import ChatOpenAI
 import streamlit as st
 import pandas as pd
 import os
+import time
+from pathlib import Path
+
+from streamlit_agent.agents.session_cache import SessionResourceCache, fingerprint
+from streamlit_agent.dataframes.chunked_frame import ChunkedFrame, agent_prefix
+from streamlit_agent.dataframes.loading import ParquetFrameCache, load_dataframe
 
 file_formats = {
     "csv": pd.read_csv,
@@ -13,6 +19,13 @@ file_formats = {
     "xlsm": pd.read_excel,
     "xlsb": pd.read_excel,
 }
+PARQUET_CACHE_DIR = Path.home() / ".cache" / "streamlit_agent" / "dataframes"
+CHUNKED_CACHE_DIR = Path.home() / ".cache" / "streamlit_agent" / "chunked_dataframes"
+# CSV files larger than this are queried from disk instead of loaded into memory
+OUT_OF_CORE_BYTES = 100 * 1024 * 1024
+MODEL = "gpt-3.5-turbo-0613"
+# Seconds after which an idle session's agent is dropped
+AGENT_IDLE_TTL = 30 * 60
 
 
 def clear_submit():
@@ -24,6 +37,39 @@ def clear_submit():
     st.session_state["submit"] = False
 
 
+@st.cache_resource
+def get_parquet_cache():
+    return ParquetFrameCache(PARQUET_CACHE_DIR)
+
+
+@st.cache_resource
+def get_agent_cache():
+    return SessionResourceCache(idle_ttl=AGENT_IDLE_TTL)
+
+
+def create_agent(openai_api_key, df, chunked_data=None):
+    llm = ChatOpenAI(temperature=0, model=MODEL, openai_api_key=openai_api_key, streaming=True)
+    agent = create_pandas_dataframe_agent(
+        llm,
+        df,
+        verbose=True,
+        agent_type=AgentType.OPENAI_FUNCTIONS,
+        handle_parsing_errors=True,
+        prefix=agent_prefix(chunked_data) if chunked_data is not None else None,
+    )
+    if chunked_data is not None:
+        # `df` is a sample; the Python tool aggregates the whole file with `data`
+        agent.tools[0].locals["data"] = chunked_data
+    return agent
+
+
+@st.cache_resource(ttl="2h")
+def load_chunked_data(file_id, _uploaded_file):
+    # Kept as a resource rather than data, so that it isn't pickled and copied
+    with st.spinner("Converting the file for querying from disk..."):
+        return ChunkedFrame.from_csv(_uploaded_file, CHUNKED_CACHE_DIR)
+
+
 @st.cache_data(ttl="2h")
 def load_data(uploaded_file):
     try:
@@ -31,7 +77,8 @@ def load_data(uploaded_file):
     except:
         ext = uploaded_file.split(".")[-1]
     if ext in file_formats:
-        return file_formats[ext](uploaded_file)
+        # Parsed files are kept as Parquet, so reloads after expiry or a restart are fast
+        return load_dataframe(uploaded_file.getvalue(), file_formats[ext], get_parquet_cache())
     else:
         st.error(f"Unsupported file format: {ext}")
         return None
@@ -52,8 +99,33 @@ if not uploaded_file:
         "This app uses LangChain's `PythonAstREPLTool` which is vulnerable to arbitrary code execution. Please use caution in deploying and sharing this app."
     )
 
-if uploaded_file:
-    df = load_data(uploaded_file)
+chunked_data = None
+if (
+    uploaded_file
+    and uploaded_file.name.lower().endswith(".csv")
+    and (uploaded_file.size > OUT_OF_CORE_BYTES)
+):
+    # Out-of-core mode: the agent sees a sample, and aggregates the file chunk by chunk
+    chunked_data = load_chunked_data(uploaded_file.file_id, uploaded_file)
+    # The sample is shared by all sessions, so the agent's Python tool gets its own copy
+    df = chunked_data.sample.copy()
+    data_hash = chunked_data.file_hash
+    st.sidebar.caption(
+        f"{chunked_data.num_rows:,} rows are queried from disk in {chunked_data.num_chunks} "
+        f"chunks; the agent explores a sample of {len(df):,} rows"
+    )
+elif uploaded_file:
+    result = load_data(uploaded_file)
+    if result is None:
+        st.stop()
+    df = result.df
+    data_hash = result.file_hash
+    source = "Parquet cache" if result.source == "parquet" else "file"
+    st.sidebar.caption(
+        f"Loaded {len(df):,} rows from {source} in {result.seconds:.2f}s, "
+        f"using {result.memory_bytes / 2**20:.1f} MB "
+        f"({result.saved_bytes / 2**20:.1f} MB saved by optimized column types)"
+    )
 
 openai_api_key = st.sidebar.text_input("OpenAI API Key", type="password")
 if "messages" not in st.session_state or st.sidebar.button("Clear conversation history"):
@@ -70,17 +142,15 @@ if prompt := st.chat_input(placeholder="What is this data about?"):
         st.info("Please add your OpenAI API key to continue.")
         st.stop()
 
-    llm = ChatOpenAI(
-        temperature=0, model="gpt-3.5-turbo-0613", openai_api_key=openai_api_key, streaming=True
-    )
-
-    pandas_df_agent = create_pandas_dataframe_agent(
-        llm,
-        df,
-        verbose=True,
-        agent_type=AgentType.OPENAI_FUNCTIONS,
-        handle_parsing_errors=True,
+    # The agent, including its prompt with the head of the frame, is reused across turns
+    # until the API key, model or data change
+    start = time.perf_counter()
+    pandas_df_agent = get_agent_cache().get_or_create(
+        "pandas_df_agent",
+        (fingerprint(openai_api_key), MODEL, data_hash),
+        lambda: create_agent(openai_api_key, df, chunked_data),
     )
+    st.sidebar.caption(f"Agent setup: {(time.perf_counter() - start) * 1000:.1f} ms")
 
     with st.chat_message("assistant"):
         st_cb = StreamlitCallbackHandler(st.container(), expand_new_thoughts=False)
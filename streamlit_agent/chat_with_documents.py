@@ -1,50 +1,132 @@
+import hashlib
 import os
-import tempfile
+import re
+import time
+import uuid
+from pathlib import Path
 import streamlit as st
 from langchain.chat_models import ChatOpenAI
-from langchain.document_loaders import PyPDFLoader
-from langchain.memory import ConversationBufferMemory
 from langchain.memory.chat_message_histories import StreamlitChatMessageHistory
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain.chains import ConversationalRetrievalChain
-from langchain.vectorstores import DocArrayInMemorySearch
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from streamlit_agent.callbacks.stream_handler import StreamHandler as BaseStreamHandler
+from streamlit_agent.documents.answer_cache import SemanticAnswerCache
+from streamlit_agent.documents.batched_embeddings import BatchedEmbeddings
+from streamlit_agent.documents.document_index import DocumentIndex
+from streamlit_agent.documents.embedding_cache import CachedEmbeddings
+from streamlit_agent.documents.hnsw_store import evict_saved_stores
+from streamlit_agent.memory.token_budget_memory import TokenBudgetMemory
 
 st.set_page_config(page_title="LangChain: Chat with Documents", page_icon="🦜")
 st.title("🦜 LangChain: Chat with Documents")
 
-
-@st.cache_resource(ttl="1h")
-def configure_retriever(uploaded_files):
-    # Read documents
-    docs = []
-    temp_dir = tempfile.TemporaryDirectory()
-    for file in uploaded_files:
-        temp_filepath = os.path.join(temp_dir.name, file.name)
-        with open(temp_filepath, "wb") as f:
-            f.write(file.getvalue())
-        loader = PyPDFLoader(temp_filepath)
-        docs.extend(loader.load())
-
-    # Split documents
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1500, chunk_overlap=200)
-    splits = text_splitter.split_documents(docs)
-
-    # Create embeddings and store in vectordb
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    vectordb = DocArrayInMemorySearch.from_documents(splits, embeddings)
-
-    # Define retriever
-    retriever = vectordb.as_retriever(search_type="mmr", search_kwargs={"k": 2, "fetch_k": 4})
-
-    return retriever
-
-
-class StreamHandler(BaseCallbackHandler):
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EMBEDDING_CACHE_DIR = Path.home() / ".cache" / "streamlit_agent" / "embeddings"
+INDEX_DIR = Path.home() / ".cache" / "streamlit_agent" / "indexes"
+# Saved indexes beyond this size are evicted, least recently used first
+MAX_INDEX_CACHE_BYTES = 2 * 1024**3
+ANSWER_CACHE_PATH = Path.home() / ".cache" / "streamlit_agent" / "answers.pickle"
+# Tune for the host's CPUs with `python -m benchmarks.embedding`
+EMBEDDING_BATCH_SIZE = 32
+EMBEDDING_THREADS = os.cpu_count()
+# Processes that split PDF pages; compare with `python -m benchmarks.ingestion`
+INGEST_WORKERS = os.cpu_count()
+# Hybrid retrieval also finds exact terms, such as part numbers and error codes, that
+# embedding search alone can miss
+RETRIEVAL_MODES = {"Hybrid (BM25 + vector)": "hybrid", "Vector (MMR)": "mmr"}
+RETRIEVER_KWARGS = {"hybrid": {"k": 2, "fetch_k": 8}, "mmr": {"k": 2, "fetch_k": 4}}
+# Most tokens of chat history sent with each question
+HISTORY_TOKEN_BUDGET = 1000
+
+
+@st.cache_resource
+def get_embeddings():
+    # Shared by all sessions, so that repeat uploads only embed chunks that are new
+    embeddings = HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL, encode_kwargs={"batch_size": EMBEDDING_BATCH_SIZE}
+    )
+    embeddings = BatchedEmbeddings(
+        embeddings, batch_size=EMBEDDING_BATCH_SIZE, num_threads=EMBEDDING_THREADS
+    )
+    return CachedEmbeddings(embeddings, EMBEDDING_MODEL, EMBEDDING_CACHE_DIR)
+
+
+def document_set_fingerprint(file_hashes):
+    # Identifies the set of uploaded file contents, regardless of upload order
+    return hashlib.sha256("".join(sorted(file_hashes)).encode()).hexdigest()
+
+
+def index_path(file_hashes):
+    return INDEX_DIR / EMBEDDING_MODEL / document_set_fingerprint(file_hashes)
+
+
+def save_index(index, path):
+    index.save(path)
+    evict_saved_stores(path.parent, MAX_INDEX_CACHE_BYTES, keep=path)
+
+
+@st.cache_resource
+def get_answer_cache():
+    # Shared by all sessions, so a question answered for one user is answered for all
+    return SemanticAnswerCache(ANSWER_CACHE_PATH)
+
+
+def stream_cached_answer(stream_handler, answer):
+    run_id = uuid.uuid4()
+    for token in re.findall(r"\s*\S+", answer):
+        stream_handler.on_llm_new_token(token, run_id=run_id)
+    stream_handler.on_llm_end(None, run_id=run_id)
+
+
+def configure_index(uploaded_files):
+    files = {
+        hashlib.sha256(file.getvalue()).hexdigest(): (file.name, file.getvalue())
+        for file in uploaded_files
+    }
+    # Each session keeps its own index, so that adding or removing a file only embeds or
+    # deletes the chunks of that file
+    index = st.session_state.get("document_index")
+    if index is None or index.target_file_hashes != set(files):
+        # Reuse the index saved for this set of files, if any
+        path = index_path(files)
+        if path.is_dir():
+            if index is not None:
+                index.stop()
+            index = DocumentIndex.load(path, get_embeddings(), files, max_workers=INGEST_WORKERS)
+        else:
+            if index is None:
+                index = DocumentIndex(get_embeddings(), max_workers=INGEST_WORKERS)
+            # Index in the background, so questions can be asked about the first pages
+            # while the rest of the files are still being indexed
+            index.start_sync(files, on_done=lambda index: save_index(index, path))
+        st.session_state["document_index"] = index
+    return index
+
+
+def show_index_progress(container, index):
+    if index.error is not None:
+        container.error(f"Indexing failed: {index.error}")
+    elif index.is_syncing:
+        pages_indexed, pages_total = index.pages_indexed, index.pages_total
+        with container.container():
+            st.progress(
+                pages_indexed / max(pages_total, 1),
+                text=f"Searchable: {pages_indexed}/{pages_total} pages",
+            )
+            for name, file_pages_indexed, file_pages in index.file_progress():
+                st.progress(
+                    file_pages_indexed / max(file_pages, 1),
+                    text=f"{name}: {file_pages_indexed}/{file_pages} pages",
+                )
+    else:
+        container.caption(f"Searchable: all {index.pages_total} pages")
+
+
+class StreamHandler(BaseStreamHandler):
     def __init__(self, container: st.delta_generator.DeltaGenerator, initial_text: str = ""):
-        self.container = container
-        self.text = initial_text
+        super().__init__(container, initial_text)
         self.run_id_ignore_token = None
 
     def on_llm_start(self, serialized: dict, prompts: list, **kwargs):
@@ -55,8 +137,7 @@ class StreamHandler(BaseCallbackHandler):
     def on_llm_new_token(self, token: str, **kwargs) -> None:
         if self.run_id_ignore_token == kwargs.get("run_id", False):
             return
-        self.text += token
-        self.container.markdown(self.text)
+        super().on_llm_new_token(token, **kwargs)
 
 
 class PrintRetrievalHandler(BaseCallbackHandler):
@@ -87,11 +168,33 @@ if not uploaded_files:
     st.info("Please upload PDF documents to continue.")
     st.stop()
 
-retriever = configure_retriever(uploaded_files)
+index = configure_index(uploaded_files)
+with st.spinner("Indexing the first pages..."):
+    while index.is_syncing and index.pages_indexed == 0:
+        time.sleep(0.1)
+index_progress = st.sidebar.empty()
+show_index_progress(index_progress, index)
+search_type = RETRIEVAL_MODES[st.sidebar.radio("Retrieval", RETRIEVAL_MODES)]
+retriever = index.as_retriever(search_type=search_type, search_kwargs=RETRIEVER_KWARGS[search_type])
+embeddings = get_embeddings()
+st.sidebar.caption(f"Embedding cache: {embeddings.hits} hits, {embeddings.misses} misses")
+if embeddings.embeddings.chunks_per_second is not None:
+    st.sidebar.caption(
+        f"Embedding throughput: {embeddings.embeddings.chunks_per_second:.1f} chunks/s"
+    )
 
 # Setup memory for contextual conversation
 msgs = StreamlitChatMessageHistory()
-memory = ConversationBufferMemory(memory_key="chat_history", chat_memory=msgs, return_messages=True)
+if "memory" not in st.session_state:
+    st.session_state.memory = TokenBudgetMemory(
+        max_tokens=HISTORY_TOKEN_BUDGET,
+        memory_key="chat_history",
+        chat_memory=msgs,
+        return_messages=True,
+    )
+memory = st.session_state.memory
+# Older turns are summarized by a non-streaming LLM, so the summary isn't shown as output
+memory.llm = ChatOpenAI(model_name="gpt-3.5-turbo", openai_api_key=openai_api_key, temperature=0)
 
 # Setup LLM and QA chain
 llm = ChatOpenAI(
@@ -102,7 +205,7 @@ qa_chain = ConversationalRetrievalChain.from_llm(
 )
 
 if len(msgs.messages) == 0 or st.sidebar.button("Clear message history"):
-    msgs.clear()
+    memory.clear()
     msgs.add_ai_message("How can I help you?")
 
 avatars = {"human": "user", "ai": "assistant"}
@@ -112,7 +215,37 @@ for msg in msgs.messages:
 if user_query := st.chat_input(placeholder="Ask me anything!"):
     st.chat_message("user").write(user_query)
 
+    # Only answers to opening questions over a fully indexed document set are cached, since
+    # later questions may refer back to the conversation
+    answer_cache = get_answer_cache()
+    cacheable = not index.is_syncing and not any(msg.type == "human" for msg in msgs.messages)
+    cached_answer = None
+    if cacheable:
+        fingerprint = f"{document_set_fingerprint(index.file_hashes)}/{search_type}"
+        query_embedding = embeddings.embed_query(user_query)
+        cached_answer = answer_cache.lookup(fingerprint, query_embedding)
+
     with st.chat_message("assistant"):
-        retrieval_handler = PrintRetrievalHandler(st.container())
-        stream_handler = StreamHandler(st.empty())
-        response = qa_chain.run(user_query, callbacks=[retrieval_handler, stream_handler])
+        if cached_answer is not None:
+            stream_handler = StreamHandler(st.empty())
+            stream_cached_answer(stream_handler, cached_answer)
+            st.caption("Answered from cache")
+            msgs.add_user_message(user_query)
+            msgs.add_ai_message(cached_answer)
+        else:
+            retrieval_handler = PrintRetrievalHandler(st.container())
+            stream_handler = StreamHandler(st.empty())
+            response = qa_chain.run(user_query, callbacks=[retrieval_handler, stream_handler])
+            if cacheable:
+                answer_cache.store(fingerprint, user_query, query_embedding, response)
+            st.sidebar.caption(
+                f"Chat history: {memory.last_prompt_tokens} tokens sent, "
+                f"{memory.last_saved_tokens} saved by the token budget"
+            )
+
+# Keep the progress current until indexing finishes. Sending a message reruns the script,
+# which ends this loop.
+while index.is_syncing:
+    time.sleep(0.5)
+    show_index_progress(index_progress, index)
+show_index_progress(index_progress, index)
@@ -1,13 +1,19 @@
+from collections import deque
 import streamlit as st
 from pathlib import Path
 from langchain.llms.openai import OpenAI
 from langchain.agents import create_sql_agent
-from langchain.sql_database import SQLDatabase
 from langchain.agents.agent_types import AgentType
 from langchain.callbacks import StreamlitCallbackHandler
-from langchain.agents.agent_toolkits import SQLDatabaseToolkit
-from sqlalchemy import create_engine
-import sqlite3
+
+from streamlit_agent.sql.cached_database import CachedSQLDatabase
+from streamlit_agent.sql.engine import (
+    create_pooled_engine,
+    create_sqlite_read_only_engine,
+    pool_stats,
+)
+from streamlit_agent.sql.schema_index import SchemaIndex, schema_index_path
+from streamlit_agent.sql.toolkit import SchemaIndexToolkit
 
 st.set_page_config(page_title="LangChain: Chat with SQL DB", page_icon="🦜")
 st.title("🦜 LangChain: Chat with SQL DB")
@@ -18,6 +24,13 @@ INJECTION_WARNING = """
                     """
 LOCALDB = "USE_LOCALDB"
 
+# Connection pool and query limits, shared by all sessions using a database
+POOL_SIZE = 5
+MAX_OVERFLOW = 10
+STATEMENT_TIMEOUT = 30  # seconds
+MAX_ROWS = 1000
+MAX_LOGGED_QUERIES = 100
+
 # User inputs
 radio_opt = ["Use sample database - Chinook.db", "Connect to your SQL database"]
 selected_opt = st.sidebar.radio(label="Choose suitable option", options=radio_opt)
@@ -53,24 +66,46 @@ def configure_db(db_uri):
         # Make the DB connection read-only to reduce risk of injection attacks
         # See: https://python.langchain.com/docs/security
         db_filepath = (Path(__file__).parent / "Chinook.db").absolute()
-        creator = lambda: sqlite3.connect(f"file:{db_filepath}?mode=ro", uri=True)
-        return SQLDatabase(create_engine("sqlite:///", creator=creator))
-    return SQLDatabase.from_uri(database_uri=db_uri)
+        engine = create_sqlite_read_only_engine(
+            str(db_filepath),
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            statement_timeout=STATEMENT_TIMEOUT,
+        )
+    else:
+        engine = create_pooled_engine(
+            db_uri,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            statement_timeout=STATEMENT_TIMEOUT,
+        )
+    return CachedSQLDatabase(engine, max_rows=MAX_ROWS)
 
 
-db = configure_db(db_uri)
+@st.cache_resource(ttl="2h")
+def configure_schema_index(db_uri, _db):
+    # Indexing the schema of a large database is slow, so the index is saved, and can
+    # also be built offline with `python -m streamlit_agent.sql.schema_index DATABASE_URI`
+    path = schema_index_path(db_uri)
+    if path.exists():
+        return SchemaIndex.load(path)
+    schema_index = SchemaIndex.build(_db.engine, list(_db.get_usable_table_names()))
+    schema_index.save(path)
+    return schema_index
 
-toolkit = SQLDatabaseToolkit(db=db, llm=llm)
 
-agent = create_sql_agent(
-    llm=llm,
-    toolkit=toolkit,
-    verbose=True,
-    agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
-)
+db = configure_db(db_uri)
+if st.sidebar.button("Clear database cache", help="Use after the database has changed."):
+    db.invalidate()
+    schema_index_path(db_uri).unlink(missing_ok=True)
+    configure_schema_index.clear()
+schema_index = configure_schema_index(db_uri, db)
 
 if "messages" not in st.session_state or st.sidebar.button("Clear message history"):
     st.session_state["messages"] = [{"role": "assistant", "content": "How can I help you?"}]
+# The database is shared by all sessions, so each keeps a log of its own calls
+if "query_log" not in st.session_state:
+    st.session_state["query_log"] = deque(maxlen=MAX_LOGGED_QUERIES)
 
 for msg in st.session_state.messages:
     st.chat_message(msg["role"]).write(msg["content"])
@@ -81,8 +116,28 @@ if user_query:
     st.session_state.messages.append({"role": "user", "content": user_query})
     st.chat_message("user").write(user_query)
 
-    with st.chat_message("assistant"):
+    # The agent only sees the schema of the tables relevant to the question
+    toolkit = SchemaIndexToolkit(db=db, llm=llm, schema_index=schema_index, question=user_query)
+    agent = create_sql_agent(
+        llm=llm,
+        toolkit=toolkit,
+        verbose=True,
+        agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+    )
+
+    with st.chat_message("assistant"), db.log_queries(st.session_state.query_log):
         st_cb = StreamlitCallbackHandler(st.container())
         response = agent.run(user_query, callbacks=[st_cb])
         st.session_state.messages.append({"role": "assistant", "content": response})
         st.write(response)
+
+stats = pool_stats(db.engine)
+if stats:
+    st.sidebar.caption(
+        f"Connections: {stats.checked_out} in use, {stats.idle} idle "
+        f"(pool of {stats.size}, {stats.overflow}/{MAX_OVERFLOW} overflow)"
+    )
+with st.sidebar.expander("Recent database calls"):
+    for timing in reversed(st.session_state.query_log):
+        cached = " (cached)" if timing.cached else ""
+        st.caption(f"{timing.seconds * 1000:.1f} ms{cached}: {timing.kind} `{timing.statement}`")
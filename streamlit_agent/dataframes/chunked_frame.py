@@ -0,0 +1,377 @@
+"""Out-of-core tables: CSV files converted to chunked Parquet, queried chunk by chunk."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import IO, Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+# Number of distinct values counted per column, beyond which only ">=" is reported
+_MAX_DISTINCT = 1000
+# Chunks of partial aggregates combined at a time, bounding their memory use
+_COMBINE_EVERY = 32
+
+# Partial aggregates computed per chunk for each aggregation, and how partials combine
+_PARTIALS = {
+    "sum": [("sum", "sum")],
+    "count": [("count", "sum")],
+    "size": [("size", "sum")],
+    "min": [("min", "min")],
+    "max": [("max", "max")],
+    "mean": [("sum", "sum"), ("count", "sum")],
+}
+
+AGENT_PREFIX = """
+You are working with a dataset of {num_rows:,} rows, which is too large to load into memory.
+`df` is a pandas dataframe with a random sample of {sample_rows:,} of its rows, for exploring
+the data. For answers about the whole dataset, use `data`, which reads it from disk chunk by
+chunk:
+- `data.aggregate(by=None, where=None, **aggregations)`: named aggregations, as in
+  `DataFrame.groupby(by).agg(...)`, e.g. `data.aggregate(by="country", total=("amount", "sum"))`.
+  Supports sum, count, size, min, max and mean. `where` is a `DataFrame.query` expression.
+- `data.count(where=None)`: the number of rows matching `where`.
+- `data.query(where, columns=None, limit=1000)`: up to `limit` rows matching `where`.
+- `data.iter_chunks(columns=None)`: the dataset as an iterator of dataframes.
+Never combine all chunks into one dataframe.
+
+Summary statistics of the whole dataset:
+{summary}
+"""
+
+
+def _hash_file(file: IO[bytes], block_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    while block := file.read(block_size):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class _ColumnStats:
+    """Summary statistics of a column, accumulated one chunk at a time."""
+
+    __slots__ = ("count", "nulls", "min", "max", "sum", "distinct")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.sum = None
+        self.distinct: set[object] | None = set()
+
+    def update(self, array: pa.ChunkedArray) -> None:
+        self.count += len(array) - array.null_count
+        self.nulls += array.null_count
+        if pa.types.is_integer(array.type) or pa.types.is_floating(array.type):
+            min_max = pc.min_max(array)
+            for name, better in (("min", min), ("max", max)):
+                value = min_max[name].as_py()
+                if value is not None:
+                    current = getattr(self, name)
+                    setattr(self, name, value if current is None else better(current, value))
+            total = pc.sum(array).as_py()
+            if total is not None:
+                self.sum = total if self.sum is None else self.sum + total
+        if self.distinct is not None:
+            unique = pc.unique(array)
+            if len(unique) > _MAX_DISTINCT:
+                # Stop counting, which would take unbounded memory
+                self.distinct = None
+                return
+            self.distinct.update(unique.to_pylist())
+            self.distinct.discard(None)
+            if len(self.distinct) > _MAX_DISTINCT:
+                self.distinct = None
+
+    def as_dict(self) -> dict[str, object]:
+        return {
+            "count": self.count,
+            "nulls": self.nulls,
+            "distinct": len(self.distinct) if self.distinct is not None else f">{_MAX_DISTINCT}",
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.sum is not None and self.count else None,
+        }
+
+
+class ChunkedFrame:
+    """A table stored on disk as Parquet, read and aggregated one row group at a time, so
+    that memory use is bounded by the chunk size rather than the size of the table.
+
+    Create one from a CSV file with `from_csv`, which also keeps a random sample of rows
+    and summary statistics of every column, for prompting.
+    """
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = Path(path)
+        self.file_hash = self.path.name
+        self._file = pq.ParquetFile(self.path / "data.parquet")
+        self.sample = pd.read_parquet(self.path / "sample.parquet")
+        self.summary = pd.read_parquet(self.path / "summary.parquet")
+
+    @classmethod
+    def from_csv(
+        cls,
+        file: IO[bytes],
+        cache_dir: str | os.PathLike[str],
+        chunk_bytes: int = 4 * 1024 * 1024,
+        sample_rows: int = 1000,
+        max_cache_bytes: int = 20 * 1024**3,
+    ) -> ChunkedFrame:
+        """Convert a CSV file, unless it was already converted into `cache_dir`.
+
+        The file is parsed in blocks of `chunk_bytes`, each stored as a Parquet row group.
+        Parsing reads ahead a number of blocks, so memory use grows with `chunk_bytes`.
+        Column types are inferred from the first block; if a later block does not fit
+        them, conversion is retried with integer columns read as floats, then with all
+        columns read as strings. Once the cache grows past `max_cache_bytes`, the least
+        recently used tables are removed.
+        """
+        cache_dir = Path(cache_dir)
+        path = cache_dir / _hash_file(file)
+        if path.exists():
+            # Update the modification time, which orders the LRU
+            path.touch()
+            return cls(path)
+
+        # Sessions converting the same file at once each convert into their own directory
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(dir=cache_dir, suffix=".tmp"))
+        try:
+            _convert_csv_retrying(file, tmp_path, chunk_bytes, sample_rows)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            # Another session converted the file first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        _evict(cache_dir, max_cache_bytes, keep=path)
+        return cls(path)
+
+    @property
+    def num_rows(self) -> int:
+        return self._file.metadata.num_rows
+
+    @property
+    def num_chunks(self) -> int:
+        return self._file.num_row_groups
+
+    @property
+    def columns(self) -> list[str]:
+        return self._file.schema_arrow.names
+
+    @property
+    def dtypes(self) -> pd.Series:
+        return self._file.schema_arrow.empty_table().to_pandas().dtypes
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __repr__(self) -> str:
+        return f"ChunkedFrame({self.num_rows} rows, {len(self.columns)} columns)"
+
+    def iter_chunks(self, columns: list[str] | None = None) -> Iterator[pd.DataFrame]:
+        """Iterate over the table as dataframes, one per chunk."""
+        for i in range(self.num_chunks):
+            yield self._file.read_row_group(i, columns=columns).to_pandas()
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return next(self.iter_chunks(), self.sample.iloc[:0]).head(n)
+
+    def _filtered_chunks(
+        self, where: str | None, columns: list[str] | None = None
+    ) -> Iterator[pd.DataFrame]:
+        # Filters may refer to any column, so only select columns after filtering
+        for chunk in self.iter_chunks(None if where else columns):
+            if where:
+                chunk = chunk.query(where)
+                if columns is not None:
+                    chunk = chunk[columns]
+            if len(chunk):
+                yield chunk
+
+    def count(self, where: str | None = None) -> int:
+        """Return the number of rows matching the `DataFrame.query` expression `where`."""
+        if where is None:
+            return self.num_rows
+        return sum(len(chunk) for chunk in self._filtered_chunks(where))
+
+    def query(
+        self, where: str, columns: list[str] | None = None, limit: int = 1000
+    ) -> pd.DataFrame:
+        """Return up to `limit` rows matching the `DataFrame.query` expression `where`."""
+        matches: list[pd.DataFrame] = []
+        found = 0
+        for chunk in self._filtered_chunks(where, columns):
+            matches.append(chunk.head(limit - found))
+            found += len(matches[-1])
+            if found >= limit:
+                break
+        if not matches:
+            return self.sample.iloc[:0] if columns is None else self.sample[columns].iloc[:0]
+        return pd.concat(matches, ignore_index=True)
+
+    def aggregate(
+        self,
+        by: str | list[str] | None = None,
+        where: str | None = None,
+        **aggregations: tuple[str, str],
+    ) -> pd.DataFrame | pd.Series:
+        """Compute named aggregations, like `DataFrame.groupby(by).agg(**aggregations)`, over
+        the rows matching `where`, combining partial aggregates of each chunk.
+
+        Supports sum, count, size, min, max and mean. Without `by`, returns a Series.
+        """
+        if not aggregations:
+            raise ValueError("No aggregations given")
+        for name, (_, function) in aggregations.items():
+            if function not in _PARTIALS:
+                raise ValueError(
+                    f"Unsupported aggregation {function!r} for {name!r}, "
+                    f"use one of: {', '.join(_PARTIALS)}"
+                )
+        keys = [by] if isinstance(by, str) else list(by or [])
+        partial_aggregations = {
+            f"{name}__{partial}": (column, partial)
+            for name, (column, function) in aggregations.items()
+            for partial, _ in _PARTIALS[function]
+        }
+        combine = {
+            f"{name}__{partial}": combine
+            for name, (_, function) in aggregations.items()
+            for partial, combine in _PARTIALS[function]
+        }
+        columns = list(dict.fromkeys([*keys, *(column for column, _ in aggregations.values())]))
+
+        def aggregate_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+            groups = chunk.groupby(
+                keys or np.zeros(len(chunk), dtype=np.int8), dropna=False, observed=True
+            )
+            return groups.agg(**partial_aggregations)
+
+        def combine_partials(partials: list[pd.DataFrame]) -> pd.DataFrame:
+            combined = pd.concat(partials)
+            levels = list(range(combined.index.nlevels))
+            return combined.groupby(level=levels, dropna=False, sort=False).agg(combine)
+
+        partials: list[pd.DataFrame] = []
+        for chunk in self._filtered_chunks(where, columns):
+            partials.append(aggregate_chunk(chunk))
+            if len(partials) >= _COMBINE_EVERY:
+                partials = [combine_partials(partials)]
+        if not partials:
+            # Aggregate no rows, for a result with the right columns and index
+            partials = [aggregate_chunk(self.sample[columns].iloc[:0])]
+        result = combine_partials(partials)
+
+        output = pd.DataFrame(index=result.index)
+        for name, (_, function) in aggregations.items():
+            if function == "mean":
+                output[name] = result[f"{name}__sum"] / result[f"{name}__count"]
+            else:
+                output[name] = result[f"{name}__{function}"]
+        if not keys:
+            return output.iloc[0].rename(None) if len(output) else pd.Series(dtype=float)
+        return output.sort_index()
+
+
+def _convert_csv(
+    file: IO[bytes],
+    path: Path,
+    chunk_bytes: int,
+    sample_rows: int,
+    column_types: dict[str, pa.DataType] | None,
+) -> pa.Schema:
+    reader = pa_csv.open_csv(
+        file,
+        read_options=pa_csv.ReadOptions(block_size=chunk_bytes),
+        # Read empty strings as nulls, as pandas does
+        convert_options=pa_csv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+    )
+    rng = np.random.default_rng(0)
+    # Reservoir sample: the rows with the smallest random keys seen so far
+    sample = reader.schema.empty_table()
+    sample_keys = np.empty(0)
+    stats = {name: _ColumnStats() for name in reader.schema.names}
+    with pq.ParquetWriter(path / "data.parquet", reader.schema) as writer:
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            writer.write_table(table, row_group_size=len(table) or None)
+            for name in table.column_names:
+                stats[name].update(table[name])
+            sample = pa.concat_tables([sample, table])
+            sample_keys = np.concatenate([sample_keys, rng.random(len(table))])
+            if len(sample) > sample_rows:
+                keep = np.sort(np.argpartition(sample_keys, sample_rows)[:sample_rows])
+                sample, sample_keys = sample.take(keep), sample_keys[keep]
+    pq.write_table(sample, path / "sample.parquet")
+    summary = pd.DataFrame.from_dict(
+        {name: column.as_dict() for name, column in stats.items()}, orient="index"
+    )
+    summary.fillna("").astype(str).to_parquet(path / "summary.parquet")
+    return reader.schema
+
+
+def _convert_csv_retrying(file: IO[bytes], path: Path, chunk_bytes: int, sample_rows: int) -> None:
+    """Convert a CSV file into the empty directory `path`, retrying with integer columns
+    read as floats, then with all columns read as strings, if a block doesn't fit the column
+    types inferred from the first block.
+    """
+    column_types: dict[str, pa.DataType] | None = None
+    while True:
+        try:
+            _convert_csv(file, path, chunk_bytes, sample_rows, column_types)
+            return
+        except pa.ArrowInvalid:
+            file.seek(0)
+            schema = pa_csv.open_csv(
+                file, read_options=pa_csv.ReadOptions(block_size=chunk_bytes)
+            ).schema
+            file.seek(0)
+            if column_types is None:
+                column_types = {
+                    field.name: pa.float64() if pa.types.is_integer(field.type) else field.type
+                    for field in schema
+                }
+            elif any(not pa.types.is_string(data_type) for data_type in column_types.values()):
+                column_types = {field.name: pa.string() for field in schema}
+            else:
+                raise
+            shutil.rmtree(path)
+            path.mkdir()
+
+
+def _evict(cache_dir: Path, max_bytes: int, keep: Path) -> None:
+    tables = [path for path in cache_dir.iterdir() if path.is_dir() and path.suffix != ".tmp"]
+    sizes = {path: sum(file.stat().st_size for file in path.iterdir()) for path in tables}
+    total = sum(sizes.values())
+    for path in sorted(tables, key=lambda path: path.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        if path != keep:
+            total -= sizes[path]
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def agent_prefix(data: ChunkedFrame) -> str:
+    """Return the prompt prefix for a pandas dataframe agent whose `df` is `data.sample`,
+    with `data` also available to its Python tool.
+    """
+    return AGENT_PREFIX.format(
+        num_rows=data.num_rows,
+        sample_rows=len(data.sample),
+        summary=data.summary.to_markdown(),
+    )
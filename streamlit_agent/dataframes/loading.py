@@ -0,0 +1,156 @@
+"""Typed DataFrame loading, with parsed files cached as Parquet."""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Literal, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Parquet metadata key recording the memory used by the frame as originally parsed
+_PARSED_BYTES_KEY = b"streamlit_agent.parsed_bytes"
+
+
+class LoadResult(NamedTuple):
+    df: pd.DataFrame
+    file_hash: str
+    source: Literal["parsed", "parquet"]
+    seconds: float
+    parsed_bytes: int
+    memory_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.parsed_bytes - self.memory_bytes
+
+
+def memory_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def optimize_dtypes(df: pd.DataFrame, max_category_ratio: float = 0.5) -> pd.DataFrame:
+    """Downcast numeric columns to the smallest type that holds their values exactly, and
+    convert string columns with at most `max_category_ratio` distinct values per row to
+    categoricals.
+    """
+    columns = {}
+    for name, column in df.items():
+        if pd.api.types.is_bool_dtype(column):
+            columns[name] = column
+        elif pd.api.types.is_integer_dtype(column):
+            columns[name] = pd.to_numeric(column, downcast="integer")
+        elif pd.api.types.is_float_dtype(column):
+            downcast = column.astype(np.float32)
+            # Only downcast when no precision is lost
+            if ((downcast.astype(column.dtype) == column) | column.isna()).all():
+                column = downcast
+            columns[name] = column
+        elif column.dtype == object:
+            values = column.dropna()
+            if (
+                len(values)
+                and values.nunique() <= max_category_ratio * len(column)
+                and values.map(type).eq(str).all()
+            ):
+                column = column.astype("category")
+            columns[name] = column
+        else:
+            columns[name] = column
+    return pd.DataFrame(columns, index=df.index)
+
+
+class ParquetFrameCache:
+    """Parsed DataFrames stored as Parquet files named by the hash of the source file.
+
+    Reading a Parquet file is much faster than parsing CSV or Excel, and keeps the
+    optimized column types. Once the cache grows past `max_bytes`, the least recently
+    used files are removed.
+    """
+
+    def __init__(self, cache_dir: str | os.PathLike[str], max_bytes: int = 1024**3) -> None:
+        self.dir = Path(cache_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def path(self, file_hash: str) -> Path:
+        return self.dir / f"{file_hash}.parquet"
+
+    def get(self, file_hash: str) -> tuple[pd.DataFrame, int] | None:
+        """Return the cached frame and the memory it used when parsed, if cached."""
+        path = self.path(file_hash)
+        try:
+            table = pq.read_table(path)
+        except FileNotFoundError:
+            return None
+        # Update the modification time, which orders the LRU
+        path.touch()
+        parsed_bytes = int((table.schema.metadata or {}).get(_PARSED_BYTES_KEY, 0))
+        return table.to_pandas(), parsed_bytes
+
+    def put(self, file_hash: str, df: pd.DataFrame, parsed_bytes: int) -> None:
+        try:
+            table = pa.Table.from_pandas(df)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            # E.g. object columns mixing numbers and strings
+            logger.warning("Not caching DataFrame as Parquet: %s", e)
+            return
+        metadata = {**(table.schema.metadata or {}), _PARSED_BYTES_KEY: str(parsed_bytes)}
+        table = table.replace_schema_metadata(metadata)
+        path = self.path(file_hash)
+        # Sessions loading the same file at once each write their own temporary file
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, suffix=".tmp")
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        files = sorted(self.dir.glob("*.parquet"), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in files)
+        # Always keep the most recent file
+        for path in files[:-1]:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+
+def load_dataframe(
+    data: bytes,
+    reader: Callable[[io.BytesIO], pd.DataFrame],
+    cache: ParquetFrameCache | None = None,
+) -> LoadResult:
+    """Parse a data file with `reader` and optimize its column types, or read the result of
+    doing so from the Parquet cache.
+    """
+    start = time.perf_counter()
+    file_hash = hashlib.sha256(data).hexdigest()
+    cached = cache.get(file_hash) if cache is not None else None
+    if cached is not None:
+        df, parsed_bytes = cached
+        source: Literal["parsed", "parquet"] = "parquet"
+    else:
+        df = reader(io.BytesIO(data))
+        parsed_bytes = memory_bytes(df)
+        df = optimize_dtypes(df)
+        if cache is not None:
+            cache.put(file_hash, df, parsed_bytes)
+        source = "parsed"
+    return LoadResult(
+        df, file_hash, source, time.perf_counter() - start, parsed_bytes, memory_bytes(df)
+    )
@@ -0,0 +1,127 @@
+"""Persistent cache of answers to questions, matched by question embedding similarity."""
+
+from __future__ import annotations
+
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "question", "embedding", "answer", "created_at")
+
+    def __init__(
+        self, fingerprint: str, question: str, embedding: np.ndarray, answer: str, created_at: float
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.question = question
+        self.embedding = embedding
+        self.answer = answer
+        self.created_at = created_at
+
+
+def _normalize(embedding: list[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SemanticAnswerCache:
+    """Caches answers by a fingerprint of what they were computed from (such as the set of
+    documents searched) and the embedding of the question.
+
+    A lookup returns the answer to the most similar cached question with the same
+    fingerprint, if its cosine similarity is at least `threshold`. Answers expire `ttl`
+    seconds after they were stored, and the least recently used answers are evicted beyond
+    `max_entries`. The cache is saved to `path` after every change, and is safe to share
+    between threads.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        threshold: float = 0.95,
+        ttl: float = 24 * 60 * 60,
+        max_entries: int = 1000,
+    ) -> None:
+        self.path = Path(path)
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._next_key = 0
+        # Entries in least- to most-recently-used order
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        try:
+            with open(self.path, "rb") as file:
+                entries = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            entries = []
+        for fingerprint, question, embedding, answer, created_at in entries:
+            self._add(_Entry(fingerprint, question, embedding, answer, created_at))
+        self._expire()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _add(self, entry: _Entry) -> None:
+        self._entries[self._next_key] = entry
+        self._next_key += 1
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry.created_at < cutoff]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self) -> None:
+        entries = [
+            (entry.fingerprint, entry.question, entry.embedding, entry.answer, entry.created_at)
+            for entry in self._entries.values()
+        ]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump(entries, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def lookup(self, fingerprint: str, embedding: list[float]) -> str | None:
+        """Return the cached answer to the most similar question, if it is similar enough."""
+        query = _normalize(embedding)
+        with self._lock:
+            self._expire()
+            keys = [key for key, entry in self._entries.items() if entry.fingerprint == fingerprint]
+            if keys:
+                similarities = np.stack([self._entries[key].embedding for key in keys]) @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(keys[best])
+                    self.hits += 1
+                    return self._entries[keys[best]].answer
+            self.misses += 1
+            return None
+
+    def store(self, fingerprint: str, question: str, embedding: list[float], answer: str) -> None:
+        with self._lock:
+            self._add(_Entry(fingerprint, question, _normalize(embedding), answer, time.time()))
+            self._expire()
+            self._save()
+
+    def invalidate(self, fingerprint: str | None = None) -> None:
+        """Remove the answers with the given fingerprint, or all answers."""
+        with self._lock:
+            for key in [
+                key
+                for key, entry in self._entries.items()
+                if fingerprint is None or entry.fingerprint == fingerprint
+            ]:
+                del self._entries[key]
+            self._save()
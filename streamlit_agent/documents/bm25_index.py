@@ -0,0 +1,140 @@
+"""In-memory BM25 inverted index for lexical search over document chunks."""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+# Words, and identifiers such as part numbers and error codes joined by "-", "." or "/"
+_TOKEN_RE = re.compile(r"\w+(?:[-./]\w+)*")
+_PART_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into lowercase terms. Compound identifiers like "E-1234" are kept whole,
+    and their parts are added as terms too, so both "E-1234" and "1234" match them.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        terms.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """Okapi BM25 index over documents identified by string ids.
+
+    Postings are updated as documents are added and removed, so the index never needs to be
+    rebuilt. Each document has a slot number, and searches score the postings of each query
+    term as numpy arrays of slots and term frequencies, which are cached until the term's
+    postings change. Methods are safe to call from multiple threads.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        # Term -> {slot: term frequency}
+        self._postings: dict[str, dict[int, int]] = {}
+        self._slots: dict[str, int] = {}
+        self._free_slots: list[int] = []
+        # By slot: id, document length and distinct terms. Free slots have no terms.
+        self._ids: list[str | None] = []
+        self._lengths: list[int] = []
+        self._terms: list[tuple[str, ...]] = []
+        self._total_length = 0
+        # Cached per-term (slots, term frequencies), and per-slot length normalization
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+        self._norms: np.ndarray | None = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, ids: list[str], texts: list[str]) -> None:
+        """Add documents. Existing ids are replaced."""
+        with self._lock:
+            self._remove([id for id in ids if id in self._slots])
+            for id, text in zip(ids, texts):
+                terms = tokenize(text)
+                counts = Counter(terms)
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    slot = len(self._lengths)
+                    self._ids.append(None)
+                    self._lengths.append(0)
+                    self._terms.append(())
+                self._slots[id] = slot
+                self._ids[slot] = id
+                self._lengths[slot] = len(terms)
+                self._terms[slot] = tuple(counts)
+                self._total_length += len(terms)
+                for term, count in counts.items():
+                    self._postings.setdefault(term, {})[slot] = count
+                    self._arrays.pop(term, None)
+            self._norms = None
+
+    def remove(self, ids: list[str]) -> None:
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids: list[str]) -> None:
+        for id in ids:
+            slot = self._slots.pop(id, None)
+            if slot is None:
+                continue
+            self._total_length -= self._lengths[slot]
+            for term in self._terms[slot]:
+                postings = self._postings[term]
+                del postings[slot]
+                if not postings:
+                    del self._postings[term]
+                self._arrays.pop(term, None)
+            self._ids[slot] = None
+            self._lengths[slot] = 0
+            self._terms[slot] = ()
+            self._free_slots.append(slot)
+        self._norms = None
+
+    def _term_arrays(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            arrays = (
+                np.fromiter(postings.keys(), dtype=np.int64, count=len(postings)),
+                np.fromiter(postings.values(), dtype=np.float64, count=len(postings)),
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    def search(self, query: str, k: int = 4) -> list[tuple[str, float]]:
+        """Return the ids of the k highest-scoring documents, with their scores."""
+        with self._lock:
+            n_docs = len(self._slots)
+            if n_docs == 0 or k <= 0:
+                return []
+            if self._norms is None:
+                avg_length = self._total_length / n_docs
+                lengths = np.asarray(self._lengths, dtype=np.float64)
+                self._norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+
+            scores = np.zeros(len(self._lengths))
+            for term in set(tokenize(query)):
+                if term not in self._postings:
+                    continue
+                slots, tfs = self._term_arrays(term)
+                idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                scores[slots] += idf * tfs * (self.k1 + 1) / (tfs + self._norms[slots])
+
+            # Every matching document has a positive score
+            matches = np.flatnonzero(scores)
+            if len(matches) > k:
+                matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+            matches = matches[np.argsort(-scores[matches], kind="stable")]
+            return [(self._ids[slot], float(scores[slot])) for slot in matches]
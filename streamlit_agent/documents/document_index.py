@@ -0,0 +1,266 @@
+"""Vector and BM25 index over a set of uploaded files that is updated incrementally."""
+
+from __future__ import annotations
+
+import itertools
+import os
+import tempfile
+import threading
+from typing import Any, Callable, Iterable, Iterator
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+from streamlit_agent.documents.bm25_index import BM25Index
+from streamlit_agent.documents.hnsw_store import HnswVectorStore
+from streamlit_agent.documents.hybrid_retriever import HybridRetriever
+from streamlit_agent.documents.ingest import count_pages, iter_page_splits
+
+
+def _chunk_id(file_hash: str, n: int) -> str:
+    return f"{file_hash}:{n}"
+
+
+class DocumentIndex:
+    """Tracks indexed files by content hash, so that changing the set of uploaded files
+    only loads, splits and embeds new files, and only deletes the chunks of removed ones.
+
+    Files are indexed page by page: chunks are embedded and inserted in batches of
+    `batch_size` as pages are split, so the index can be searched while a sync is running
+    in the background. The very first batch is inserted after a single page. Pages are
+    split in a process pool of `max_workers`, and inserted in file and page order.
+
+    Chunks are indexed both in an HNSW vector store and in a BM25 index, which are updated
+    together, so they always hold the same chunks.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        vectorstore: HnswVectorStore | None = None,
+        batch_size: int = 32,
+        max_workers: int | None = None,
+    ) -> None:
+        self.embeddings = embeddings
+        if vectorstore is None:
+            dim = len(embeddings.embed_query("dimension probe"))
+            vectorstore = HnswVectorStore(embeddings, dim)
+        self.vectorstore = vectorstore
+        self.bm25 = BM25Index()
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.error: Exception | None = None
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._cancel = threading.Event()
+
+        # Chunk ids, names, page counts and indexed page counts of each file, by content
+        # hash. Files stay incomplete until all of their pages are indexed.
+        self._chunk_ids: dict[str, list[str]] = {}
+        self._names: dict[str, str] = {}
+        self._pages: dict[str, int] = {}
+        self._pages_indexed: dict[str, int] = {}
+        self._complete: set[str] = set()
+        items = vectorstore.items()
+        self.bm25.add([id for id, _ in items], [doc.page_content for _, doc in items])
+        for id, doc in items:
+            file_hash, _ = id.split(":")
+            self._chunk_ids.setdefault(file_hash, []).append(id)
+            self._pages[file_hash] = max(self._pages.get(file_hash, 0), doc.metadata["page"] + 1)
+        self._pages_indexed.update(self._pages)
+        self._complete.update(self._chunk_ids)
+        # The files of the current or last sync, in order
+        self._target = dict.fromkeys(self._complete)
+
+    @property
+    def file_hashes(self) -> set[str]:
+        """The files that are completely indexed."""
+        with self._lock:
+            return set(self._complete)
+
+    @property
+    def target_file_hashes(self) -> set[str]:
+        """The files the index contains once the current or last sync finishes."""
+        with self._lock:
+            return set(self._target)
+
+    @property
+    def is_syncing(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def pages_total(self) -> int:
+        with self._lock:
+            return sum(self._pages.get(file_hash, 0) for file_hash in self._target)
+
+    @property
+    def pages_indexed(self) -> int:
+        with self._lock:
+            return sum(self._pages_indexed.get(file_hash, 0) for file_hash in self._target)
+
+    def file_progress(self) -> list[tuple[str, int, int]]:
+        """Return the name, indexed pages and total pages of each file of the current or
+        last sync, in file order.
+        """
+        with self._lock:
+            return [
+                (
+                    self._names.get(file_hash, file_hash),
+                    self._pages_indexed.get(file_hash, 0),
+                    self._pages.get(file_hash, 0),
+                )
+                for file_hash in self._target
+            ]
+
+    def sync(
+        self,
+        files: dict[str, tuple[str, bytes]],
+        cancel: threading.Event | None = None,
+    ) -> None:
+        """Update the index to contain exactly the given files.
+
+        `files` maps file content hashes to (file name, file contents). Stops early, leaving
+        the remaining files incomplete, once `cancel` is set.
+        """
+        with self._lock:
+            self._target = dict.fromkeys(files)
+            self._names.update((file_hash, name) for file_hash, (name, _) in files.items())
+            # Partially indexed files are indexed again from the start
+            removed = (set(self._chunk_ids) - set(files)) | (set(self._chunk_ids) - self._complete)
+            for file_hash in removed:
+                ids = self._chunk_ids.pop(file_hash)
+                self.vectorstore.delete(ids)
+                self.bm25.remove(ids)
+                self._pages.pop(file_hash, None)
+                self._pages_indexed.pop(file_hash, None)
+                self._complete.discard(file_hash)
+            added = [file_hash for file_hash in files if file_hash not in self._complete]
+        if not added:
+            return
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for file_hash in added:
+                # Files are saved under their hash, since uploads may share a name
+                temp_filepath = os.path.join(temp_dir, file_hash, files[file_hash][0])
+                os.makedirs(os.path.dirname(temp_filepath))
+                with open(temp_filepath, "wb") as f:
+                    f.write(files[file_hash][1])
+                paths.append(temp_filepath)
+                with self._lock:
+                    self._pages[file_hash] = count_pages(temp_filepath)
+                    self._pages_indexed[file_hash] = 0
+
+            page_counts = [self._pages[file_hash] for file_hash in added]
+            all_page_splits = iter_page_splits(paths, page_counts, self.max_workers)
+            try:
+                for file_hash, n_pages in zip(added, page_counts):
+                    file_pages = itertools.islice(all_page_splits, n_pages)
+                    if not self._index_file(file_hash, file_pages, cancel):
+                        return
+                    with self._lock:
+                        self._complete.add(file_hash)
+            finally:
+                all_page_splits.close()
+
+    def _index_file(
+        self,
+        file_hash: str,
+        file_pages: Iterator[list[Document]],
+        cancel: threading.Event | None,
+    ) -> bool:
+        with self._lock:
+            self._chunk_ids[file_hash] = []
+        batch: list[Document] = []
+        pages = 0
+        for page_splits in file_pages:
+            if cancel is not None and cancel.is_set():
+                return False
+            batch.extend(page_splits)
+            pages += 1
+            if len(batch) >= self.batch_size or len(self.vectorstore) == 0:
+                self._insert(file_hash, batch, pages)
+                batch, pages = [], 0
+        self._insert(file_hash, batch, pages)
+        return True
+
+    def _insert(self, file_hash: str, docs: list[Document], pages: int) -> None:
+        n_chunks = len(self._chunk_ids[file_hash])
+        ids = [_chunk_id(file_hash, n) for n in range(n_chunks, n_chunks + len(docs))]
+        self.vectorstore.add_documents(docs, ids=ids)
+        self.bm25.add(ids, [doc.page_content for doc in docs])
+        with self._lock:
+            self._chunk_ids[file_hash].extend(ids)
+            self._pages_indexed[file_hash] += pages
+
+    def start_sync(
+        self,
+        files: dict[str, tuple[str, bytes]],
+        on_done: Callable[[DocumentIndex], None] | None = None,
+    ) -> None:
+        """Run `sync` in a background thread, stopping any sync that is already running.
+
+        `on_done(index)` is called from the background thread once the sync completes.
+        Errors are stored in `error`.
+        """
+        self.stop()
+        with self._lock:
+            self._target = dict.fromkeys(files)
+            self._names.update((file_hash, name) for file_hash, (name, _) in files.items())
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run_sync, args=(files, self._cancel, on_done), daemon=True
+        )
+        self._thread.start()
+
+    def _run_sync(
+        self,
+        files: dict[str, tuple[str, bytes]],
+        cancel: threading.Event,
+        on_done: Callable[[DocumentIndex], None] | None,
+    ) -> None:
+        try:
+            self.sync(files, cancel)
+            if on_done is not None and not cancel.is_set():
+                on_done(self)
+        except Exception as e:
+            self.error = e
+
+    def stop(self) -> None:
+        """Stop the background sync, if any, and wait for it to finish."""
+        self._cancel.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def as_retriever(self, search_type: str = "similarity", **kwargs: Any) -> BaseRetriever:
+        """Return a retriever for the index. Besides the vector store's search types,
+        `search_type="hybrid"` fuses vector and BM25 rankings; `search_kwargs` can set its
+        `k`, `fetch_k` and `rrf_k`.
+        """
+        if search_type == "hybrid":
+            return HybridRetriever(
+                vectorstore=self.vectorstore, bm25=self.bm25, **kwargs.get("search_kwargs", {})
+            )
+        return self.vectorstore.as_retriever(search_type=search_type, **kwargs)
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        self.vectorstore.save(path)
+
+    @classmethod
+    def load(
+        cls,
+        path: str | os.PathLike[str],
+        embeddings: Embeddings,
+        file_hashes: Iterable[str] = (),
+        max_workers: int | None = None,
+    ) -> DocumentIndex:
+        """Load an index saved by `save`. `file_hashes` are the files it was saved with,
+        which include any files that have no chunks.
+        """
+        index = cls(embeddings, HnswVectorStore.load(path, embeddings), max_workers=max_workers)
+        index._complete.update(file_hashes)
+        index._target.update(dict.fromkeys(file_hashes))
+        return index
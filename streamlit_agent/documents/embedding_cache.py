@@ -0,0 +1,119 @@
+"""Persistent, content-addressed cache for document embeddings."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings model with a size-bounded on-disk cache of document embeddings.
+
+    Each embedding is stored as a raw float32 array in a file named by the hash of the
+    model name and the embedded text, so the same chunk is only ever embedded once per
+    model, across sessions and process restarts. Once the cache grows past `max_bytes`,
+    the least recently used embeddings are evicted. Queries are not cached.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model_name: str,
+        cache_dir: str | os.PathLike[str],
+        max_bytes: int = 512 * 1024 * 1024,
+    ) -> None:
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._dir = Path(cache_dir) / hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:16]
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        # Cache keys in least- to most-recently-used order, with their file sizes
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        files = [path for path in self._dir.iterdir() if path.suffix == ".f32"]
+        for path in sorted(files, key=lambda path: path.stat().st_mtime):
+            size = path.stat().st_size
+            self._entries[path.stem] = size
+            self._total_bytes += size
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self._dir / f"{key}.f32"
+
+    def _read(self, key: str) -> list[float] | None:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                vector = array("f", file.read())
+            # Update the modification time, which orders the LRU across restarts
+            os.utime(path)
+        except FileNotFoundError:
+            # Not cached, or evicted by another process sharing the cache directory
+            self._total_bytes -= self._entries.pop(key, 0)
+            return None
+        if key not in self._entries:
+            # Written by another process sharing the cache directory
+            self._entries[key] = len(vector) * vector.itemsize
+            self._total_bytes += self._entries[key]
+        self._entries.move_to_end(key)
+        return vector.tolist()
+
+    def _write(self, key: str, vector: list[float]) -> None:
+        data = array("f", vector).tobytes()
+        tmp_path = self._path(key).with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._total_bytes += len(data) - self._entries.get(key, 0)
+        self._entries[key] = len(data)
+        self._entries.move_to_end(key)
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self._key(text) for text in texts]
+        vectors: list[list[float] | None] = [None] * len(texts)
+        missing: dict[str, list[int]] = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._read(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    vectors[i] = vector
+            self.hits += len(texts) - sum(len(indices) for indices in missing.values())
+            self.misses += sum(len(indices) for indices in missing.values())
+
+        if missing:
+            # Embed each distinct missing text once
+            missing_keys = list(missing)
+            new_vectors = self.embeddings.embed_documents(
+                [texts[missing[key][0]] for key in missing_keys]
+            )
+            with self._lock:
+                for key, vector in zip(missing_keys, new_vectors):
+                    self._write(key, vector)
+                    for i in missing[key]:
+                        vectors[i] = vector
+                self._evict()
+
+        return vectors  # type: ignore[return-value]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
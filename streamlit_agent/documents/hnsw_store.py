@@ -0,0 +1,298 @@
+"""Persistent approximate-nearest-neighbor vector store backed by hnswlib."""
+
+from __future__ import annotations
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+import hnswlib
+import numpy as np
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+_INDEX_FILE = "index.bin"
+_DOCSTORE_FILE = "docstore.pickle"
+
+
+class HnswVectorStore(VectorStore):
+    """VectorStore that searches an HNSW graph, so query time grows sub-linearly with size.
+
+    Supports MMR search, deletion by id, and saving to / loading from a directory, so a
+    built index survives process restarts. Methods are safe to call from multiple threads.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        dim: int,
+        max_elements: int = 1024,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 64,
+    ) -> None:
+        self._embedding = embedding
+        self._dim = dim
+        self._ef_search = ef_search
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(
+            max_elements=max_elements,
+            M=M,
+            ef_construction=ef_construction,
+            allow_replace_deleted=True,
+        )
+        self._index.set_ef(ef_search)
+        self._docs: dict[int, Document] = {}
+        self._labels: dict[str, int] = {}
+        self._ids: dict[int, str] = {}
+        self._next_label = 0
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def items(self) -> list[tuple[str, Document]]:
+        """Return the ids and documents in the store, in insertion order."""
+        with self._lock:
+            labels = sorted(self._labels.items(), key=lambda item: item[1])
+            return [(id, self._docs[label]) for id, label in labels]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        return self.add_embeddings(texts, self._embedding.embed_documents(texts), metadatas, ids)
+
+    def add_embeddings(
+        self,
+        texts: list[str],
+        embeddings: list[list[float]],
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+    ) -> list[str]:
+        """Add texts with precomputed embeddings. Existing ids are replaced."""
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        with self._lock:
+            self.delete([id for id in ids if id in self._labels])
+            labels = list(range(self._next_label, self._next_label + len(texts)))
+            self._next_label += len(texts)
+
+            required = self._index.get_current_count() + len(texts)
+            if required > self._index.get_max_elements():
+                self._index.resize_index(max(required, 2 * self._index.get_max_elements()))
+            self._index.add_items(
+                np.asarray(embeddings, dtype=np.float32), labels, replace_deleted=True
+            )
+
+            for label, id, text, metadata in zip(labels, ids, texts, metadatas):
+                self._docs[label] = Document(page_content=text, metadata=metadata)
+                self._labels[id] = label
+                self._ids[label] = id
+        return ids
+
+    def delete(self, ids: list[str] | None = None, **kwargs: Any) -> bool | None:
+        if ids is None:
+            return False
+        with self._lock:
+            for id in ids:
+                label = self._labels.pop(id, None)
+                if label is not None:
+                    self._index.mark_deleted(label)
+                    del self._docs[label]
+                    del self._ids[label]
+        return True
+
+    def _knn(self, embedding: list[float], k: int) -> tuple[list[int], list[float]]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            # Deleted elements stay in the graph, but are never returned
+            k = min(k, len(self._docs))
+            # hnswlib needs ef >= k to return k results
+            ef = max(self._ef_search, k)
+            while k > 0:
+                self._index.set_ef(ef)
+                try:
+                    labels, distances = self._index.knn_query(vector, k=k)
+                    return labels[0].tolist(), distances[0].tolist()
+                except RuntimeError:
+                    # hnswlib raises when it finds fewer than k elements, which can happen
+                    # once many are deleted. Search the whole graph, then ask for fewer.
+                    if ef < self._index.get_current_count():
+                        ef = self._index.get_current_count()
+                    else:
+                        k //= 2
+            return [], []
+
+    def get_by_ids(self, ids: list[str]) -> list[Document]:
+        """Return the documents with the given ids, skipping ids that aren't in the store."""
+        with self._lock:
+            return [self._docs[self._labels[id]] for id in ids if id in self._labels]
+
+    def search_ids_by_vector(self, embedding: list[float], k: int = 4) -> list[tuple[str, float]]:
+        """Return the ids of the documents nearest to the embedding, with their distances."""
+        labels, distances = self._knn(embedding, k)
+        with self._lock:
+            return [
+                (self._ids[label], distance)
+                for label, distance in zip(labels, distances)
+                if label in self._ids
+            ]
+
+    def similarity_search_with_score_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """Return the documents nearest to the embedding, with their cosine distances."""
+        labels, distances = self._knn(embedding, k)
+        with self._lock:
+            return [
+                (self._docs[label], distance)
+                for label, distance in zip(labels, distances)
+                if label in self._docs
+            ]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self._embedding.embed_query(query), k, **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        return self.similarity_search_by_vector(self._embedding.embed_query(query), k, **kwargs)
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> list[Document]:
+        labels, _ = self._knn(embedding, fetch_k)
+        if not labels:
+            return []
+        with self._lock:
+            candidates = np.asarray(self._index.get_items(labels), dtype=np.float32)
+            selected = maximal_marginal_relevance(
+                np.asarray(embedding, dtype=np.float32), candidates, lambda_mult=lambda_mult, k=k
+            )
+            return [self._docs[labels[i]] for i in selected if labels[i] in self._docs]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> list[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self._embedding.embed_query(query), k, fetch_k, lambda_mult, **kwargs
+        )
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._cosine_relevance_score_fn
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        ids: list[str] | None = None,
+        **kwargs: Any,
+    ) -> HnswVectorStore:
+        vectors = embedding.embed_documents(texts)
+        dim = len(vectors[0]) if vectors else len(embedding.embed_query(""))
+        store = cls(embedding, dim, max_elements=max(len(texts), 1024), **kwargs)
+        store.add_embeddings(texts, vectors, metadatas, ids)
+        return store
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        """Save the index and its documents to a new directory at the given path.
+
+        The directory appears atomically, so a directory that exists is always complete.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with self._lock:
+                self._index.save_index(os.path.join(tmp_dir, _INDEX_FILE))
+                state = {
+                    "dim": self._dim,
+                    "ef_search": self._ef_search,
+                    "docs": self._docs,
+                    "labels": self._labels,
+                    "next_label": self._next_label,
+                }
+                with open(os.path.join(tmp_dir, _DOCSTORE_FILE), "wb") as file:
+                    pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_dir, path)
+        except OSError:
+            # Another process saved the same index first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not path.is_dir():
+                raise
+
+    @classmethod
+    def load(cls, path: str | os.PathLike[str], embedding: Embeddings) -> HnswVectorStore:
+        """Load an index previously written by `save`."""
+        with open(os.path.join(path, _DOCSTORE_FILE), "rb") as file:
+            state = pickle.load(file)
+        store = cls.__new__(cls)
+        store._embedding = embedding
+        store._dim = state["dim"]
+        store._ef_search = state["ef_search"]
+        store._index = hnswlib.Index(space="cosine", dim=store._dim)
+        store._index.load_index(os.path.join(path, _INDEX_FILE), allow_replace_deleted=True)
+        store._index.set_ef(store._ef_search)
+        store._docs = state["docs"]
+        store._labels = state["labels"]
+        store._ids = {label: id for id, label in store._labels.items()}
+        store._next_label = state["next_label"]
+        store._lock = threading.RLock()
+        # Update the modification time, which orders the LRU of evict_saved_stores
+        Path(path).touch()
+        return store
+
+
+def evict_saved_stores(
+    directory: str | os.PathLike[str], max_bytes: int, keep: str | os.PathLike[str]
+) -> None:
+    """Remove the least recently saved or loaded stores among those saved in `directory`,
+    except `keep`, until the rest take up at most `max_bytes`.
+    """
+    # Stores being saved are in hidden temporary directories
+    stores = [path for path in Path(directory).iterdir() if path.is_dir() and path.name[0] != "."]
+    sizes = {path: sum(file.stat().st_size for file in path.iterdir()) for path in stores}
+    total = sum(sizes.values())
+    for path in sorted(stores, key=lambda path: path.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        if path != Path(keep):
+            total -= sizes[path]
+            shutil.rmtree(path, ignore_errors=True)
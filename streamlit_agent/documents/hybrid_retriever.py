@@ -0,0 +1,44 @@
+"""Retriever that fuses lexical (BM25) and vector search results."""
+
+from __future__ import annotations
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from streamlit_agent.documents.bm25_index import BM25Index
+from streamlit_agent.documents.hnsw_store import HnswVectorStore
+
+
+class HybridRetriever(BaseRetriever):
+    """Ranks documents by reciprocal rank fusion of BM25 and vector similarity results.
+
+    Each search returns its top `fetch_k` ids, and a document scores 1 / (rrf_k + rank) for
+    each result list it appears in. Exact terms such as part numbers and error codes are
+    found by BM25 even when they carry little weight in the embedding.
+    """
+
+    vectorstore: HnswVectorStore
+    bm25: BM25Index
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        embedding = self.vectorstore.embeddings.embed_query(query)
+        rankings = [
+            self.vectorstore.search_ids_by_vector(embedding, self.fetch_k),
+            self.bm25.search(query, self.fetch_k),
+        ]
+        scores: dict[str, float] = {}
+        for ranking in rankings:
+            for rank, (id, _) in enumerate(ranking):
+                scores[id] = scores.get(id, 0.0) + 1 / (self.rrf_k + rank + 1)
+        # Ties keep the order in which the ids were first seen, vector results first
+        ids = sorted(scores, key=scores.__getitem__, reverse=True)[: self.k]
+        return self.vectorstore.get_by_ids(ids)
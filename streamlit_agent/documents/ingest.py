@@ -0,0 +1,90 @@
+"""Loading and splitting of uploaded PDF documents."""
+
+from __future__ import annotations
+
+import itertools
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator, Sequence
+
+import pypdf
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+# Pages split by each task of the process pool
+PAGES_PER_TASK = 8
+
+
+def count_pages(path: str) -> int:
+    return len(pypdf.PdfReader(path).pages)
+
+
+def split_pages(path: str, start: int, stop: int) -> list[list[Document]]:
+    """Split pages `start` to `stop` of a PDF file into chunks, returning the chunks of
+    each page.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+    pages = pypdf.PdfReader(path).pages
+    return [
+        text_splitter.split_documents(
+            [Document(page_content=pages[n].extract_text(), metadata={"source": path, "page": n})]
+        )
+        for n in range(start, stop)
+    ]
+
+
+def iter_page_splits(
+    paths: Sequence[str],
+    page_counts: Sequence[int],
+    max_workers: int | None = None,
+    pages_per_task: int = PAGES_PER_TASK,
+) -> Iterator[list[Document]]:
+    """Yield the chunks of each page of the given PDF files, in file and page order, as
+    soon as the page is split.
+
+    Pages are split `pages_per_task` at a time in a process pool, one worker per CPU by
+    default, a few tasks ahead of the consumer, so files are parsed while earlier pages are
+    being indexed. The first page is split in this process, so it can be indexed while the
+    workers start. With a single worker, everything is split in this process.
+    """
+    tasks = [
+        (path, start, min(start + pages_per_task, count))
+        for path, count in zip(paths, page_counts)
+        for start in range(0, count, pages_per_task)
+    ]
+    if max_workers is None:
+        max_workers = min(len(tasks), os.cpu_count() or 1)
+    if max_workers <= 1:
+        for task in tasks:
+            yield from split_pages(*task)
+        return
+
+    path, start, stop = tasks[0]
+    yield from split_pages(path, start, start + 1)
+    tasks[0] = (path, start + 1, stop)
+    # Use "spawn", since forking a process with running threads (such as the Streamlit
+    # server's) isn't safe.
+    executor = ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+    )
+    try:
+        remaining = iter(tasks)
+        # Stay a few tasks ahead, so that split pages don't pile up in memory
+        futures: deque[Future[list[list[Document]]]] = deque(
+            executor.submit(split_pages, *task)
+            for task in itertools.islice(remaining, 2 * max_workers)
+        )
+        while futures:
+            page_splits = futures.popleft().result()
+            for task in itertools.islice(remaining, 1):
+                futures.append(executor.submit(split_pages, *task))
+            yield from page_splits
+    finally:
+        # Also runs when the consumer stops early, such as when a sync is cancelled
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,154 @@
+"""Run the apps against fake backends, without OpenAI, DuckDuckGo or LangChain Hub access."""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import re
+from typing import Any, Iterator, List, Optional, Sequence, Tuple, Type, TypeVar
+from unittest import mock
+
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
+from langchain_core.pydantic_v1 import Field
+from streamlit.delta_generator import DeltaGenerator
+from streamlit.runtime.uploaded_file_manager import UploadedFile, UploadedFileRec
+
+from streamlit_agent.fakes.models import (
+    FakeChatModel,
+    FakeEmbeddings,
+    FakeLLM,
+    FakeScript,
+    FakeSearchAPIWrapper,
+    FakeSearchRun,
+)
+
+# Local copies of the LangChain Hub prompts used by the apps
+HUB_PROMPTS = {
+    "hwchase17/react": PromptTemplate.from_template(
+        """Answer the following questions as best you can. You have access to the following tools:
+
+{tools}
+
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+    ),
+    "hwchase17/openai-tools-agent": ChatPromptTemplate.from_messages(
+        [
+            ("system", "You are a helpful assistant"),
+            MessagesPlaceholder("chat_history", optional=True),
+            ("human", "{input}"),
+            MessagesPlaceholder("agent_scratchpad"),
+        ]
+    ),
+}
+
+# Where the apps import each backend from
+CHAT_MODEL_TARGETS = ("langchain_openai.ChatOpenAI", "langchain.chat_models.ChatOpenAI")
+LLM_TARGETS = ("langchain_openai.OpenAI", "langchain.llms.OpenAI", "langchain.llms.openai.OpenAI")
+SEARCH_TOOL_TARGETS = (
+    "langchain_community.tools.DuckDuckGoSearchRun",
+    "langchain.agents.load_tools.DuckDuckGoSearchRun",
+)
+SEARCH_WRAPPER_TARGETS = (
+    "langchain_community.utilities.DuckDuckGoSearchAPIWrapper",
+    "langchain.agents.load_tools.DuckDuckGoSearchAPIWrapper",
+)
+EMBEDDINGS_TARGETS = ("langchain.embeddings.HuggingFaceEmbeddings",)
+
+T = TypeVar("T")
+
+
+def _with_script(cls: Type[T], script: FakeScript) -> Type[T]:
+    """Subclass a fake model or tool, so that it is created with `script` by default."""
+    return type(
+        cls.__name__,
+        (cls,),
+        {
+            "__module__": cls.__module__,
+            "__annotations__": {"script": FakeScript},
+            "script": Field(default_factory=lambda: script),
+        },
+    )
+
+
+class _ApproximateEncoding:
+    """Stands in for a tiktoken encoding, whose files are downloaded on first use."""
+
+    def encode(self, text: str) -> List[str]:
+        return re.findall(r"\w+|[^\w\s]", text)
+
+
+def uploaded_file(name: str, data: bytes, type: str = "application/octet-stream") -> UploadedFile:
+    """Return a file as st.file_uploader returns it."""
+    file_id = hashlib.sha256(data).hexdigest()
+    record = UploadedFileRec(file_id=file_id, name=name, type=type, data=data)
+    return UploadedFile(record, None)
+
+
+@contextlib.contextmanager
+def fake_backends(
+    script: FakeScript,
+    uploads: Optional[Sequence[Tuple[str, bytes, str]]] = None,
+    embeddings_per_second: float = 500.0,
+) -> Iterator[None]:
+    """Within this context, the apps use fake LLMs, search and embeddings driven by
+    `script`, prompts from HUB_PROMPTS, and approximate token counts.
+
+    File uploaders return `uploads`, as (name, data, MIME type) tuples, since
+    streamlit.testing can't upload files.
+    """
+    chat_model = _with_script(FakeChatModel, script)
+    llm = _with_script(FakeLLM, script)
+    search_tool = _with_script(FakeSearchRun, script)
+
+    def search_wrapper(**kwargs: Any) -> FakeSearchAPIWrapper:
+        return FakeSearchAPIWrapper(script)
+
+    def embeddings(**kwargs: Any) -> FakeEmbeddings:
+        return FakeEmbeddings(texts_per_second=embeddings_per_second)
+
+    files = [uploaded_file(*upload) for upload in uploads or ()]
+
+    def file_uploader(*args: Any, accept_multiple_files: bool = False, **kwargs: Any) -> Any:
+        if accept_multiple_files:
+            return list(files)
+        return files[0] if files else None
+
+    replacements = [
+        *((target, chat_model) for target in CHAT_MODEL_TARGETS),
+        *((target, llm) for target in LLM_TARGETS),
+        *((target, search_tool) for target in SEARCH_TOOL_TARGETS),
+        *((target, search_wrapper) for target in SEARCH_WRAPPER_TARGETS),
+        *((target, embeddings) for target in EMBEDDINGS_TARGETS),
+        ("langchain.hub.pull", HUB_PROMPTS.__getitem__),
+        (
+            "streamlit_agent.memory.token_budget_memory._encoding",
+            lambda: _ApproximateEncoding(),
+        ),
+        # st.file_uploader is bound to the main DeltaGenerator on import
+        ("streamlit.file_uploader", file_uploader),
+    ]
+    with contextlib.ExitStack() as stack:
+        for target, replacement in replacements:
+            stack.enter_context(mock.patch(target, replacement))
+        stack.enter_context(
+            mock.patch.object(
+                DeltaGenerator,
+                "file_uploader",
+                lambda self, *args, **kwargs: file_uploader(*args, **kwargs),
+            )
+        )
+        yield
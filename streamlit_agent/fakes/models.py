@@ -0,0 +1,256 @@
+"""Deterministic stand-ins for the LLMs, tools and embeddings used by the apps.
+
+Responses come from a FakeScript, either written by hand or taken from a saved session in
+`runs/`, and are streamed word by word at a configurable rate, so that apps can be run and
+benchmarked without network access.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun, CallbackManagerForToolRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.language_models.llms import LLM
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.tools import BaseTool
+
+from streamlit_agent.callbacks.capturing_callback_handler import load_records_from_file
+from streamlit_agent.callbacks.record_file import CallbackType
+
+Response = Union[str, BaseMessage]
+
+
+def split_tokens(text: str) -> List[str]:
+    """Split text into word tokens, each with its leading whitespace."""
+    return re.findall(r"\s*\S+", text)
+
+
+class FakeScript:
+    """Responses of fake LLMs and outputs of fake tools, returned in order and repeated
+    once exhausted, with the timing of a real backend.
+
+    Prompts that start with a key of `prompt_responses` get the responses scripted for that
+    key, so that the calls of different chains, such as an agent and a chain run by one of
+    its tools, each follow their own script. Other prompts get `llm_responses`. The prompt
+    of a chat model is the content of its first message. Leading whitespace is ignored.
+
+    Tokens are streamed at `tokens_per_second`, after `first_token_latency` seconds, and
+    each tool call takes `tool_latency` seconds. Thread-safe, so that concurrent tool calls
+    and sessions can share a script.
+    """
+
+    def __init__(
+        self,
+        llm_responses: Sequence[Response] = (),
+        tool_outputs: Optional[Dict[str, Sequence[str]]] = None,
+        prompt_responses: Optional[Dict[str, Sequence[Response]]] = None,
+        tokens_per_second: float = 50.0,
+        first_token_latency: float = 0.3,
+        tool_latency: float = 0.5,
+    ) -> None:
+        self.llm_responses = list(llm_responses)
+        self.tool_outputs = {name: list(outputs) for name, outputs in (tool_outputs or {}).items()}
+        self.prompt_responses = {
+            prefix: list(responses) for prefix, responses in (prompt_responses or {}).items()
+        }
+        self.tokens_per_second = tokens_per_second
+        self.first_token_latency = first_token_latency
+        self.tool_latency = tool_latency
+        self._lock = threading.Lock()
+        self.reset()
+
+    @classmethod
+    def from_run(cls, path: str, **kwargs: Any) -> FakeScript:
+        """Script the LLM responses and tool outputs of a saved session, in the order they
+        were produced. LLM responses are keyed by the first line of their prompt. Keyword
+        arguments set the timing.
+        """
+        prompt_responses: Dict[str, List[str]] = {}
+        tool_outputs: Dict[str, List[str]] = {}
+        prefix = ""
+        # Tools can run within tools, such as a chain run by a tool
+        running_tools: List[str] = []
+        for record in load_records_from_file(path):
+            callback_type, args = record["callback_type"], record["args"]
+            if callback_type == CallbackType.ON_LLM_START:
+                prefix = args[1][0].lstrip().split("\n", 1)[0]
+            elif callback_type == CallbackType.ON_LLM_END:
+                prompt_responses.setdefault(prefix, []).append(args[0].generations[0][0].text)
+            elif callback_type == CallbackType.ON_TOOL_START:
+                running_tools.append(args[0]["name"])
+            elif callback_type in (CallbackType.ON_TOOL_END, CallbackType.ON_TOOL_ERROR):
+                name = running_tools.pop()
+                if callback_type == CallbackType.ON_TOOL_END:
+                    tool_outputs.setdefault(name, []).append(str(args[0]))
+        return cls(tool_outputs=tool_outputs, prompt_responses=prompt_responses, **kwargs)
+
+    def reset(self) -> None:
+        """Start again from the first response and tool output."""
+        with self._lock:
+            self._responses = itertools.cycle(self.llm_responses)
+            self._prompt_responses = {
+                prefix: itertools.cycle(responses)
+                for prefix, responses in self.prompt_responses.items()
+            }
+            self._outputs = {
+                name: itertools.cycle(outputs) for name, outputs in self.tool_outputs.items()
+            }
+
+    def next_response(self, prompt: str) -> Response:
+        prompt = prompt.lstrip()
+        with self._lock:
+            for prefix, responses in self._prompt_responses.items():
+                if prompt.startswith(prefix):
+                    return next(responses)
+            if not self.llm_responses:
+                raise ValueError(f"No response is scripted for the prompt {prompt[:80]!r}")
+            return next(self._responses)
+
+    def next_tool_output(self, tool: str, tool_input: str) -> str:
+        with self._lock:
+            outputs = self._outputs.get(tool)
+            return next(outputs) if outputs is not None else f"No results for {tool_input}"
+
+    def stream(self, text: str) -> Iterator[str]:
+        """Yield the tokens of text at the scripted rate."""
+        time.sleep(self.first_token_latency)
+        for token in split_tokens(text):
+            time.sleep(1 / self.tokens_per_second)
+            yield token
+
+
+class FakeLLM(LLM):
+    """Completion model that returns the responses of its script, streaming their tokens to
+    callbacks when `streaming` is set. Accepts and ignores the arguments of OpenAI.
+    """
+
+    script: FakeScript
+    streaming: bool = False
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        response = self.script.next_response(prompt)
+        text = response.content if isinstance(response, BaseMessage) else response
+        return _generate_text(self.script, text, self.streaming, run_manager)
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that returns the responses of its script, streaming their tokens to
+    callbacks when `streaming` is set. Scripted messages, such as ones with tool calls, are
+    returned as they are. Accepts and ignores the arguments of ChatOpenAI.
+    """
+
+    script: FakeScript
+    streaming: bool = False
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        response = self.script.next_response(str(messages[0].content) if messages else "")
+        message = response if isinstance(response, BaseMessage) else AIMessage(content=response)
+        _generate_text(self.script, str(message.content), self.streaming, run_manager)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def _generate_text(
+    script: FakeScript,
+    text: str,
+    streaming: bool,
+    run_manager: Optional[CallbackManagerForLLMRun],
+) -> str:
+    """Wait as long as the script's backend would take to generate text, streaming its
+    tokens to callbacks if `streaming` is set.
+    """
+    if streaming:
+        for token in script.stream(text):
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token)
+    else:
+        time.sleep(script.first_token_latency + len(split_tokens(text)) / script.tokens_per_second)
+    return text
+
+
+class FakeSearchRun(BaseTool):
+    """Search tool that returns the outputs scripted for its name."""
+
+    name: str = "duckduckgo_search"
+    description: str = "A search engine. Input should be a search query."
+    script: FakeScript
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _run(self, query: str, run_manager: Optional[CallbackManagerForToolRun] = None) -> str:
+        time.sleep(self.script.tool_latency)
+        return self.script.next_tool_output(self.name, query)
+
+
+class FakeSearchAPIWrapper:
+    """Stands in for DuckDuckGoSearchAPIWrapper, returning the outputs scripted for
+    `tool_name`.
+    """
+
+    def __init__(self, script: FakeScript, tool_name: str = "Search", **kwargs: Any) -> None:
+        self.script = script
+        self.tool_name = tool_name
+
+    def run(self, query: str) -> str:
+        time.sleep(self.script.tool_latency)
+        return self.script.next_tool_output(self.tool_name, query)
+
+    def results(self, query: str, max_results: int, **kwargs: Any) -> List[Dict[str, str]]:
+        return [{"snippet": self.run(query), "title": query, "link": "https://example.com"}]
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic random unit vectors, seeded by the text, computed at `texts_per_second`.
+    Accepts and ignores the arguments of HuggingFaceEmbeddings.
+    """
+
+    def __init__(self, dim: int = 384, texts_per_second: float = 500.0, **kwargs: Any) -> None:
+        self.dim = dim
+        self.texts_per_second = texts_per_second
+
+    def _embed(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(len(texts) / self.texts_per_second)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
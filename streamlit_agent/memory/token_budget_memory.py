@@ -0,0 +1,135 @@
+"""Conversation memory that keeps the chat history within a token budget."""
+
+from __future__ import annotations
+
+import functools
+from typing import Any, Dict, List, Optional
+
+import tiktoken
+from langchain.chains import LLMChain
+from langchain.memory.chat_memory import BaseChatMemory
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+
+# Approximate tokens added by the chat format around each message
+_TOKENS_PER_MESSAGE = 4
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding() -> tiktoken.Encoding:
+    return tiktoken.get_encoding("cl100k_base")
+
+
+@functools.lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Count the tokens in text. Counts are cached, since every turn re-counts the history."""
+    return len(_encoding().encode(text))
+
+
+def _message_tokens(message: BaseMessage) -> int:
+    return count_tokens(message.content) + _TOKENS_PER_MESSAGE
+
+
+def _is_human(message: BaseMessage) -> bool:
+    return message.type == "human" or getattr(message, "role", None) == "user"
+
+
+class TokenBudgetMemory(BaseChatMemory):
+    """Chat memory that never returns more than `max_tokens` tokens of history.
+
+    The most recent messages that fit in the budget are returned verbatim. If `llm` is set,
+    older messages are folded into a running summary, which is returned first as a system
+    message; only messages that left the budget since the last turn are summarized. Without
+    `llm`, older messages are dropped.
+
+    Keep the memory in `st.session_state`, so the summary carries over between reruns.
+    """
+
+    max_tokens: int = 2000
+    llm: Optional[BaseLanguageModel] = None
+    memory_key: str = "history"
+    human_prefix: str = "Human"
+    ai_prefix: str = "AI"
+    summary: str = ""
+    # Number of messages, from the start of the history, folded into the summary
+    summarized_messages: int = 0
+    # Tokens in the full history and in the budgeted history, on the last load
+    last_full_tokens: int = 0
+    last_prompt_tokens: int = 0
+
+    @property
+    def memory_variables(self) -> List[str]:
+        return [self.memory_key]
+
+    @property
+    def last_saved_tokens(self) -> int:
+        return self.last_full_tokens - self.last_prompt_tokens
+
+    def _summary_tokens(self) -> int:
+        if not self.summary:
+            return 0
+        tokens = count_tokens(self.summary) + _TOKENS_PER_MESSAGE
+        # A summary that doesn't fit the budget on its own is left out
+        return tokens if tokens <= self.max_tokens else 0
+
+    def _fit(self, messages: List[BaseMessage], counts: List[int], summary_tokens: int) -> int:
+        """Return the start of the longest run of recent whole turns that fits the budget,
+        not counting messages already in the summary.
+        """
+        start, used = len(messages), summary_tokens
+        while start > self.summarized_messages and used + counts[start - 1] <= self.max_tokens:
+            start -= 1
+            used += counts[start]
+        if start > 0:
+            # Don't keep the AI half of a turn without the human half
+            while start < len(messages) and not _is_human(messages[start]):
+                start += 1
+        return start
+
+    def budget_messages(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Return the summary and the most recent messages that fit in the token budget."""
+        if len(messages) < self.summarized_messages:
+            # The history was cleared
+            self.summary, self.summarized_messages = "", 0
+
+        counts = [_message_tokens(message) for message in messages]
+        summary_tokens = self._summary_tokens()
+        start = self._fit(messages, counts, summary_tokens)
+
+        while self.llm is not None and start > self.summarized_messages:
+            chain = LLMChain(llm=self.llm, prompt=SUMMARY_PROMPT)
+            self.summary = chain.predict(
+                summary=self.summary,
+                new_lines=get_buffer_string(
+                    messages[self.summarized_messages : start],
+                    human_prefix=self.human_prefix,
+                    ai_prefix=self.ai_prefix,
+                ),
+            )
+            self.summarized_messages = start
+            # The new summary may be longer, leaving room for fewer messages; any that no
+            # longer fit are summarized too, so that none are left out
+            summary_tokens = self._summary_tokens()
+            start = self._fit(messages, counts, summary_tokens)
+
+        budgeted = messages[start:]
+        if summary_tokens:
+            budgeted = [SystemMessage(content=self.summary), *budgeted]
+        self.last_full_tokens = sum(counts)
+        self.last_prompt_tokens = summary_tokens + sum(counts[start:])
+        return budgeted
+
+    def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        messages = self.budget_messages(self.chat_memory.messages)
+        if self.return_messages:
+            return {self.memory_key: messages}
+        return {
+            self.memory_key: get_buffer_string(
+                messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix
+            )
+        }
+
+    def clear(self) -> None:
+        super().clear()
+        self.summary, self.summarized_messages = "", 0
@@ -3,8 +3,17 @@ from langchain.agents import AgentType, initialize_agent, load_tools
 from langchain.callbacks import StreamlitCallbackHandler
 import streamlit as st
 
+from streamlit_agent.agents.tool_cache import ToolResultCache
+
+
+@st.cache_resource
+def get_tool_cache():
+    return ToolResultCache()
+
+
 llm = OpenAI(temperature=0, streaming=True)
-tools = load_tools(["ddg-search"])
+# Search results are shared by all sessions for an hour
+tools = [get_tool_cache().wrap(tool) for tool in load_tools(["ddg-search"])]
 agent = initialize_agent(
     tools, llm, agent=AgentType.ZERO_SHOT_REACT_DESCRIPTION, verbose=True
 )
@@ -1,20 +1,24 @@
 from pathlib import Path
+import tempfile
 
 import streamlit as st
 
 from langchain import hub
-from langchain.agents import AgentExecutor, Tool, create_react_agent
+from langchain.agents import AgentExecutor, Tool, create_openai_tools_agent, create_react_agent
 from langchain.chains import LLMMathChain
 from langchain_community.callbacks import StreamlitCallbackHandler
-from langchain_community.utilities import DuckDuckGoSearchAPIWrapper, SQLDatabase
+from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
 from langchain_core.runnables import RunnableConfig
 from langchain_experimental.sql import SQLDatabaseChain
-from langchain_openai import OpenAI
-from sqlalchemy import create_engine
-import sqlite3
+from langchain_openai import ChatOpenAI, OpenAI
 
-from streamlit_agent.callbacks.capturing_callback_handler import playback_callbacks
+from streamlit_agent.agents.parallel_executor import ParallelAgentExecutor
+from streamlit_agent.agents.tool_cache import ToolResultCache
+from streamlit_agent.callbacks.capturing_callback_handler import INSTANT, playback_callbacks
+from streamlit_agent.callbacks.record_file import convert_pickle_file
 from streamlit_agent.clear_results import with_clear_container
+from streamlit_agent.sql.cached_database import CachedSQLDatabase
+from streamlit_agent.sql.engine import create_sqlite_read_only_engine
 
 DB_PATH = (Path(__file__).parent / "Chinook.db").absolute()
 
@@ -25,6 +29,38 @@ SAVED_SESSIONS = {
     "are in the FooBar database?": "alanis.pickle",
 }
 
+PLAYBACK_SPEEDS = {"1x": 1.0, "2x": 2.0, "4x": 4.0, "Instant": INSTANT}
+# Coalesce replayed tokens so the answer is re-rendered at most ~20 times per second
+PLAYBACK_FRAME_INTERVAL = 0.05
+
+TOOL_CACHE_PATH = Path.home() / ".cache" / "streamlit_agent" / "tool_results.sqlite"
+# Seconds for which results of each tool are reused
+TOOL_CACHE_TTLS = {"Search": 60 * 60, "Calculator": 7 * 24 * 60 * 60}
+
+
+@st.cache_resource
+def saved_session_path(session_name: str) -> str:
+    """Convert a saved session to a record file once, so replays can stream it lazily."""
+    src_path = Path(__file__).parent / "runs" / session_name
+    dest_path = Path(tempfile.gettempdir()) / "streamlit_agent_runs" / f"{src_path.stem}.records"
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    convert_pickle_file(str(src_path), str(dest_path))
+    return str(dest_path)
+
+
+@st.cache_resource
+def get_tool_cache() -> ToolResultCache:
+    return ToolResultCache(disk_path=TOOL_CACHE_PATH)
+
+
+@st.cache_resource
+def get_db() -> CachedSQLDatabase:
+    """Connect to the FooBar DB once, so all sessions share its schema and query caches."""
+    # Make the DB connection read-only to reduce risk of injection attacks
+    # See: https://python.langchain.com/docs/security
+    return CachedSQLDatabase(create_sqlite_read_only_engine(str(DB_PATH)))
+
+
 st.set_page_config(
     page_title="MRKL", page_icon="🦜", layout="wide", initial_sidebar_state="collapsed"
 )
@@ -36,6 +72,14 @@ user_openai_api_key = st.sidebar.text_input(
     "OpenAI API Key", type="password", help="Set this to run your own custom questions."
 )
 
+playback_speed = st.sidebar.select_slider(
+    "Playback speed", options=list(PLAYBACK_SPEEDS), help="Speed of sample question replays."
+)
+parallel_tools = st.sidebar.checkbox(
+    "Run independent tool calls in parallel",
+    help="Use an OpenAI tools agent, which can request several tool calls at once.",
+)
+
 if user_openai_api_key:
     openai_api_key = user_openai_api_key
     enable_custom = True
@@ -48,12 +92,7 @@ llm = OpenAI(temperature=0, openai_api_key=openai_api_key, streaming=True)
 search = DuckDuckGoSearchAPIWrapper()
 llm_math_chain = LLMMathChain.from_llm(llm)
 
-# Make the DB connection read-only to reduce risk of injection attacks
-# See: https://python.langchain.com/docs/security
-creator = lambda: sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
-db = SQLDatabase(create_engine("sqlite:///", creator=creator))
-
-db_chain = SQLDatabaseChain.from_llm(llm, db)
+db_chain = SQLDatabaseChain.from_llm(llm, get_db())
 tools = [
     Tool(
         name="Search",
@@ -72,9 +111,29 @@ tools = [
     ),
 ]
 
+if parallel_tools:
+    # OpenAI function names can't contain spaces
+    tools = [
+        Tool(name=tool.name.replace(" ", "_"), func=tool.func, description=tool.description)
+        for tool in tools
+    ]
+# Search and math results are shared by all sessions until they expire
+tool_cache = get_tool_cache()
+tools = [
+    tool_cache.wrap(tool, ttl=TOOL_CACHE_TTLS[tool.name]) if tool.name in TOOL_CACHE_TTLS else tool
+    for tool in tools
+]
+
 # Initialize agent
-react_agent = create_react_agent(llm, tools, hub.pull("hwchase17/react"))
-mrkl = AgentExecutor(agent=react_agent, tools=tools)
+if parallel_tools:
+    chat_llm = ChatOpenAI(temperature=0, openai_api_key=openai_api_key, streaming=True)
+    tools_agent = create_openai_tools_agent(
+        chat_llm, tools, hub.pull("hwchase17/openai-tools-agent")
+    )
+    mrkl = ParallelAgentExecutor(agent=tools_agent, tools=tools)
+else:
+    react_agent = create_react_agent(llm, tools, hub.pull("hwchase17/react"))
+    mrkl = AgentExecutor(agent=react_agent, tools=tools)
 
 with st.form(key="form"):
     if not enable_custom:
@@ -101,11 +160,22 @@ if with_clear_container(submit_clicked):
     # If we've saved this question, play it back instead of actually running LangChain
     # (so that we don't exhaust our API calls unnecessarily)
     if user_input in SAVED_SESSIONS:
-        session_name = SAVED_SESSIONS[user_input]
-        session_path = Path(__file__).parent / "runs" / session_name
+        session_path = saved_session_path(SAVED_SESSIONS[user_input])
         print(f"Playing saved session: {session_path}")
-        answer = playback_callbacks([st_callback], str(session_path), max_pause_time=2)
+        answer = playback_callbacks(
+            [st_callback],
+            session_path,
+            max_pause_time=2,
+            speed=PLAYBACK_SPEEDS[playback_speed],
+            frame_interval=PLAYBACK_FRAME_INTERVAL,
+        )
     else:
         answer = mrkl.invoke({"input": user_input}, cfg)
 
     answer_container.write(answer["output"])
+
+for tool_name, stats in tool_cache.stats().items():
+    st.sidebar.caption(
+        f"{tool_name}: {stats.hits + stats.disk_hits} of "
+        f"{stats.hits + stats.disk_hits + stats.misses} calls cached ({stats.hit_rate:.0%})"
+    )
@@ -1,24 +1,97 @@
-from langchain.agents import ConversationalChatAgent, AgentExecutor
-from langchain.memory import ConversationBufferMemory
+from langchain.agents import ConversationalChatAgent, AgentExecutor, create_openai_tools_agent
 from langchain_community.callbacks import StreamlitCallbackHandler
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_community.tools import DuckDuckGoSearchRun
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.runnables import RunnableConfig
 from langchain_openai import ChatOpenAI
 
+import time
+from pathlib import Path
+
 import streamlit as st
 
+from streamlit_agent.agents.parallel_executor import ParallelAgentExecutor
+from streamlit_agent.agents.session_cache import SessionResourceCache, fingerprint
+from streamlit_agent.agents.tool_cache import ToolResultCache
+from streamlit_agent.memory.token_budget_memory import TokenBudgetMemory
+
 st.set_page_config(page_title="LangChain: Chat with search", page_icon="🦜")
 st.title("🦜 LangChain: Chat with search")
 
 openai_api_key = st.sidebar.text_input("OpenAI API Key", type="password")
+parallel_tools = st.sidebar.checkbox(
+    "Run independent searches in parallel",
+    help="Use an OpenAI tools agent, which can request several searches at once.",
+)
 
-msgs = StreamlitChatMessageHistory()
-memory = ConversationBufferMemory(
-    chat_memory=msgs, return_messages=True, memory_key="chat_history", output_key="output"
+# Most tokens of chat history sent with each prompt
+HISTORY_TOKEN_BUDGET = 1000
+MODEL = "gpt-3.5-turbo"
+# Seconds after which an idle session's agent is dropped
+AGENT_IDLE_TTL = 30 * 60
+TOOL_CACHE_PATH = Path.home() / ".cache" / "streamlit_agent" / "tool_results.sqlite"
+# Seconds for which search results are reused
+SEARCH_CACHE_TTL = 60 * 60
+PARALLEL_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You are a helpful assistant. Use the Search tool to look up facts you don't know, "
+            "and search for independent facts at the same time.",
+        ),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ]
 )
+
+
+@st.cache_resource
+def get_agent_cache():
+    return SessionResourceCache(idle_ttl=AGENT_IDLE_TTL)
+
+
+@st.cache_resource
+def get_tool_cache():
+    return ToolResultCache(disk_path=TOOL_CACHE_PATH)
+
+
+def create_executor(openai_api_key, memory, parallel_tools):
+    llm = ChatOpenAI(model_name=MODEL, openai_api_key=openai_api_key, streaming=True)
+    memory.llm = ChatOpenAI(model_name=MODEL, openai_api_key=openai_api_key)
+    # Search results are shared by all sessions until they expire
+    tools = [get_tool_cache().wrap(DuckDuckGoSearchRun(name="Search"), ttl=SEARCH_CACHE_TTL)]
+    if parallel_tools:
+        return ParallelAgentExecutor(
+            agent=create_openai_tools_agent(llm, tools, PARALLEL_PROMPT),
+            tools=tools,
+            memory=memory,
+            return_intermediate_steps=True,
+            handle_parsing_errors=True,
+        )
+    chat_agent = ConversationalChatAgent.from_llm_and_tools(llm=llm, tools=tools)
+    return AgentExecutor.from_agent_and_tools(
+        agent=chat_agent,
+        tools=tools,
+        memory=memory,
+        return_intermediate_steps=True,
+        handle_parsing_errors=True,
+    )
+
+
+msgs = StreamlitChatMessageHistory()
+if "memory" not in st.session_state:
+    st.session_state.memory = TokenBudgetMemory(
+        max_tokens=HISTORY_TOKEN_BUDGET,
+        chat_memory=msgs,
+        return_messages=True,
+        memory_key="chat_history",
+        output_key="output",
+    )
+memory = st.session_state.memory
 if len(msgs.messages) == 0 or st.sidebar.button("Reset chat history"):
-    msgs.clear()
+    memory.clear()
     msgs.add_ai_message("How can I help you?")
     st.session_state.steps = {}
 
@@ -41,16 +114,14 @@ if prompt := st.chat_input(placeholder="Who won the Women's U.S. Open in 2018?")
         st.info("Please add your OpenAI API key to continue.")
         st.stop()
 
-    llm = ChatOpenAI(model_name="gpt-3.5-turbo", openai_api_key=openai_api_key, streaming=True)
-    tools = [DuckDuckGoSearchRun(name="Search")]
-    chat_agent = ConversationalChatAgent.from_llm_and_tools(llm=llm, tools=tools)
-    executor = AgentExecutor.from_agent_and_tools(
-        agent=chat_agent,
-        tools=tools,
-        memory=memory,
-        return_intermediate_steps=True,
-        handle_parsing_errors=True,
+    # The executor is reused across turns until the API key or model change
+    start = time.perf_counter()
+    executor = get_agent_cache().get_or_create(
+        "search_executor",
+        (fingerprint(openai_api_key), MODEL, parallel_tools),
+        lambda: create_executor(openai_api_key, memory, parallel_tools),
     )
+    setup_ms = (time.perf_counter() - start) * 1000
     with st.chat_message("assistant"):
         st_cb = StreamlitCallbackHandler(st.container(), expand_new_thoughts=False)
         cfg = RunnableConfig()
@@ -58,3 +129,10 @@ if prompt := st.chat_input(placeholder="Who won the Women's U.S. Open in 2018?")
         response = executor.invoke(prompt, cfg)
         st.write(response["output"])
         st.session_state.steps[str(len(msgs.messages) - 1)] = response["intermediate_steps"]
+    st.sidebar.caption(
+        f"Chat history: {memory.last_prompt_tokens} tokens sent, "
+        f"{memory.last_saved_tokens} saved by the token budget. Agent setup: {setup_ms:.1f} ms"
+    )
+    search_stats = get_tool_cache().stats().get("Search")
+    if search_stats:
+        st.sidebar.caption(f"Search results cached: {search_stats.hit_rate:.0%} of searches")
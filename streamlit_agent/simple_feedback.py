@@ -1,5 +1,4 @@
 from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferMemory
 from langchain_community.chat_message_histories import StreamlitChatMessageHistory
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tracers import LangChainTracer
@@ -10,6 +9,8 @@ import streamlit as st
 from streamlit_feedback import streamlit_feedback
 import time
 
+from streamlit_agent.memory.token_budget_memory import TokenBudgetMemory
+
 st.set_page_config(page_title="LangChain: Simple feedback", page_icon="🦜")
 st.title("🦜 LangChain: Simple feedback")
 
@@ -32,13 +33,19 @@ run_collector = RunCollectorCallbackHandler()
 cfg = RunnableConfig()
 cfg["callbacks"] = [ls_tracer, run_collector]
 
+# Most tokens of chat history sent with each prompt
+HISTORY_TOKEN_BUDGET = 1000
+
 msgs = StreamlitChatMessageHistory()
-memory = ConversationBufferMemory(chat_memory=msgs)
+if "memory" not in st.session_state:
+    st.session_state.memory = TokenBudgetMemory(max_tokens=HISTORY_TOKEN_BUDGET, chat_memory=msgs)
+memory = st.session_state.memory
+memory.llm = OpenAI(openai_api_key=openai_api_key)
 llm_chain = ConversationChain(llm=OpenAI(openai_api_key=openai_api_key), memory=memory)
 
 reset_history = st.sidebar.button("Reset chat history")
 if len(msgs.messages) == 0 or reset_history:
-    msgs.clear()
+    memory.clear()
     msgs.add_ai_message("How can I help you?")
     st.session_state["last_run"] = None
 
@@ -52,6 +59,10 @@ if input := st.chat_input(placeholder="Tell me a joke about a shark?"):
         response = llm_chain.invoke(input, cfg)
         st.write(response["response"])
         st.session_state.last_run = run_collector.traced_runs[0].id
+    st.sidebar.caption(
+        f"Chat history: {memory.last_prompt_tokens} tokens sent, "
+        f"{memory.last_saved_tokens} saved by the token budget"
+    )
 
 
 @st.cache_data(ttl="2h", show_spinner=False)
@@ -0,0 +1,182 @@
+"""SQLDatabase that caches schema information and read-only query results."""
+
+from __future__ import annotations
+
+import contextlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    MutableSequence,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+# Quoted strings and identifiers, which normalization leaves untouched
+_QUOTED_RE = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`)""")
+_WHITESPACE_RE = re.compile(r"\s+")
+_READ_ONLY_START_RE = re.compile(r"^\s*(select|with|explain|show|describe|values)\b", re.I)
+_WRITE_KEYWORD_RE = re.compile(
+    r"\b(insert|update|delete|merge|create|alter|drop|truncate|rename|grant|revoke|attach|"
+    r"detach|vacuum|reindex|lock|call|exec|execute|into|set)\b",
+    re.I,
+)
+
+
+def normalize_sql(command: str) -> str:
+    """Collapse whitespace and drop trailing semicolons outside of quoted strings, so that
+    statements differing only in formatting share a cache entry.
+    """
+    parts = _QUOTED_RE.split(command.strip().rstrip(";").strip())
+    # Odd-numbered parts are the quoted strings
+    return "".join(part if i % 2 else _WHITESPACE_RE.sub(" ", part) for i, part in enumerate(parts))
+
+
+def is_read_only(command: str) -> bool:
+    """Conservatively check that a statement only reads data."""
+    unquoted = " ".join(_QUOTED_RE.split(command)[::2])
+    return bool(_READ_ONLY_START_RE.match(unquoted)) and not _WRITE_KEYWORD_RE.search(unquoted)
+
+
+class QueryTiming(NamedTuple):
+    kind: Literal["query", "schema"]
+    statement: str
+    seconds: float
+    cached: bool
+
+
+# Where queries run in the current context are recorded, see CachedSQLDatabase.log_queries
+_query_log: ContextVar[MutableSequence[QueryTiming] | None] = ContextVar("query_log", default=None)
+
+
+class CachedSQLDatabase(SQLDatabase):
+    """SQLDatabase that memoizes table info and caches read-only query results.
+
+    Table info, including sample rows, is memoized per table, and results of read-only
+    statements are kept in an LRU cache of up to `max_cached_queries` entries, keyed by
+    the normalized SQL. Caches are only invalidated by `invalidate()`, or when a statement
+    that may write is run through this object. Create one instance per database URI
+    (e.g. with `st.cache_resource`) to share its caches.
+
+    Queries and table info lookups are timed, and recorded in the log of the caller that
+    runs them, see `log_queries`. With `max_rows`, queries return at most that many rows.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        max_cached_queries: int = 256,
+        max_rows: int | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self.max_cached_queries = max_cached_queries
+        self.max_rows = max_rows
+        self._cache_lock = threading.Lock()
+        self._table_info: dict[str, str] = {}
+        # Rows are stored as tuples of items, so callers can't change cached results
+        self._results: OrderedDict[
+            tuple[str, str], tuple[tuple[tuple[str, Any], ...], ...]
+        ] = OrderedDict()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def engine(self) -> Engine:
+        return self._engine
+
+    def invalidate(self) -> None:
+        """Forget all cached table info and query results."""
+        with self._cache_lock:
+            self._table_info.clear()
+            self._results.clear()
+
+    @contextlib.contextmanager
+    def log_queries(self, log: MutableSequence[QueryTiming]) -> Iterator[None]:
+        """Within this context, record queries and table info lookups in `log`, such as a
+        `deque` kept per session. Calls from other sessions sharing this database, which
+        run in other contexts, aren't recorded.
+        """
+        token = _query_log.set(log)
+        try:
+            yield
+        finally:
+            _query_log.reset(token)
+
+    def _log(
+        self, kind: Literal["query", "schema"], statement: str, start: float, cached: bool
+    ) -> None:
+        log = _query_log.get()
+        if log is not None:
+            log.append(QueryTiming(kind, statement, time.perf_counter() - start, cached))
+
+    def get_table_info(self, table_names: Optional[List[str]] = None) -> str:
+        start = time.perf_counter()
+        if table_names is None:
+            table_names = list(self.get_usable_table_names())
+        with self._cache_lock:
+            infos = {name: self._table_info.get(name) for name in table_names}
+        cached = all(info is not None for info in infos.values())
+        for name, info in infos.items():
+            if info is None:
+                # Validates the name, raising ValueError for unknown tables
+                infos[name] = super().get_table_info([name])
+                with self._cache_lock:
+                    self._table_info[name] = infos[name]
+        self._log("schema", ", ".join(table_names), start, cached=cached)
+        # Empty for internal tables, such as SQLite's
+        return "\n\n".join(sorted(info for info in infos.values() if info))
+
+    def _execute_uncached(
+        self, command: str, fetch: Literal["all", "one"]
+    ) -> Sequence[Dict[str, Any]]:
+        if self.max_rows is None or fetch == "one":
+            return super()._execute(command, fetch)
+        if self._schema is not None:
+            # Leave setting the schema search path to SQLDatabase
+            return super()._execute(command, fetch)[: self.max_rows]
+        # Only fetch the rows that are returned
+        with self._engine.begin() as connection:
+            cursor = connection.execute(text(command))
+            if not cursor.returns_rows:
+                return []
+            return [row._asdict() for row in cursor.fetchmany(self.max_rows)]
+
+    def _execute(
+        self, command: str, fetch: Literal["all", "one"] = "all"
+    ) -> Sequence[Dict[str, Any]]:
+        start = time.perf_counter()
+        statement = normalize_sql(command)
+        if not is_read_only(statement):
+            try:
+                return self._execute_uncached(command, fetch)
+            finally:
+                # The data, and so also sample rows and cached results, may have changed
+                self.invalidate()
+                self._log("query", statement, start, cached=False)
+
+        key = (statement, fetch)
+        with self._cache_lock:
+            rows = self._results.get(key)
+            if rows is not None:
+                self._results.move_to_end(key)
+        if rows is None:
+            rows = tuple(tuple(row.items()) for row in self._execute_uncached(command, fetch))
+            with self._cache_lock:
+                self._results[key] = rows
+                while len(self._results) > self.max_cached_queries:
+                    self._results.popitem(last=False)
+            self._log("query", statement, start, cached=False)
+        else:
+            self._log("query", statement, start, cached=True)
+        return [dict(row) for row in rows]
@@ -0,0 +1,112 @@
+"""Pooled SQLAlchemy engines with per-statement timeouts."""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from typing import Any, NamedTuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# Number of SQLite virtual machine instructions between timeout checks
+_SQLITE_PROGRESS_INTERVAL = 10_000
+
+
+class PoolStats(NamedTuple):
+    size: int
+    checked_out: int
+    idle: int
+    overflow: int
+
+
+def pool_stats(engine: Engine) -> PoolStats | None:
+    """Return the utilization of the engine's connection pool, if it is a QueuePool."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    return PoolStats(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        idle=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+    )
+
+
+def _set_statement_timeout(engine: Engine, timeout: float) -> None:
+    """Abort statements that run longer than `timeout` seconds, where the dialect allows."""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        # SQLite has no timeout setting, so a progress handler aborts statements that are
+        # past the deadline set when they started
+        @event.listens_for(engine, "connect")
+        def install_progress_handler(dbapi_connection: Any, connection_record: Any) -> None:
+            info = connection_record.info
+
+            def past_deadline() -> bool:
+                return time.monotonic() > info.get("statement_deadline", float("inf"))
+
+            dbapi_connection.set_progress_handler(past_deadline, _SQLITE_PROGRESS_INTERVAL)
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def set_deadline(connection: Any, *args: Any) -> None:
+            connection.info["statement_deadline"] = time.monotonic() + timeout
+
+        return
+
+    statements = {
+        "postgresql": f"SET statement_timeout = {int(timeout * 1000)}",
+        "mysql": f"SET SESSION max_execution_time = {int(timeout * 1000)}",
+        "mariadb": f"SET SESSION max_statement_time = {timeout}",
+    }
+    if dialect not in statements:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_session_timeout(dbapi_connection: Any, connection_record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute(statements[dialect])
+        cursor.close()
+        dbapi_connection.commit()
+
+
+def create_pooled_engine(
+    uri: str,
+    pool_size: int = 5,
+    max_overflow: int = 10,
+    pool_timeout: float = 30,
+    pool_pre_ping: bool = True,
+    statement_timeout: float | None = 30,
+    **kwargs: Any,
+) -> Engine:
+    """Create an engine with a bounded connection pool.
+
+    Up to `pool_size` connections are kept open, and up to `max_overflow` more are opened
+    under load; beyond that, checkouts wait up to `pool_timeout` seconds. With
+    `pool_pre_ping`, connections are tested before use, so dropped connections are replaced
+    instead of failing a query. Statements are aborted after `statement_timeout` seconds on
+    SQLite, PostgreSQL, MySQL and MariaDB.
+    """
+    engine = create_engine(
+        uri,
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_pre_ping=pool_pre_ping,
+        **kwargs,
+    )
+    if statement_timeout is not None:
+        _set_statement_timeout(engine, statement_timeout)
+    return engine
+
+
+def create_sqlite_read_only_engine(path: str, **kwargs: Any) -> Engine:
+    """Create a pooled engine for a SQLite file, opened read-only.
+
+    Pooled connections may be used from any thread, one thread at a time, so a single
+    engine can be shared by all sessions. Accepts the arguments of `create_pooled_engine`.
+    """
+    creator = lambda: sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    return create_pooled_engine("sqlite:///", creator=creator, **kwargs)
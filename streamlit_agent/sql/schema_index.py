@@ -0,0 +1,188 @@
+"""Precomputed, searchable summaries of the tables in a database.
+
+Build and save an index offline, where chat_with_sql_db.py loads it from, with:
+
+    python -m streamlit_agent.sql.schema_index DATABASE_URI [OUTPUT_PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import pickle
+import re
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.engine import Engine
+
+from streamlit_agent.documents.bm25_index import BM25Index
+
+SCHEMA_INDEX_DIR = Path.home() / ".cache" / "streamlit_agent" / "schema_indexes"
+
+_WORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+
+def _words(text: str) -> list[str]:
+    """Split identifiers like "InvoiceLine" and "customer_id" into singular, lowercase words."""
+    words = []
+    for word in _WORD_RE.findall(text):
+        word = word.lower()
+        if len(word) > 3 and word.endswith("ies"):
+            word = word[:-3] + "y"
+        elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return words
+
+
+class TableSummary:
+    __slots__ = ("name", "columns", "foreign_keys")
+
+    def __init__(self, name: str, columns: list[str], foreign_keys: dict[str, str]) -> None:
+        self.name = name
+        self.columns = columns
+        # Column -> referenced "table.column"
+        self.foreign_keys = foreign_keys
+
+    def __str__(self) -> str:
+        columns = [
+            f"{column} -> {self.foreign_keys[column]}" if column in self.foreign_keys else column
+            for column in self.columns
+        ]
+        return f"{self.name}({', '.join(columns)})"
+
+    @property
+    def referenced_tables(self) -> set[str]:
+        return {reference.split(".")[0] for reference in self.foreign_keys.values()}
+
+
+class SchemaIndex:
+    """Compact one-line summaries of every table, searchable by keyword and, optionally, by
+    embedding similarity, so that only the tables relevant to a question need to be shown
+    to an LLM.
+
+    Keyword search scores the words of table and column names with BM25. With
+    `embeddings`, table summaries are also embedded, and the two rankings are fused by
+    reciprocal rank. Build the index once per database, as inspecting hundreds of tables
+    is slow.
+    """
+
+    def __init__(
+        self,
+        tables: list[TableSummary],
+        embeddings: Embeddings | None = None,
+        vectors: np.ndarray | None = None,
+    ) -> None:
+        self.tables = {table.name: table for table in tables}
+        self.embeddings = embeddings
+        self._bm25 = BM25Index()
+        self._bm25.add(
+            [table.name for table in tables],
+            [" ".join(_words(" ".join([table.name, *table.columns]))) for table in tables],
+        )
+        if embeddings is not None and vectors is None and tables:
+            vectors = np.asarray(
+                embeddings.embed_documents([str(table) for table in tables]), dtype=np.float32
+            )
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        self._vectors = vectors
+
+    @classmethod
+    def build(
+        cls,
+        engine: Engine,
+        table_names: list[str] | None = None,
+        embeddings: Embeddings | None = None,
+    ) -> SchemaIndex:
+        """Inspect the tables of a database and index their summaries."""
+        inspector = inspect(engine)
+        if table_names is None:
+            table_names = inspector.get_table_names()
+        tables = []
+        for name in table_names:
+            columns = [column["name"] for column in inspector.get_columns(name)]
+            foreign_keys = {}
+            for foreign_key in inspector.get_foreign_keys(name):
+                for column, referred_column in zip(
+                    foreign_key["constrained_columns"], foreign_key["referred_columns"]
+                ):
+                    foreign_keys[column] = f"{foreign_key['referred_table']}.{referred_column}"
+            tables.append(TableSummary(name, columns, foreign_keys))
+        return cls(tables, embeddings)
+
+    def search(self, question: str, k: int = 5) -> list[str]:
+        """Return the names of the k tables most relevant to the question."""
+        if len(self.tables) <= k:
+            return list(self.tables)
+        rankings = [[name for name, _ in self._bm25.search(" ".join(_words(question)), k)]]
+        if self.embeddings is not None and self._vectors is not None:
+            query = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+            similarities = self._vectors @ (query / np.linalg.norm(query))
+            names = list(self.tables)
+            rankings.append([names[i] for i in np.argsort(-similarities)[:k]])
+        scores: dict[str, float] = {}
+        for ranking in rankings:
+            for rank, name in enumerate(ranking):
+                scores[name] = scores.get(name, 0.0) + 1 / (60 + rank + 1)
+        return sorted(scores, key=scores.__getitem__, reverse=True)[:k]
+
+    def related_tables(self, table_names: list[str]) -> list[str]:
+        """Return the indexed tables that the given tables reference, or are referenced by.
+        Referenced tables that aren't indexed, such as ignored tables, are left out.
+        """
+        selected = set(table_names)
+        related = set()
+        for table in self.tables.values():
+            if table.name in selected:
+                related |= table.referenced_tables
+            elif table.referenced_tables & selected:
+                related.add(table.name)
+        return sorted((related & self.tables.keys()) - selected)
+
+    def summaries(self, table_names: list[str]) -> str:
+        return "\n".join(str(self.tables[name]) for name in table_names)
+
+    def save(self, path: str | os.PathLike[str]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump((list(self.tables.values()), self._vectors), file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(
+        cls, path: str | os.PathLike[str], embeddings: Embeddings | None = None
+    ) -> SchemaIndex:
+        """Load an index written by `save`. Pass the embeddings it was built with, if any."""
+        with open(path, "rb") as file:
+            tables, vectors = pickle.load(file)
+        return cls(tables, embeddings, vectors if embeddings is not None else None)
+
+
+def schema_index_path(db_uri: str) -> Path:
+    """Return where the index of the database at `db_uri` is saved by default."""
+    return SCHEMA_INDEX_DIR / f"{hashlib.sha256(db_uri.encode()).hexdigest()}.pickle"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build a schema index for a database.")
+    parser.add_argument("uri", help="SQLAlchemy database URI")
+    parser.add_argument(
+        "output",
+        nargs="?",
+        help="Path to save the index to. Defaults to where chat_with_sql_db.py looks for it.",
+    )
+    args = parser.parse_args()
+    output = args.output or schema_index_path(args.uri)
+    index = SchemaIndex.build(create_engine(args.uri))
+    index.save(output)
+    print(f"Indexed {len(index.tables)} tables to {output}")
+
+
+if __name__ == "__main__":
+    main()
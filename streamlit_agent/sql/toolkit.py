@@ -0,0 +1,64 @@
+"""SQL agent toolkit that shows the agent only the tables relevant to the question."""
+
+from __future__ import annotations
+
+from typing import List, Optional
+
+from langchain_community.agent_toolkits import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import ListSQLDatabaseTool
+from langchain_community.utilities import SQLDatabase
+from langchain_core.callbacks import CallbackManagerForToolRun
+from langchain_core.tools import BaseTool
+
+from streamlit_agent.sql.schema_index import SchemaIndex
+
+
+class RelevantTablesTool(BaseTool):
+    """Replaces the agent's table listing with the schema of the relevant tables.
+
+    Listing every table of a large database makes for a huge prompt, after which the agent
+    still needs a round trip to fetch the schema of the tables it picks. Instead, this
+    returns the schema and sample rows of the tables that match the question, plus one-line
+    summaries of the tables related to them by foreign keys.
+    """
+
+    name: str = "sql_db_list_tables"
+    description: str = (
+        "Input is an empty string, output is the schema and sample rows of the tables most "
+        "relevant to the question, followed by summaries of related tables."
+    )
+    db: SQLDatabase
+    schema_index: SchemaIndex
+    question: str
+    k: int = 5
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _run(
+        self, tool_input: str = "", run_manager: Optional[CallbackManagerForToolRun] = None
+    ) -> str:
+        tables = self.schema_index.search(self.question, self.k)
+        if not tables:
+            return "No tables matched the question. All tables:\n" + ", ".join(
+                self.schema_index.tables
+            )
+        output = self.db.get_table_info(tables)
+        related = self.schema_index.related_tables(tables)
+        if related:
+            output += "\n\nRelated tables:\n" + self.schema_index.summaries(related)
+        return output
+
+
+class SchemaIndexToolkit(SQLDatabaseToolkit):
+    """SQLDatabaseToolkit whose table listing tool is a RelevantTablesTool."""
+
+    schema_index: SchemaIndex
+    question: str
+
+    def get_tools(self) -> List[BaseTool]:
+        tools = [tool for tool in super().get_tools() if not isinstance(tool, ListSQLDatabaseTool)]
+        relevant_tables_tool = RelevantTablesTool(
+            db=self.db, schema_index=self.schema_index, question=self.question
+        )
+        return [*tools, relevant_tables_tool]
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+
+from streamlit_agent.documents import answer_cache
+from streamlit_agent.documents.answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(answer_cache, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def test_lookup_matches_similar_questions_with_the_same_fingerprint(tmp_path, clock):
+    cache = SemanticAnswerCache(tmp_path / "answers.pkl", threshold=0.95)
+    cache.store("docs-a", "What is the warranty?", [1.0, 0.0, 0.0], "Two years.")
+
+    # Cosine similarity 0.995, and a different scale doesn't matter
+    assert cache.lookup("docs-a", [2.0, 0.2, 0.0]) == "Two years."
+    # Cosine similarity 0.93
+    assert cache.lookup("docs-a", [1.0, 0.4, 0.0]) is None
+    assert cache.lookup("docs-b", [1.0, 0.0, 0.0]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_answers_expire_after_ttl_also_when_reloaded(tmp_path, clock):
+    path = tmp_path / "answers.pkl"
+    cache = SemanticAnswerCache(path, ttl=60)
+    cache.store("docs", "old question", [1.0, 0.0], "old answer")
+    clock.now += 30
+    cache.store("docs", "new question", [0.0, 1.0], "new answer")
+
+    clock.now += 40
+    assert cache.lookup("docs", [1.0, 0.0]) is None
+    assert cache.lookup("docs", [0.0, 1.0]) == "new answer"
+    assert len(SemanticAnswerCache(path, ttl=60)) == 1
+
+    clock.now += 30
+    assert len(SemanticAnswerCache(path, ttl=60)) == 0
+
+
+def test_least_recently_used_answers_are_evicted(tmp_path, clock):
+    cache = SemanticAnswerCache(tmp_path / "answers.pkl", max_entries=2)
+    cache.store("docs", "first", [1.0, 0.0, 0.0], "1")
+    cache.store("docs", "second", [0.0, 1.0, 0.0], "2")
+    assert cache.lookup("docs", [1.0, 0.0, 0.0]) == "1"
+
+    cache.store("docs", "third", [0.0, 0.0, 1.0], "3")
+    assert cache.lookup("docs", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("docs", [1.0, 0.0, 0.0]) == "1"
+
+    cache.invalidate("docs")
+    assert len(SemanticAnswerCache(tmp_path / "answers.pkl")) == 0
@@ -0,0 +1,47 @@
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from streamlit_agent.documents.batched_embeddings import BatchedEmbeddings
+
+
+class LengthEmbeddings(Embeddings):
+    """Embeds a text as its length, recording the batches it is given."""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+
+TEXTS = ["aaaa", "a", "aaaaa", "aa", "aaa"]
+
+
+def test_batches_hold_texts_of_similar_length():
+    model = LengthEmbeddings()
+    embeddings = BatchedEmbeddings(model, batch_size=2)
+
+    vectors = embeddings.embed_documents(TEXTS)
+
+    assert model.batches == [["a", "aa"], ["aaa", "aaaa"], ["aaaaa"]]
+    # In the original order
+    assert vectors == [[4.0], [1.0], [5.0], [2.0], [3.0]]
+    assert embeddings.chunks_per_second > 0
+
+
+def test_texts_are_batched_in_order_without_sorting():
+    model = LengthEmbeddings()
+    embeddings = BatchedEmbeddings(model, batch_size=3, sort_by_length=False)
+
+    assert embeddings.embed_documents(TEXTS) == [[4.0], [1.0], [5.0], [2.0], [3.0]]
+    assert model.batches == [TEXTS[:3], TEXTS[3:]]
+    assert embeddings.embed_documents([]) == []
+
+
+def test_batch_size_must_be_positive():
+    with pytest.raises(ValueError):
+        BatchedEmbeddings(LengthEmbeddings(), batch_size=0)
@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+
+from sqlalchemy import create_engine, text
+
+from streamlit_agent.sql.cached_database import CachedSQLDatabase
+
+
+def create_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE t (x INTEGER)"))
+        connection.execute(text("INSERT INTO t VALUES (1), (2)"))
+    return CachedSQLDatabase(engine)
+
+
+def test_cached_results_are_not_shared_with_callers(tmp_path):
+    db = create_database(tmp_path)
+    log = deque()
+
+    with db.log_queries(log):
+        first = db._execute("SELECT x FROM t")
+        first.append({"x": 3})
+        first[0]["x"] = 10
+
+        assert db._execute("SELECT x FROM t") == [{"x": 1}, {"x": 2}]
+    assert [timing.cached for timing in log] == [False, True]
+
+
+def test_statements_differing_in_formatting_share_a_cache_entry(tmp_path):
+    db = create_database(tmp_path)
+    log = deque()
+
+    with db.log_queries(log):
+        db._execute("SELECT x FROM t")
+        db._execute("  SELECT   x\nFROM t;")
+        db._execute("SELECT x FROM t WHERE x = 'a  b'")
+
+    assert [(timing.statement, timing.cached) for timing in log] == [
+        ("SELECT x FROM t", False),
+        ("SELECT x FROM t", True),
+        ("SELECT x FROM t WHERE x = 'a  b'", False),
+    ]
+
+
+def test_writes_invalidate_cached_results(tmp_path):
+    db = create_database(tmp_path)
+    db._execute("SELECT x FROM t")
+
+    db._execute("INSERT INTO t VALUES (3)")
+
+    assert db._execute("SELECT x FROM t") == [{"x": 1}, {"x": 2}, {"x": 3}]
+
+
+def test_each_caller_logs_only_its_own_queries(tmp_path):
+    db = create_database(tmp_path)
+    logs = {"a": deque(), "b": deque()}
+
+    def run(name):
+        with db.log_queries(logs[name]):
+            db._execute(f"SELECT x AS {name} FROM t")
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in logs]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    db._execute("SELECT x AS unlogged FROM t")
+
+    assert [timing.statement for timing in logs["a"]] == ["SELECT x AS a FROM t"]
+    assert [timing.statement for timing in logs["b"]] == ["SELECT x AS b FROM t"]
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+from streamlit_agent.callbacks import capturing_callback_handler
+from streamlit_agent.callbacks.capturing_callback_handler import (
+    BufferedCapturingCallbackHandler,
+    load_records_from_file,
+    playback_callbacks,
+)
+
+
+class SlowWriterLock:
+    """Lock that delays the writer thread before acquiring it, so that batches fill up
+    while a time-triggered flush is waiting for the lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if threading.current_thread().name == "BufferedCapturingCallbackHandler":
+            time.sleep(0.005)
+        self._lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def test_buffered_handler_writes_records_in_capture_order(tmp_path):
+    path = str(tmp_path / "session.records")
+    with BufferedCapturingCallbackHandler(
+        path, max_buffered_records=10, flush_interval=0.001
+    ) as handler:
+        handler._lock = SlowWriterLock()
+        for i in range(200):
+            handler.on_text(str(i))
+            time.sleep(0.0005)
+
+    records = load_records_from_file(path)
+    assert [record["args"][0] for record in records] == [str(i) for i in range(200)]
+    assert all(record["time_delta"] >= 0 for record in records)
+
+
+def test_buffered_handler_without_callbacks_writes_empty_session(tmp_path):
+    path = str(tmp_path / "session.records")
+    with BufferedCapturingCallbackHandler(path):
+        pass
+
+    assert load_records_from_file(path) == []
+    assert playback_callbacks([], path, max_pause_time=0) == "[Missing Agent Result]"
+
+
+class PausingWriterLock:
+    """Lock that holds the writer thread back, the first time it acquires it, until
+    `resume` is set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.writer_waiting = threading.Event()
+        self.resume = threading.Event()
+
+    def __enter__(self):
+        if (
+            threading.current_thread().name == "BufferedCapturingCallbackHandler"
+            and not self.writer_waiting.is_set()
+        ):
+            self.writer_waiting.set()
+            self.resume.wait(timeout=5)
+        self._lock.acquire()
+
+    def __exit__(self, *exc_info):
+        self._lock.release()
+
+
+def test_buffered_handler_captures_while_writer_waits_for_lock(tmp_path):
+    path = str(tmp_path / "session.records")
+    handler = BufferedCapturingCallbackHandler(
+        path, max_buffered_records=1, flush_interval=0.01, max_pending_batches=1
+    )
+    lock = PausingWriterLock()
+    handler._lock = lock
+    # The writer has timed out waiting for a batch, and is about to take the lock
+    assert lock.writer_waiting.wait(timeout=5)
+
+    # Fills the queue, then waits for the writer with a full batch
+    capture = threading.Thread(target=lambda: [handler.on_text(str(i)) for i in range(5)])
+    capture.start()
+    capture.join(timeout=0.1)
+    lock.resume.set()
+    capture.join(timeout=5)
+
+    assert not capture.is_alive()
+    handler.close()
+    records = load_records_from_file(path)
+    assert [record["args"][0] for record in records] == [str(i) for i in range(5)]
+
+
+def test_buffered_handler_close_stops_writer_after_write_error(tmp_path, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(capturing_callback_handler, "append_segment", fail)
+    handler = BufferedCapturingCallbackHandler(str(tmp_path / "session.records"))
+    handler.on_text("lost")
+
+    with pytest.raises(RuntimeError):
+        handler.close()
+    assert not handler._writer.is_alive()
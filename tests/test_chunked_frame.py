@@ -0,0 +1,85 @@
+import io
+import threading
+
+import numpy as np
+import pandas as pd
+
+from streamlit_agent.dataframes.chunked_frame import ChunkedFrame
+
+
+def generate_csv(rows=2000):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "country": rng.choice(["US", "DE", "FR"], rows),
+            "quantity": rng.integers(1, 10, rows),
+            "price": rng.random(rows).round(2) * 100,
+        }
+    )
+    return df.to_csv(index=False).encode()
+
+
+def from_csv(data, cache_dir):
+    # Small blocks, so the table has many chunks
+    return ChunkedFrame.from_csv(io.BytesIO(data), cache_dir, chunk_bytes=4096, sample_rows=100)
+
+
+def test_aggregate_matches_pandas(tmp_path):
+    data = generate_csv()
+    df = pd.read_csv(io.BytesIO(data))
+    frame = from_csv(data, tmp_path)
+    assert frame.num_chunks > 1
+
+    aggregations = {
+        "total": ("price", "sum"),
+        "average": ("quantity", "mean"),
+        "rows": ("price", "count"),
+        "cheapest": ("price", "min"),
+    }
+    pd.testing.assert_frame_equal(
+        frame.aggregate(by="country", where="quantity > 5", **aggregations),
+        df.query("quantity > 5").groupby("country").agg(**aggregations),
+        check_dtype=False,
+    )
+    overall = frame.aggregate(total=("price", "sum"), largest=("quantity", "max"))
+    assert overall["total"] == df["price"].sum()
+    assert overall["largest"] == df["quantity"].max()
+
+
+def test_query_and_count_match_pandas(tmp_path):
+    data = generate_csv()
+    df = pd.read_csv(io.BytesIO(data))
+    frame = from_csv(data, tmp_path)
+
+    expected = df.query("country == 'DE' and price > 50")
+    assert frame.count("country == 'DE' and price > 50") == len(expected)
+    pd.testing.assert_frame_equal(
+        frame.query("country == 'DE' and price > 50", columns=["price"], limit=10),
+        expected[["price"]].head(10).reset_index(drop=True),
+    )
+    assert frame.query("price < 0").empty
+
+
+def test_columns_that_change_type_in_a_later_chunk_are_widened(tmp_path):
+    data = generate_csv() + b"US,2.5,10\n"
+
+    frame = from_csv(data, tmp_path)
+
+    assert frame.dtypes["quantity"] == "float64"
+    expected = pd.read_csv(io.BytesIO(data))["quantity"].sum()
+    assert frame.aggregate(total=("quantity", "sum"))["total"] == expected
+
+
+def test_concurrent_conversions_of_the_same_file(tmp_path):
+    data = generate_csv()
+    frames = []
+    threads = [
+        threading.Thread(target=lambda: frames.append(from_csv(data, tmp_path))) for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [len(frame) for frame in frames] == [2000] * 4
+    assert [path.name for path in tmp_path.iterdir()] == [frames[0].file_hash]
@@ -0,0 +1,119 @@
+import threading
+import time
+
+from benchmarks.ingestion import write_pdf
+from streamlit_agent.documents.document_index import DocumentIndex
+from streamlit_agent.documents.hnsw_store import HnswVectorStore
+from streamlit_agent.documents.ingest import count_pages, iter_page_splits
+from streamlit_agent.fakes.models import FakeEmbeddings
+
+
+def pdf_pages(name, n_pages):
+    return [[f"{name} page {page} line {line}" for line in range(3)] for page in range(n_pages)]
+
+
+def test_pool_splits_pages_in_file_and_page_order(tmp_path):
+    paths = []
+    for name, n_pages in [("first", 5), ("empty", 0), ("second", 3)]:
+        path = str(tmp_path / f"{name}.pdf")
+        write_pdf(path, pdf_pages(name, n_pages))
+        paths.append(path)
+    page_counts = [count_pages(path) for path in paths]
+
+    serial = list(iter_page_splits(paths, page_counts, max_workers=1))
+    pooled = list(iter_page_splits(paths, page_counts, max_workers=2, pages_per_task=2))
+
+    assert [[doc.metadata for doc in splits] for splits in pooled] == [
+        [doc.metadata for doc in splits] for splits in serial
+    ]
+    # One chunk per page, with the empty file skipped
+    assert [[doc.metadata["page"] for doc in splits] for splits in pooled] == [
+        [page] for page in [0, 1, 2, 3, 4, 0, 1, 2]
+    ]
+    assert [splits[0].page_content for splits in pooled] == [
+        splits[0].page_content for splits in serial
+    ]
+
+
+def test_sync_reports_progress_of_each_file(tmp_path):
+    files = {}
+    for name, n_pages in [("a.pdf", 4), ("b.pdf", 2)]:
+        path = tmp_path / name
+        write_pdf(str(path), pdf_pages(name, n_pages))
+        files[name] = (name, path.read_bytes())
+    index = DocumentIndex(FakeEmbeddings(dim=8, texts_per_second=1e6), max_workers=2)
+
+    index.sync(files)
+
+    assert index.file_progress() == [("a.pdf", 4, 4), ("b.pdf", 2, 2)]
+    assert index.file_hashes == set(files)
+    assert [doc.metadata["page"] for _, doc in index.vectorstore.items()] == [0, 1, 2, 3, 0, 1]
+
+
+class GatedEmbeddings(FakeEmbeddings):
+    """Embeds the first batch of documents and all queries right away, and later batches
+    of documents once released.
+    """
+
+    def __init__(self):
+        super().__init__(dim=8, texts_per_second=1e6)
+        self.batches = 0
+        self.release = threading.Event()
+
+    def embed_documents(self, texts):
+        self.batches += 1
+        if self.batches > 1:
+            self.release.wait(timeout=5)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        return super().embed_documents([text])[0]
+
+
+def wait_for(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_first_page_is_searchable_while_the_rest_is_indexed(tmp_path):
+    path = tmp_path / "manual.pdf"
+    write_pdf(str(path), pdf_pages("manual", 6))
+    files = {"manual": ("manual.pdf", path.read_bytes())}
+    embeddings = GatedEmbeddings()
+    index = DocumentIndex(embeddings, HnswVectorStore(embeddings, 8), max_workers=1)
+    done = []
+
+    index.start_sync(files, on_done=done.append)
+    wait_for(lambda: index.pages_indexed > 0)
+
+    assert index.is_syncing
+    assert (index.pages_indexed, index.pages_total) == (1, 6)
+    assert index.file_hashes == set()
+    results = index.as_retriever(search_kwargs={"k": 4}).get_relevant_documents("manual")
+    assert [doc.metadata["page"] for doc in results] == [0]
+
+    embeddings.release.set()
+    wait_for(lambda: not index.is_syncing)
+    assert done == [index]
+    assert (index.pages_indexed, index.file_hashes) == (6, {"manual"})
+
+
+def test_stopping_a_sync_leaves_the_file_to_be_indexed_again(tmp_path):
+    path = tmp_path / "manual.pdf"
+    write_pdf(str(path), pdf_pages("manual", 6))
+    files = {"manual": ("manual.pdf", path.read_bytes())}
+    embeddings = GatedEmbeddings()
+    index = DocumentIndex(embeddings, HnswVectorStore(embeddings, 8), max_workers=1)
+    done = []
+
+    index.start_sync(files, on_done=done.append)
+    wait_for(lambda: index.pages_indexed > 0)
+    embeddings.release.set()
+    index.stop()
+    index.sync(files)
+
+    assert done == []
+    assert index.file_hashes == {"manual"}
+    assert [doc.metadata["page"] for _, doc in index.vectorstore.items()] == list(range(6))
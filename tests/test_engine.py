@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from streamlit_agent.sql.engine import PoolStats, create_sqlite_read_only_engine, pool_stats
+
+ENDLESS_QUERY = text(
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n"
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "shop.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE items (name TEXT)")
+        connection.execute("INSERT INTO items VALUES ('pump')")
+    return path
+
+
+def test_slow_statements_are_aborted_and_the_connection_reused(db_path):
+    engine = create_sqlite_read_only_engine(db_path, pool_size=1, statement_timeout=0.2)
+
+    with engine.connect() as connection:
+        start = time.monotonic()
+        with pytest.raises(OperationalError, match="interrupted"):
+            connection.execute(ENDLESS_QUERY)
+        assert time.monotonic() - start < 5
+        # Each statement gets its own deadline
+        time.sleep(0.3)
+        assert connection.execute(text("SELECT name FROM items")).all() == [("pump",)]
+
+
+def test_read_only_engine_pools_connections_and_rejects_writes(db_path):
+    engine = create_sqlite_read_only_engine(db_path, pool_size=2, max_overflow=1)
+
+    with engine.connect() as connection:
+        assert pool_stats(engine) == PoolStats(size=2, checked_out=1, idle=0, overflow=0)
+        with pytest.raises(OperationalError, match="readonly"):
+            connection.execute(text("INSERT INTO items VALUES ('valve')"))
+    assert pool_stats(engine) == PoolStats(size=2, checked_out=0, idle=1, overflow=0)
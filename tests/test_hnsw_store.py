@@ -0,0 +1,74 @@
+import os
+
+from streamlit_agent.documents.hnsw_store import HnswVectorStore, evict_saved_stores
+from streamlit_agent.fakes.models import FakeEmbeddings
+
+EMBEDDINGS = FakeEmbeddings(dim=8, texts_per_second=1e9)
+
+
+class FewReachableIndex:
+    """hnswlib index that, like one with many deleted elements, finds at most `reachable`
+    elements."""
+
+    def __init__(self, index, reachable):
+        self.index = index
+        self.reachable = reachable
+
+    def knn_query(self, vector, k):
+        if k > self.reachable:
+            raise RuntimeError("Cannot return the results in a contiguous 2D array")
+        return self.index.knn_query(vector, k=k)
+
+    def __getattr__(self, name):
+        return getattr(self.index, name)
+
+
+def create_store(n):
+    store = HnswVectorStore(EMBEDDINGS, 8)
+    ids = store.add_texts([f"text {i}" for i in range(n)], ids=[str(i) for i in range(n)])
+    return store, ids
+
+
+def test_search_returns_only_documents_that_are_not_deleted(tmp_path):
+    store, ids = create_store(50)
+    store.delete(ids[:47])
+
+    assert sorted(doc.page_content for doc in store.similarity_search("text", k=10)) == [
+        "text 47",
+        "text 48",
+        "text 49",
+    ]
+    store.delete(ids[47:])
+    assert store.similarity_search("text", k=10) == []
+    assert store.max_marginal_relevance_search("text", k=2) == []
+
+
+def test_search_returns_fewer_results_when_hnswlib_finds_fewer(tmp_path):
+    store, _ = create_store(20)
+    store._index = FewReachableIndex(store._index, reachable=3)
+
+    assert len(store.similarity_search("text 1", k=8)) == 2
+    assert store.similarity_search("text 1", k=1)[0].page_content == "text 1"
+
+
+def test_saved_store_searches_like_the_original(tmp_path):
+    store, ids = create_store(30)
+    store.delete(ids[:5])
+    store.save(tmp_path / "store")
+
+    loaded = HnswVectorStore.load(tmp_path / "store", EMBEDDINGS)
+
+    assert loaded.items() == store.items()
+    assert loaded.similarity_search("text 7", k=3) == store.similarity_search("text 7", k=3)
+
+
+def test_least_recently_used_saved_stores_are_evicted(tmp_path):
+    for n, name in enumerate(["old", "used", "new"]):
+        create_store(10)[0].save(tmp_path / name)
+        os.utime(tmp_path / name, (n, n))
+    HnswVectorStore.load(tmp_path / "used", EMBEDDINGS)
+    size = sum(file.stat().st_size for file in (tmp_path / "new").iterdir())
+
+    evict_saved_stores(tmp_path, max_bytes=2 * size, keep=tmp_path / "new")
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["new", "used"]
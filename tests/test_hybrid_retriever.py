@@ -0,0 +1,85 @@
+from langchain_core.embeddings import Embeddings
+
+from streamlit_agent.documents.bm25_index import BM25Index, tokenize
+from streamlit_agent.documents.hnsw_store import HnswVectorStore
+from streamlit_agent.documents.hybrid_retriever import HybridRetriever
+
+
+class TableEmbeddings(Embeddings):
+    """Embeds each known text as a fixed vector."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def test_tokenize_keeps_identifiers_and_their_parts():
+    assert tokenize("Error E-1234 in v2.1") == [
+        "error",
+        "e-1234",
+        "e",
+        "1234",
+        "in",
+        "v2.1",
+        "v2",
+        "1",
+    ]
+
+
+def test_bm25_ranks_by_matching_terms_and_follows_updates():
+    index = BM25Index()
+    index.add(
+        ["overview", "seal", "leak"],
+        ["pump housing overview", "pump seal replacement", "error E-1234 seal leak"],
+    )
+
+    assert [id for id, _ in index.search("E-1234 pump")] == ["leak", "overview", "seal"]
+    assert [id for id, _ in index.search("1234")] == ["leak"]
+    assert index.search("warranty") == []
+
+    index.add(["leak"], ["seal leak"])
+    index.remove(["overview"])
+    assert len(index) == 2
+    assert index.search("1234") == []
+    assert [id for id, _ in index.search("E-1234 pump")] == ["seal"]
+
+
+def test_hybrid_retriever_fuses_lexical_and_vector_rankings():
+    texts = {
+        "overview": "pump housing overview",
+        "seal": "pump seal replacement",
+        "leak": "error E-1234 seal leak",
+        "warranty": "warranty terms",
+    }
+    query = "E-1234 pump"
+    embeddings = TableEmbeddings(
+        {
+            texts["overview"]: [1.0, 0.0],
+            texts["seal"]: [0.9, 0.1],
+            texts["warranty"]: [0.5, 0.5],
+            texts["leak"]: [0.0, 1.0],
+            query: [1.0, 0.0],
+        }
+    )
+    vectorstore = HnswVectorStore(embeddings, 2)
+    vectorstore.add_texts(list(texts.values()), ids=list(texts))
+    bm25 = BM25Index()
+    bm25.add(list(texts), list(texts.values()))
+    retriever = HybridRetriever(vectorstore=vectorstore, bm25=bm25, k=3)
+
+    # By vector similarity alone, the document with the error code ranks last
+    assert [doc.page_content for doc in vectorstore.similarity_search(query, k=3)] == [
+        texts["overview"],
+        texts["seal"],
+        texts["warranty"],
+    ]
+    assert [doc.page_content for doc in retriever.get_relevant_documents(query)] == [
+        texts["overview"],
+        texts["leak"],
+        texts["seal"],
+    ]
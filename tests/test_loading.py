@@ -0,0 +1,32 @@
+import io
+
+import pandas as pd
+
+from streamlit_agent.dataframes.loading import ParquetFrameCache, load_dataframe, optimize_dtypes
+
+CSV = b"id,price,ratio,country\n1,10,0.5,US\n2,20,0.25,DE\n3,30,0.1,US\n4,40,,US\n"
+
+
+def test_optimize_dtypes_downcasts_without_losing_values():
+    df = pd.read_csv(io.BytesIO(CSV))
+
+    optimized = optimize_dtypes(df)
+
+    assert optimized["id"].dtype == "int8"
+    assert optimized["price"].dtype == "int8"
+    # 0.1 isn't exact as a float32
+    assert optimized["ratio"].dtype == "float64"
+    assert optimized["country"].dtype == "category"
+    pd.testing.assert_frame_equal(optimized.astype(df.dtypes.to_dict()), df)
+
+
+def test_load_dataframe_reads_parsed_files_from_parquet_cache(tmp_path):
+    cache = ParquetFrameCache(tmp_path)
+
+    parsed = load_dataframe(CSV, pd.read_csv, cache)
+    cached = load_dataframe(CSV, pd.read_csv, cache)
+
+    assert (parsed.source, cached.source) == ("parsed", "parquet")
+    pd.testing.assert_frame_equal(cached.df, parsed.df)
+    assert cached.parsed_bytes == parsed.parsed_bytes
+    assert [path.name for path in tmp_path.iterdir()] == [f"{parsed.file_hash}.parquet"]
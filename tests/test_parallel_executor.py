@@ -0,0 +1,60 @@
+import threading
+import time
+
+from langchain.agents import AgentExecutor, Tool
+
+from benchmarks.parallel_tools import TOOL_DELAYS, RecordingHandler, StubAgent, make_tool
+from streamlit_agent.agents.parallel_executor import ParallelAgentExecutor
+
+
+def test_tool_calls_run_concurrently_and_report_in_action_order():
+    # Every call waits for the other two, and the first action's tool finishes last
+    barrier = threading.Barrier(3, timeout=5)
+    finished = []
+
+    def make_concurrent_tool(name, delay):
+        def run(query):
+            barrier.wait()
+            time.sleep(delay)
+            finished.append(query)
+            return f"{name} result for {query}"
+
+        return Tool(name=name, func=run, description=f"Stub {name} tool")
+
+    tools = [make_concurrent_tool(name, 0.2 - 0.1 * i) for i, name in enumerate(TOOL_DELAYS)]
+    executor = ParallelAgentExecutor(
+        agent=StubAgent(n_actions=3), tools=tools, return_intermediate_steps=True
+    )
+    handler = RecordingHandler()
+
+    result = executor.invoke({"input": "question"}, {"callbacks": [handler]})
+
+    assert finished == ["query 2", "query 1", "query 0"]
+    observations = [f"{name} result for query {i}" for i, name in enumerate(TOOL_DELAYS)]
+    assert [action.tool_input for action, _ in result["intermediate_steps"]] == [
+        "query 0",
+        "query 1",
+        "query 2",
+    ]
+    assert [observation for _, observation in result["intermediate_steps"]] == observations
+    assert result["output"] == "; ".join(observations)
+    assert handler.events == [
+        event
+        for i, observation in enumerate(observations)
+        for event in [("start", f"query {i}"), ("end", observation)]
+    ]
+
+
+def test_unknown_tools_are_reported_in_place_like_agent_executor():
+    # Calculator calls are unknown tools
+    tools = [make_tool(name, 0) for name in TOOL_DELAYS if name != "Calculator"]
+    outputs, events = [], []
+    for executor_class in (AgentExecutor, ParallelAgentExecutor):
+        executor = executor_class(agent=StubAgent(n_actions=5), tools=tools)
+        handler = RecordingHandler()
+        outputs.append(executor.invoke({"input": "question"}, {"callbacks": [handler]}))
+        events.append(handler.events)
+
+    assert outputs[0] == outputs[1]
+    assert events[0] == events[1]
+    assert "Calculator is not a valid tool" in outputs[1]["output"]
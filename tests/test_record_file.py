@@ -0,0 +1,56 @@
+from pathlib import Path
+import pickle
+
+import pytest
+
+from streamlit_agent.callbacks.capturing_callback_handler import (
+    INSTANT,
+    CapturingCallbackHandler,
+    playback_callbacks,
+)
+from streamlit_agent.callbacks.record_file import (
+    RecordFile,
+    convert_pickle_file,
+    create_record_file,
+)
+
+RUNS_DIR = Path(__file__).parent.parent / "streamlit_agent" / "runs"
+RUNS = sorted(RUNS_DIR.glob("*.pickle"))
+
+
+def replayed_calls(path):
+    handler = CapturingCallbackHandler()
+    result = playback_callbacks([handler], str(path), max_pause_time=0, speed=INSTANT)
+    calls = [(r["callback_type"], r["args"], r["kwargs"]) for r in handler._records]
+    return result, calls
+
+
+@pytest.mark.parametrize("run", RUNS, ids=lambda path: path.name)
+def test_converted_records_match_pickle(run, tmp_path):
+    with open(run, "rb") as file:
+        records = pickle.load(file)
+    dest = tmp_path / "session.records"
+
+    assert convert_pickle_file(str(run), str(dest)) == len(records)
+    with RecordFile(str(dest)) as record_file:
+        assert len(record_file) == len(records)
+        assert list(record_file) == records
+        assert list(record_file.iter_time_deltas()) == [r["time_delta"] for r in records]
+
+
+@pytest.mark.parametrize("run", RUNS, ids=lambda path: path.name)
+def test_record_file_plays_back_like_pickle(run, tmp_path):
+    dest = tmp_path / "session.records"
+    convert_pickle_file(str(run), str(dest))
+
+    assert replayed_calls(dest) == replayed_calls(run)
+
+
+def test_empty_record_file(tmp_path):
+    path = str(tmp_path / "session.records")
+    create_record_file(path)
+
+    with RecordFile(path) as record_file:
+        assert len(record_file) == 0
+        assert list(record_file) == []
+    assert replayed_calls(path) == ("[Missing Agent Result]", [])
@@ -0,0 +1,45 @@
+from sqlalchemy import create_engine, text
+
+from streamlit_agent.sql.schema_index import SchemaIndex
+
+
+def create_database(path):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE artist (artist_id INTEGER PRIMARY KEY, name TEXT)"))
+        connection.execute(
+            text(
+                "CREATE TABLE album (album_id INTEGER PRIMARY KEY, title TEXT, "
+                "artist_id INTEGER REFERENCES artist(artist_id))"
+            )
+        )
+        connection.execute(
+            text(
+                "CREATE TABLE track (track_id INTEGER PRIMARY KEY, name TEXT, "
+                "album_id INTEGER REFERENCES album(album_id))"
+            )
+        )
+    return engine
+
+
+def test_related_tables_follow_foreign_keys_both_ways(tmp_path):
+    index = SchemaIndex.build(create_database(tmp_path / "music.db"))
+
+    assert index.related_tables(["album"]) == ["artist", "track"]
+    assert index.summaries(["artist"]) == "artist(artist_id, name)"
+
+
+def test_related_tables_leave_out_tables_that_are_not_indexed(tmp_path):
+    engine = create_database(tmp_path / "music.db")
+    index = SchemaIndex.build(engine, table_names=["album", "track"])
+
+    related = index.related_tables(["album"])
+
+    assert related == ["track"]
+    assert index.summaries(related) == "track(track_id, name, album_id -> album.album_id)"
+
+
+def test_search_ranks_tables_by_column_and_table_words(tmp_path):
+    index = SchemaIndex.build(create_database(tmp_path / "music.db"))
+
+    assert index.search("How long are the tracks?", k=1) == ["track"]
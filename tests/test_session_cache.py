@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from streamlit_agent.agents import session_cache
+from streamlit_agent.agents.session_cache import SessionResourceCache, fingerprint
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = SimpleNamespace(id="alice", now=0.0)
+    monkeypatch.setattr(session_cache, "current_session_id", lambda: session.id)
+    monkeypatch.setattr(session_cache, "time", SimpleNamespace(monotonic=lambda: session.now))
+    return session
+
+
+def test_resources_are_reused_per_session_until_the_key_changes(session):
+    cache = SessionResourceCache()
+    built = []
+
+    def factory(label):
+        return lambda: built.append(label) or label
+
+    key = (fingerprint("sk-secret"), "gpt-3.5-turbo", "data-1")
+    assert cache.get_or_create("agent", key, factory("first")) == "first"
+    assert cache.get_or_create("agent", key, factory("unused")) == "first"
+    session.id = "bob"
+    assert cache.get_or_create("agent", key, factory("bob's")) == "bob's"
+    session.id = "alice"
+    new_key = (fingerprint("sk-secret"), "gpt-3.5-turbo", "data-2")
+    assert cache.get_or_create("agent", new_key, factory("rebuilt")) == "rebuilt"
+
+    assert built == ["first", "bob's", "rebuilt"]
+    assert (cache.hits, cache.misses, len(cache)) == (1, 3, 2)
+    assert "sk-secret" not in key[0]
+
+    cache.discard("agent")
+    assert cache.get_or_create("agent", new_key, factory("after discard")) == "after discard"
+
+
+def test_idle_and_least_recently_used_resources_are_evicted(session):
+    cache = SessionResourceCache(idle_ttl=60, max_entries=2)
+    cache.get_or_create("agent", 1, lambda: "alice's")
+    session.id, session.now = "bob", 50.0
+    cache.get_or_create("agent", 1, lambda: "bob's")
+
+    # Alice's agent has been idle for more than a minute
+    session.id, session.now = "carol", 70.0
+    cache.get_or_create("agent", 1, lambda: "carol's")
+    assert len(cache) == 2
+    session.id = "alice"
+    assert cache.get_or_create("agent", 1, lambda: "alice's again") == "alice's again"
+
+    # Rebuilding Alice's made three entries, so the least recently used (Bob's) was evicted
+    session.id = "bob"
+    assert cache.get_or_create("agent", 1, lambda: "bob's again") == "bob's again"
+    session.id = "alice"
+    assert cache.get_or_create("agent", 1, lambda: "unused") == "alice's again"
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import pytest
+
+from streamlit_agent.callbacks import stream_handler
+from streamlit_agent.callbacks.stream_handler import StreamHandler
+
+
+class Container:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(stream_handler, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_tokens_are_rendered_at_most_max_fps_times_per_second(clock):
+    container = Container()
+    handler = StreamHandler(container, max_fps=10)
+
+    handler.on_llm_new_token("a")
+    clock.now = 0.05
+    handler.on_llm_new_token("b")
+    handler.on_llm_new_token("c")
+    assert container.renders == ["a"]
+    assert handler.text == "abc"
+
+    clock.now = 0.1
+    handler.on_llm_new_token("d")
+    assert container.renders == ["a", "abcd"]
+
+
+def test_tokens_are_rendered_once_max_buffered_tokens_are_pending(clock):
+    container = Container()
+    handler = StreamHandler(container, initial_text="> ", max_buffered_tokens=3)
+
+    for token in "abcd":
+        handler.on_llm_new_token(token)
+
+    assert container.renders == ["> a", "> abcd"]
+
+
+def test_pending_tokens_are_rendered_when_the_llm_finishes(clock):
+    container = Container()
+    handler = StreamHandler(container)
+
+    handler.on_llm_new_token("a")
+    handler.on_llm_new_token("b")
+    handler.on_llm_end(None)
+    handler.on_llm_end(None)
+
+    assert container.renders == ["a", "ab"]
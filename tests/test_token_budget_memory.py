@@ -0,0 +1,88 @@
+import pytest
+from langchain_community.llms.fake import FakeListLLM
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from streamlit_agent.memory import token_budget_memory
+from streamlit_agent.memory.token_budget_memory import TokenBudgetMemory
+
+
+class WordEncoding:
+    """One token per word, so that the tests don't download tiktoken's encodings."""
+
+    def encode(self, text):
+        return text.split()
+
+
+class RecordingLLM(FakeListLLM):
+    prompts: list = []
+
+    def _call(self, prompt, *args, **kwargs):
+        self.prompts.append(prompt)
+        return super()._call(prompt, *args, **kwargs)
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    monkeypatch.setattr(token_budget_memory, "_encoding", WordEncoding)
+    token_budget_memory.count_tokens.cache_clear()
+    yield
+    token_budget_memory.count_tokens.cache_clear()
+
+
+def conversation(turns):
+    # Each message is 3 words, so 7 tokens with the chat format
+    messages = []
+    for n in range(turns):
+        messages += [
+            HumanMessage(content=f"question {n} asked"),
+            AIMessage(content=f"answer {n} given"),
+        ]
+    return messages
+
+
+def test_recent_whole_turns_within_budget_are_kept():
+    messages = conversation(3)
+    memory = TokenBudgetMemory(max_tokens=25)
+
+    # Three messages fit, but the oldest of them is the AI half of a turn
+    assert memory.budget_messages(messages) == messages[4:]
+    assert memory.last_full_tokens == 42
+    assert memory.last_prompt_tokens == 14
+    assert memory.last_saved_tokens == 28
+
+
+def test_messages_that_no_longer_fit_after_summarizing_are_summarized_too():
+    messages = conversation(3)
+    llm = RecordingLLM(responses=["a long summary " * 4, "short summary"])
+    memory = TokenBudgetMemory(max_tokens=30, llm=llm)
+
+    budgeted = memory.budget_messages(messages)
+
+    # The first summary leaves room for only one turn, so the second turn is summarized
+    # instead of being dropped
+    assert len(llm.prompts) == 2
+    assert "question 0 asked" in llm.prompts[0]
+    assert "question 1 asked" in llm.prompts[1] and "question 0" not in llm.prompts[1]
+    assert budgeted == [SystemMessage(content="short summary"), *messages[4:]]
+    assert memory.summarized_messages == 4
+
+
+def test_only_messages_that_left_the_budget_are_summarized():
+    llm = RecordingLLM(responses=["summary"])
+    memory = TokenBudgetMemory(max_tokens=33, llm=llm)
+    memory.budget_messages(conversation(2))
+    assert llm.prompts == []
+
+    budgeted = memory.budget_messages(conversation(3))
+
+    assert len(llm.prompts) == 1
+    assert budgeted == [SystemMessage(content="summary"), *conversation(3)[2:]]
+
+
+def test_clearing_the_history_resets_the_summary():
+    memory = TokenBudgetMemory(max_tokens=33, llm=RecordingLLM(responses=["summary"]))
+    memory.budget_messages(conversation(3))
+    greeting = [AIMessage(content="How can I help you?")]
+
+    assert memory.budget_messages(greeting) == greeting
+    assert (memory.summary, memory.summarized_messages) == ("", 0)
@@ -0,0 +1,38 @@
+import itertools
+from types import SimpleNamespace
+
+from streamlit_agent.agents import tool_cache
+from streamlit_agent.agents.tool_cache import ToolResultCache
+
+
+def test_disk_hits_are_evicted_last(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(tool_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    # Nothing is kept in memory, so every hit is read from disk
+    cache = ToolResultCache(max_entries=0, disk_path=tmp_path / "tools.db", max_disk_entries=2)
+
+    cache.put("search", "a", "result a", ttl=60)
+    cache.put("search", "b", "result b", ttl=60)
+    assert cache.get("search", "a") == (True, "result a")
+    cache.put("search", "c", "result c", ttl=60)
+
+    assert cache.get("search", "a") == (True, "result a")
+    assert cache.get("search", "b") == (False, None)
+    assert cache.get("search", "c") == (True, "result c")
+
+
+def test_disk_entries_are_evicted_in_batches(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(tool_cache, "time", SimpleNamespace(time=lambda: next(clock)))
+    path = tmp_path / "tools.db"
+    cache = ToolResultCache(max_entries=0, disk_path=path, max_disk_entries=10)
+
+    for n in range(10):
+        cache.put("search", str(n), n, ttl=60)
+    assert cache._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 10
+    cache.put("search", "10", 10, ttl=60)
+
+    # Evicted down to 9 entries, least recently used first
+    assert [cache.get("search", str(n))[0] for n in range(11)] == [False] * 2 + [True] * 9
+    # A cache opening the same file counts the entries already on it
+    assert ToolResultCache(disk_path=path, max_disk_entries=10)._disk_entries == 9